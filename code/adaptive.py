@@ -0,0 +1,95 @@
+""" adaptive sampling for the multi-structure steps (relax with --relax_nstruct > 1, docking with --num_structs > 1)
+    instead of always generating the full number of structures, the structures are generated in small increments,
+    and sampling stops early once the scores of the structures so far have converged:
+        - the running minimum of the sort column hasn't improved by more than a tolerance over the last k structures
+        - or the standard error of the mean of the sort column has dropped below a threshold
+    the configured number of structures is still the upper limit """
+
+import numpy as np
+
+import score_files
+from resources import empty_usage
+
+# the hyperparameters that configure adaptive sampling (an increment of 0 disables adaptive sampling)
+ADAPTIVE_HPARAMS = ["adaptive_increment", "adaptive_patience", "adaptive_tolerance", "adaptive_sem"]
+
+# the standard error isn't meaningful for fewer structures than this
+MIN_STRUCTS_FOR_SEM = 3
+
+
+def get_adaptive_hparams(args):
+    """ the adaptive sampling hyperparameters from the parsed arguments, to be saved with the other hparams """
+    return {k: getattr(args, k) for k in ADAPTIVE_HPARAMS}
+
+
+def is_adaptive(hparams):
+    return hparams.get("adaptive_increment", 0) > 0
+
+
+def has_converged(values, patience, tolerance, sem_threshold=0.0):
+    """ whether sampling can stop, given the sort column values of the structures generated so far, in order """
+    num_structs = len(values)
+
+    # the best structure of the last `patience` structures isn't better than the best one before them by more than
+    # the tolerance (lower energies are better)
+    if num_structs > patience > 0:
+        best_before = np.min(values[:num_structs - patience])
+        best_recent = np.min(values[num_structs - patience:])
+        if best_before - best_recent <= tolerance:
+            return True
+
+    if sem_threshold > 0 and num_structs >= MIN_STRUCTS_FOR_SEM:
+        sem = np.std(values, ddof=1) / np.sqrt(num_structs)
+        if sem < sem_threshold:
+            return True
+
+    return False
+
+
+def add_usage(total, usage):
+    """ combine the usage of consecutive runs of the same step: the times add up, the peak rss is the max """
+    combined = {k: total[k] + usage[k] for k in total}
+    combined["max_rss_mb"] = max(total["max_rss_mb"], usage["max_rss_mb"])
+    return combined
+
+
+def increment_args(increment_num):
+    """ extra rosetta args for the given increment. the first increment keeps the default output names (later steps
+        expect the first structure to be structure_0001_0001), later increments get a suffix so they don't
+        overwrite the earlier structures. rosetta appends to existing score and silent files """
+    if increment_num == 0:
+        return []
+    return ["-out:suffix", "_inc{}".format(increment_num)]
+
+
+def increment_out_fn(out_fn, increment_num):
+    """ a separate log for each increment, e.g. relax.out, relax_inc1.out, relax_inc2.out """
+    if increment_num == 0:
+        return out_fn
+    base, ext = out_fn.rsplit(".", 1)
+    return "{}_inc{}.{}".format(base, increment_num, ext)
+
+
+def run_adaptive(run_increment, score_fn, sort_col, max_nstruct, hparams):
+    """ call run_increment(increment_num, nstruct) until the scores in score_fn converge or max_nstruct structures
+        have been generated. run_increment runs rosetta for nstruct more structures and returns its resource usage
+        returns the combined resource usage and the number of structures that were generated """
+    usage = empty_usage()
+    num_structs = 0
+    # count the requested structures too, so a run that doesn't output all its structures can't loop forever
+    num_requested = 0
+    increment_num = 0
+    while num_requested < max_nstruct:
+        nstruct = min(hparams["adaptive_increment"], max_nstruct - num_requested)
+        usage = add_usage(usage, run_increment(increment_num, nstruct))
+        num_requested += nstruct
+        increment_num += 1
+
+        columns, values, _ = score_files.read_score_sc(score_fn)
+        num_structs = len(values)
+        if has_converged(values[:, columns.index(sort_col)], hparams["adaptive_patience"],
+                         hparams["adaptive_tolerance"], hparams["adaptive_sem"]):
+            break
+
+    return usage, num_structs
+
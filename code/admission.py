@@ -0,0 +1,175 @@
+""" memory-aware admission control for running multiple Rosetta processes in one slot """
+
+import os
+import re
+from os.path import join, isfile
+
+from resources import STEP_ENV_VAR
+
+# how often to check memory while waiting to admit a variant
+ADMISSION_POLL_SECONDS = 1.0
+
+# cgroup limits at or above this are effectively unlimited
+UNLIMITED_BYTES = 2 ** 60
+
+
+def read_first_line(fn):
+    try:
+        with open(fn, "r") as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+
+def read_cgroup_limit_mb():
+    """ memory limit of this process's cgroup (v2 or v1) in MB, or None if there is no limit """
+    cgroup_paths = {}
+    try:
+        with open("/proc/self/cgroup", "r") as f:
+            for line in f:
+                # each line is "hierarchy-id:controllers:path", cgroup v2 has an empty controller list
+                _, controllers, path = line.strip().split(":", 2)
+                for controller in controllers.split(",") if controllers else ["v2"]:
+                    cgroup_paths[controller] = path.lstrip("/")
+    except (OSError, ValueError):
+        pass
+
+    # the job's own cgroup first, then the root of the mount (which is the job's cgroup inside containers)
+    candidates = []
+    if "v2" in cgroup_paths:
+        candidates.append(join("/sys/fs/cgroup", cgroup_paths["v2"], "memory.max"))
+    if "memory" in cgroup_paths:
+        candidates.append(join("/sys/fs/cgroup/memory", cgroup_paths["memory"], "memory.limit_in_bytes"))
+    candidates += ["/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"]
+
+    for fn in candidates:
+        value = read_first_line(fn)
+        if value is None:
+            continue
+        if value == "max" or int(value) >= UNLIMITED_BYTES:
+            return None
+        return int(value) / 1024 ** 2
+    return None
+
+
+def read_condor_ad_memory_mb():
+    """ the slot's Memory (in MB) from the HTCondor machine ad, or None if not running on HTCondor """
+    ad_fn = os.environ.get("_CONDOR_MACHINE_AD")
+    if ad_fn is None or not isfile(ad_fn):
+        return None
+    with open(ad_fn, "r") as f:
+        for line in f:
+            match = re.match(r"^Memory\s*=\s*(\d+)\s*$", line)
+            if match:
+                return float(match.group(1))
+    return None
+
+
+def get_memory_limit_mb(override_mb=None):
+    """ the memory limit for admission control: the override if given, otherwise the smallest of the cgroup limit
+        and the HTCondor slot memory, falling back to the machine's physical memory """
+    if override_mb is not None:
+        return override_mb, "override"
+
+    limits = [(limit, source) for limit, source in [(read_cgroup_limit_mb(), "cgroup"),
+                                                   (read_condor_ad_memory_mb(), "machine ad")]
+              if limit is not None]
+    if len(limits) > 0:
+        return min(limits)
+
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024 ** 2, "physical memory"
+
+
+def get_descendants(pid):
+    """ pids of all descendants of the given process, found by walking the parent pids in /proc """
+    children = {}
+    try:
+        proc_pids = [int(d) for d in os.listdir("/proc") if d.isdigit()]
+    except OSError:
+        return []
+
+    for p in proc_pids:
+        stat = read_first_line(join("/proc", str(p), "stat"))
+        if stat is None:
+            continue
+        # the command name can contain spaces and parentheses, so split after the last ")"
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        children.setdefault(ppid, []).append(p)
+
+    descendants = []
+    stack = [pid]
+    while len(stack) > 0:
+        for child in children.get(stack.pop(), []):
+            descendants.append(child)
+            stack.append(child)
+    return descendants
+
+
+def read_status_mb(pid, field):
+    """ read a memory field (like VmRSS or VmHWM) from /proc/<pid>/status in MB """
+    try:
+        with open(join("/proc", str(pid), "status"), "r") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def get_rosetta_step(pid):
+    """ the pipeline step a rosetta process is running, from the step tag its caller put in its environment
+        (see resources.run_measured). returns None for untagged processes """
+    try:
+        with open(join("/proc", str(pid), "environ"), "rb") as f:
+            env_vars = f.read().decode(errors="replace").split("\0")
+    except OSError:
+        return None
+
+    prefix = STEP_ENV_VAR + "="
+    for env_var in env_vars:
+        if env_var.startswith(prefix):
+            return env_var[len(prefix):]
+    return None
+
+
+def sample_memory(memory_model):
+    """ sample the live rss of this process and all its descendants. the peak rss of each running rosetta process
+        updates memory_model, which maps step -> largest peak rss (MB) seen so far in this job
+        returns the total rss in MB """
+    total_rss = 0
+    for pid in [os.getpid()] + get_descendants(os.getpid()):
+        rss = read_status_mb(pid, "VmRSS")
+        if rss is None:
+            continue
+        total_rss += rss
+
+        step = get_rosetta_step(pid)
+        if step is not None:
+            peak = read_status_mb(pid, "VmHWM")
+            if peak is not None:
+                memory_model[step] = max(memory_model.get(step, 0), peak)
+    return total_rss
+
+
+def predict_variant_peak_mb(memory_model, default_mb, margin=1.2, step_procs=None):
+    """ predicted peak rss of a variant: a variant runs one step at a time, so it's the largest step seen so far
+        with a safety margin. step_procs maps step -> number of processes a variant runs of it at the same time
+        (like the docking fan-out), the peak of those steps is multiplied by it. before any steps have been seen,
+        the default is used, multiplied by the most concurrent processes of any step """
+    step_procs = {} if step_procs is None else step_procs
+    if len(memory_model) == 0:
+        return default_mb * max([1] + list(step_procs.values()))
+    return max(peak * step_procs.get(step, 1) for step, peak in memory_model.items()) * margin
+
+
+def can_admit_variant(memory_model, memory_limit_mb, num_running, default_mb, step_procs=None):
+    """ admit a new variant if its predicted peak fits in the memory that's free right now, and if all running
+        variants plus the new one could hit their predicted peak at the same time without going over the limit
+        with nothing running, the variant is always admitted, so a job can't stall """
+    if num_running == 0:
+        return True
+
+    current_rss = sample_memory(memory_model)
+    variant_peak = predict_variant_peak_mb(memory_model, default_mb, step_procs=step_procs)
+    return (current_rss + variant_peak <= memory_limit_mb) and ((num_running + 1) * variant_peak <= memory_limit_mb)
@@ -1,5 +1,7 @@
 """ useful functions for processing and analyzing results of energize/HTCondor runs """
 
+import csv
+import io
 import os
 import shutil
 import subprocess
@@ -8,6 +10,8 @@ from collections import defaultdict
 from os.path import isfile, basename, join, isdir
 import pandas as pd
 
+from results import JOB_DONE_FN, read_complete_records
+
 
 def parse_job_dir_name(job_dir):
     # assuming no surprise underscores in job dir name
@@ -77,8 +81,86 @@ def get_failed_variants(main_d):
     return failed_variants
 
 
+def load_failed_variants(failed_fn, failure_classes=None):
+    """ load the variants from a failed.txt file, optionally keeping only the given failure classes
+        (for example, ["transient", "unknown"] to rerun variants that might succeed on another machine)
+        older failed.txt files only list the variants, so their failure class is unknown """
+    failed_variants = []
+    with open(failed_fn, "r") as f:
+        for line in f.read().splitlines():
+            tokens = line.split("\t")
+            failure_class = tokens[1] if len(tokens) > 1 else "unknown"
+            if failure_classes is None or failure_class in failure_classes:
+                failed_variants.append(tokens[0])
+    return failed_variants
+
+
+def load_job_variants(log_dir):
+    """ the "pdb_fn variant" strings of the job's variant list, found through the variants_fn in args.txt
+        returns None if the variant list isn't available (for example, it was only transferred to the execute node) """
+    args_fn = join(log_dir, "args.txt")
+    if not isfile(args_fn):
+        return None
+
+    with open(args_fn, "r") as f:
+        lines = f.read().splitlines()
+    if "--variants_fn" not in lines or lines.index("--variants_fn") + 1 >= len(lines):
+        return None
+
+    variants_fn = lines[lines.index("--variants_fn") + 1]
+    if not isfile(variants_fn):
+        return None
+    with open(variants_fn, "r") as f:
+        return [line for line in f.read().splitlines() if line.strip() != ""]
+
+
+def load_energies(energies_fn):
+    """ load an energies.csv without modifying it. the partial last line an evicted job can leave behind is
+        skipped, instead of becoming a row with a cut-off value and nans """
+    return pd.read_csv(io.StringIO(read_complete_records(energies_fn)))
+
+
+def writes_done_marker(log_dir):
+    """ whether the job writes the completion marker, jobs from before the marker existed don't list it in job.csv """
+    job_fn = join(log_dir, "job.csv")
+    if not isfile(job_fn):
+        return False
+    with open(job_fn, "r") as f:
+        return "done_marker" in dict(row for row in csv.reader(f) if len(row) == 2)
+
+
+def job_succeeded(log_dir):
+    """ a job succeeded if it wrote the completion marker (see results.mark_job_done). a job that was evicted or
+        killed can still have an energies.csv with the variants that finished. older jobs without the marker
+        fall back to whether they have an energies.csv """
+    if writes_done_marker(log_dir):
+        return isfile(join(log_dir, JOB_DONE_FN))
+    return isfile(join(log_dir, "energies.csv"))
+
+
+def load_unfinished_variants(log_dir):
+    """ the variants of the job's variant list that don't have a record in its energies.csv, or None if the
+        variant list can't be found """
+    job_variants = load_job_variants(log_dir)
+    if job_variants is None:
+        return None
+
+    completed = set()
+    energies_fn = join(log_dir, "energies.csv")
+    if isfile(energies_fn):
+        try:
+            edf = load_energies(energies_fn)
+            completed = {"{} {}".format(pdb_fn, variant) for pdb_fn, variant in zip(edf["pdb_fn"], edf["variant"])}
+        except pd.errors.EmptyDataError:
+            # the job was stopped while writing the header of its first record
+            pass
+    return [v for v in job_variants if v not in completed]
+
+
 def check_for_failed_jobs(energize_out_d):
-    """ check for failed jobs on basis of missing energies.csv, return failed job numbers """
+    """ check for failed jobs on basis of a missing completion marker or energies.csv (see job_succeeded), return
+        failed job numbers. the variants that failed log dirs didn't get to are reported with the failed variants
+        when the job's variant list can be found """
 
     # get all the job output directories / log directories
     job_out_dirs = [join(energize_out_d, jd) for jd in os.listdir(energize_out_d) if isdir(join(energize_out_d, jd))]
@@ -106,16 +188,18 @@ def check_for_failed_jobs(energize_out_d):
         for jd in job_out_dirs:
             total_log_dirs += 1
             # keep track of how many of this job's log dirs succeeded
-            if not isfile(join(jd, "energies.csv")):
-                # this log dir doesn't have energies.csv, so it is a failed log dir
+            if not job_succeeded(jd):
+                # the job stopped before it finished
                 failed_log_dirs.append(job_id)
+                unfinished = load_unfinished_variants(jd)
+                if unfinished is not None:
+                    failed_variants += unfinished
             else:
                 num_succeeded += 1
-                # this job has energies.csv, so it succeeded overall, but check for any failed variants
+                # this job finished, so it succeeded overall, but check for any failed variants
                 fv = []
                 if isfile(join(jd, "failed.txt")):
-                    with open(join(jd, "failed.txt"), "r") as f:
-                        fv = f.read().splitlines()
+                    fv = load_failed_variants(join(jd, "failed.txt"))
                 failed_variants += fv
 
         # if this job had zero successful log dirs, it is a completely failed job
@@ -228,7 +312,7 @@ def load_multi_job_results(energize_out_d):
         # try to load the dataframes for this job
         # wrap in a try-except because I was having problems with some files
         try:
-            edf = pd.read_csv(energies_fn)
+            edf = load_energies(energies_fn)
             jdf = pd.read_csv(job_fn, index_col=0, header=None).T
             hdf = pd.read_csv(hparam_fn, index_col=0, header=None).T
         except (pd.errors.EmptyDataError, pd.errors.ParserError) as e:
@@ -0,0 +1,217 @@
+""" offline benchmark of the orchestration overhead of energize.py and the docking.py protocols
+    runs each script on variant lists of different sizes using the fake Rosetta binaries from fake_rosetta.py
+    and reports variants/second and the time spent in each phase of the run """
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from os.path import join, dirname, abspath, basename
+
+import pandas as pd
+
+import energize
+
+REPO_DIR = dirname(dirname(abspath(__file__)))
+
+SADA_PDB = "SadA_NSLeu_Corrected_3701_best_structure_0044_correct_seq_2024_3_6_unrelaxed_ver_2021.36" \
+           "+release.57ac713_p.pdb"
+
+# the script and its extra args, the default args file, pdb file, and chain for each benchmark
+SCRIPTS = {
+    "energize": ("energize.py", [], "energize_args/example.txt", "2qmt_p.pdb", "A"),
+    "gb1_docking": ("docking.py", ["--protocol", "gb1"], "docking_args/gb1_1fcc_condor_set_1.txt",
+                    "1FCC_rosetta_best.pdb", "C"),
+    "sadA_docking": ("docking.py", ["--protocol", "sadA"], "docking_args/sadA_docking_set_1.txt", SADA_PDB, "A"),
+    "sadA_andres_docking": ("docking.py", ["--protocol", "sadA_andres"], "docking_args/sadA_docking_set_1.txt",
+                            SADA_PDB, "A"),
+}
+
+THREE_TO_ONE = {
+    "ALA": "A", "CYS": "C", "ASP": "D", "GLU": "E", "PHE": "F", "GLY": "G", "HIS": "H", "ILE": "I", "LYS": "K",
+    "LEU": "L", "MET": "M", "ASN": "N", "PRO": "P", "GLN": "Q", "ARG": "R", "SER": "S", "THR": "T", "VAL": "V",
+    "TRP": "W", "TYR": "Y"
+}
+
+
+def setup_fake_rosetta(fake_main_dir):
+    """ create a rosetta main dir with wrapper scripts that call fake_rosetta.py, at the same paths
+        energize.get_rosetta_paths() resolves for the real binaries """
+    relax_bin_fn, rosetta_scripts_bin_fn, score_jd2_bin_fn, database_path = energize.get_rosetta_paths(fake_main_dir)
+    os.makedirs(dirname(relax_bin_fn), exist_ok=True)
+    os.makedirs(database_path, exist_ok=True)
+
+    fake_rosetta_fn = join(dirname(abspath(__file__)), "fake_rosetta.py")
+    for app, bin_fn in [("relax", relax_bin_fn), ("rosetta_scripts", rosetta_scripts_bin_fn),
+                        ("score_jd2", score_jd2_bin_fn)]:
+        with open(bin_fn, "w") as f:
+            f.write("#!/bin/sh\nexec \"{}\" \"{}\" {} \"$@\"\n".format(sys.executable, fake_rosetta_fn, app))
+        os.chmod(bin_fn, 0o755)
+
+
+def get_residues(pdb_fn, chain):
+    """ (residue number, one-letter amino acid) of each residue in the given chain, from the CA atoms """
+    residues = []
+    with open(pdb_fn, "r") as f:
+        for line in f:
+            if line.startswith("ATOM") and line[12:16] == " CA " and line[21] == chain:
+                residues.append((int(line[22:26]), THREE_TO_ONE.get(line[17:20], "X")))
+    return residues
+
+
+def gen_variant_list(pdb_fn, chain, num_variants, out_fn):
+    """ write a list of distinct single-mutation variants, cycling through positions first """
+    residues = [r for r in get_residues(pdb_fn, chain) if r[1] != "X"]
+    aas = sorted(set(THREE_TO_ONE.values()))
+    with open(out_fn, "w") as f:
+        for i in range(num_variants):
+            resnum, wt_aa = residues[i % len(residues)]
+            mut_aas = [aa for aa in aas if aa != wt_aa]
+            f.write("{} {}{}{}\n".format(basename(pdb_fn), wt_aa, resnum, mut_aas[(i // len(residues)) % 19]))
+
+
+def run_benchmark(script, num_variants, args, work_dir):
+    """ run a single script on a variant list of the given size, returns a dict with the timing results """
+    script_fn, script_args, args_fn, pdb_basename, chain = SCRIPTS[script]
+    pdb_dir = join(REPO_DIR, "pdb_files", "prepared_pdb_files")
+
+    variants_fn = join(work_dir, "{}_{}_variants.txt".format(script, num_variants))
+    gen_variant_list(join(pdb_dir, pdb_basename), chain, num_variants, variants_fn)
+
+    log_dir_base = join(work_dir, "{}_{}_output".format(script, num_variants))
+    cmd = [sys.executable, join("code", script_fn)] + script_args + \
+        ["@{}".format(args_fn),
+         "--rosetta_main_dir", join(work_dir, "rosetta"),
+         "--pdb_dir", pdb_dir,
+         "--variants_fn", variants_fn,
+         "--log_dir_base", log_dir_base]
+    if script == "energize":
+        # cached results would skip rosetta altogether
+        cmd += ["--no_cache"] + args.energize_args.split()
+    else:
+        cmd += args.docking_args.split()
+
+    env = dict(os.environ, FAKE_ROSETTA_SLEEP=str(args.step_sleep), FAKE_ROSETTA_FAIL_RATE=str(args.fail_rate))
+
+    # timestamp the script's output to split the run into phases
+    first_variant_time = None
+    last_variant_time = None
+    start = time.time()
+    p = subprocess.Popen(cmd, cwd=REPO_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                         universal_newlines=True)
+    output = []
+    for line in p.stdout:
+        output.append(line)
+        if line.startswith("Running Rosetta on variant") and first_variant_time is None:
+            first_variant_time = time.time()
+        elif line.startswith("Processing variant"):
+            last_variant_time = time.time()
+    return_code = p.wait()
+    end = time.time()
+
+    if first_variant_time is None or last_variant_time is None:
+        print("".join(output[-20:]), flush=True)
+        raise RuntimeError("{} did not process any variants (return code {})".format(script, return_code))
+
+    # the step wall times recorded for each variant are the time spent in (fake) rosetta
+    log_dir = join(log_dir_base, os.listdir(log_dir_base)[0])
+    energies_df = pd.read_csv(join(log_dir, "energies.csv"))
+    wall_time_cols = [col for col in energies_df.columns if col.endswith("_wall_time")]
+    rosetta_time = energies_df[wall_time_cols].sum().sum()
+    num_steps = energies_df[wall_time_cols].notna().sum().sum()
+
+    loop_time = last_variant_time - first_variant_time
+    return {"script": script,
+            "num_variants": num_variants,
+            "num_completed": len(energies_df),
+            "return_code": return_code,
+            "wall_time": end - start,
+            "variants_per_sec": len(energies_df) / (end - start),
+            # python startup, imports, and job setup before the first variant
+            "startup_time": first_variant_time - start,
+            # time in the variant loop that isn't spent in rosetta (prep, parsing, cleanup)
+            # for concurrent runs, rosetta time overlaps, so this is only meaningful for serial runs
+            "variant_overhead": (loop_time - rosetta_time) / len(energies_df),
+            # time to start each rosetta process and write its outputs, beyond the configured sleep
+            "step_overhead": rosetta_time / num_steps - args.step_sleep,
+            # combining outputs and cleanup after the last variant
+            "teardown_time": end - last_variant_time}
+
+
+def main(args):
+    work_dir = tempfile.mkdtemp(prefix="benchmark_", dir=args.work_dir)
+    try:
+        setup_fake_rosetta(join(work_dir, "rosetta"))
+
+        results = []
+        for script in args.scripts:
+            for num_variants in args.list_sizes:
+                print("Benchmarking {} with {} variants".format(script, num_variants), flush=True)
+                results.append(run_benchmark(script, num_variants, args, work_dir))
+
+        results_df = pd.DataFrame(results)
+        print(results_df.to_string(index=False, float_format="{:.3f}".format), flush=True)
+        if args.out_fn is not None:
+            results_df.to_csv(args.out_fn, index=False)
+    finally:
+        if not args.keep_outputs:
+            shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        fromfile_prefix_chars="@")
+
+    parser.add_argument("--scripts",
+                        help="which scripts to benchmark",
+                        type=str,
+                        nargs="+",
+                        choices=list(SCRIPTS.keys()),
+                        default=list(SCRIPTS.keys()))
+
+    parser.add_argument("--list_sizes",
+                        help="number of variants in each benchmark run",
+                        type=int,
+                        nargs="+",
+                        default=[1, 10, 50])
+
+    parser.add_argument("--step_sleep",
+                        help="seconds each fake rosetta process sleeps, to stand in for rosetta's run time",
+                        type=float,
+                        default=0.0)
+
+    parser.add_argument("--fail_rate",
+                        help="probability that a fake rosetta process fails, to benchmark the retry path",
+                        type=float,
+                        default=0.0)
+
+    parser.add_argument("--energize_args",
+                        help="additional arguments for energize.py, for example \"--num_workers 4 --silent_io\"",
+                        type=str,
+                        default="")
+
+    parser.add_argument("--docking_args",
+                        help="additional arguments for docking.py, for example \"--num_workers 4 --dock_procs 2\"",
+                        type=str,
+                        default="")
+
+    parser.add_argument("--work_dir",
+                        help="directory for the fake rosetta install, variant lists, and outputs",
+                        type=str,
+                        default=None)
+
+    parser.add_argument("--keep_outputs",
+                        help="set this flag to keep the work directory after the benchmark",
+                        action="store_true")
+
+    parser.add_argument("--out_fn",
+                        help="save the benchmark results to this csv file",
+                        type=str,
+                        default=None)
+
+    main(parser.parse_args())
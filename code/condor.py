@@ -25,6 +25,13 @@ import warnings
 warnings.filterwarnings("ignore", message="Ignoring unrecognized record ")
 warnings.filterwarnings("ignore", message="'HEADER' line not found; can't determine PDB ID.")
 
+# the docking run types and the docking.py protocol (see docking.PROTOCOLS) each of them runs
+DOCKING_PROTOCOLS = {
+    "energize_docking": "gb1",
+    "energize_docking_sadA": "sadA",
+    "energize_andres_docking_sadA": "sadA_andres",
+}
+
 
 def get_run_dir_name(run_name="unnamed"):
     dir_name_str = "condor_energize_{}_{}"
@@ -47,6 +54,24 @@ def expected_runtime(seq_len):
     return (0.52 * seq_len) + 28.50
 
 
+def collapse_wt_duplicates(pdbs_variants):
+    """ keep only the first "_wt" entry of each PDB, duplicates can come from combining several master lists
+        the WT only has to run once per PDB, and with --wt_baseline, energize computes it once per job anyway """
+    seen_pdbs = set()
+    collapsed = []
+    for pdb_v in pdbs_variants:
+        tokens = pdb_v.split()
+        if len(tokens) == 2 and tokens[1] == "_wt":
+            if tokens[0] in seen_pdbs:
+                continue
+            seen_pdbs.add(tokens[0])
+        collapsed.append(pdb_v)
+
+    if len(collapsed) < len(pdbs_variants):
+        print("collapsed {} duplicate _wt entries".format(len(pdbs_variants) - len(collapsed)))
+    return collapsed
+
+
 def gen_args(master_variant_fn, variants_per_job, out_dir, keep_sep_files=False):
     """generate arguments files from the master variant list"""
 
@@ -55,6 +80,7 @@ def gen_args(master_variant_fn, variants_per_job, out_dir, keep_sep_files=False)
     for mv_fn in master_variant_fn:
         with open(mv_fn, "r") as f:
             pdbs_variants += f.read().splitlines()
+    pdbs_variants = collapse_wt_duplicates(pdbs_variants)
 
     if variants_per_job == -1:
 
@@ -183,20 +209,29 @@ def check_pass_file(pass_fn="htcondor/templates/pass.txt"):
                       "Please change the password in pass.txt to the one you used to encrypt Rosetta.")
 
 
+def add_protocol_arg(args_fn, protocol):
+    """ append the docking protocol to an args file, after any --protocol already in it so this one takes effect """
+    with open(args_fn, "r") as f:
+        contents = f.read()
+    # the args files don't always end with a newline, and a blank line would be read as an empty argument
+    if contents != "" and not contents.endswith("\n"):
+        contents += "\n"
+    with open(args_fn, "w") as f:
+        f.write("{}--protocol\n{}\n".format(contents, protocol))
+
+
 def prep_energize(args):
     """
     Prepare a condor run for calculating Rosetta energies
     """
 
-    # supports original energies (energize.py) or docking for GB1 docking energies (gb1_docking.py)
+    # supports original energies (energize.py) or docking (docking.py), where the run type selects the protocol
     if args.run_type == "energize":
         pyscript = "energize.py"
-    elif args.run_type == "energize_docking":
-        pyscript = "gb1_docking.py"
-    elif args.run_type == "energize_docking_sadA":
-        pyscript = "sadA_docking.py"
-    elif args.run_type == "energize_andres_docking_sadA":
-        pyscript = "sadA_docking_andres_protocol.py"
+        docking_protocol = None
+    elif args.run_type in DOCKING_PROTOCOLS:
+        pyscript = "docking.py"
+        docking_protocol = DOCKING_PROTOCOLS[args.run_type]
     else:
         raise ValueError("Invalid run type: {}".format(args.run_type))
 
@@ -231,7 +266,9 @@ def prep_energize(args):
                          osdf_python_distribution=args.osdf_python_distribution,
                          osdf_rosetta_distribution=args.osdf_rosetta_distribution,
                          additional_data_files=additional_files,
-                         save_dir=out_dir)
+                         save_dir=out_dir,
+                         request_cpus=args.request_cpus,
+                         checkpoint_exit_code=args.checkpoint_exit_code)
 
     # copy over energize.sub and run.sh and the pass.txt
     # shutil.copy("htcondor/templates/energize.sub", out_dir)
@@ -241,6 +278,8 @@ def prep_energize(args):
 
     # copy over energize args and rename to standard filename
     shutil.copyfile(args.energize_args_fn, join(out_dir, "energize_args.txt"))
+    if docking_protocol is not None:
+        add_protocol_arg(join(out_dir, "energize_args.txt"), docking_protocol)
 
     # create output directories where jobs will place their outputs
     os.makedirs(join(out_dir, "output/condor_logs"))
@@ -251,7 +290,9 @@ def fill_submit_template(template_fn: str,
                          osdf_python_distribution: Optional[str],
                          osdf_rosetta_distribution: Optional[str],
                          additional_data_files: Optional[list[str]],
-                         save_dir: str):
+                         save_dir: str,
+                         request_cpus: int = 1,
+                         checkpoint_exit_code: Optional[int] = None):
 
     template_lines = load_lines(template_fn)
     template_str = "\n".join(template_lines)
@@ -281,6 +322,19 @@ def fill_submit_template(template_fn: str,
     if "{transfer_input_files}" in template_str:
         format_dict["transfer_input_files"] = transfer_input_files_str
 
+    # number of cpus per job (should match --num_workers in the energize args when running a worker pool)
+    if "{request_cpus}" in template_str:
+        format_dict["request_cpus"] = request_cpus
+
+    # HTCondor self-checkpointing. when the job exits with checkpoint_exit_code, HTCondor transfers the output
+    # directory (which holds the checkpoint and the partial energies.csv) and restarts the job
+    if "{checkpoint_settings}" in template_str:
+        if checkpoint_exit_code is not None:
+            format_dict["checkpoint_settings"] = "checkpoint_exit_code = {}\n" \
+                                                 "transfer_checkpoint_files = output".format(checkpoint_exit_code)
+        else:
+            format_dict["checkpoint_settings"] = ""
+
     template_str = template_str.format(**format_dict)
 
     with open(join(save_dir, basename(template_fn)), "w") as f:
@@ -430,7 +484,7 @@ def prep_additional_data_files(additional_data_files, run_dir, additional_data_d
 
 
 def main(args):
-    if args.run_type in ["energize", "energize_docking","energize_docking_sadA",'energize_andres_docking_sadA']:
+    if args.run_type == "energize" or args.run_type in DOCKING_PROTOCOLS:
         prep_energize(args)
     elif args.run_type == "prepare":
         prep_prepare(args)
@@ -446,8 +500,7 @@ if __name__ == "__main__":
                         help="prepare or energize",
                         type=str,
                         default="energize",
-                        choices=["prepare", "energize", "energize_docking","energize_docking_sadA",
-                                 'energize_andres_docking_sadA'])
+                        choices=["prepare", "energize"] + list(DOCKING_PROTOCOLS.keys()))
 
     parser.add_argument("--run_name",
                         help="name for this condor run, used for log directory",
@@ -468,6 +521,18 @@ if __name__ == "__main__":
                         type=int,
                         help="the number of variants per job")
 
+    parser.add_argument("--request_cpus",
+                        type=int,
+                        help="number of cpus to request for each job. set this to match --num_workers "
+                             "in the energize args file to run variants concurrently on the execute node",
+                        default=1)
+
+    parser.add_argument("--checkpoint_exit_code",
+                        type=int,
+                        help="enable HTCondor self-checkpointing with this exit code. the energize args file "
+                             "should set --checkpoint, --checkpoint_interval, and the same --checkpoint_exit_code",
+                        default=None)
+
     parser.add_argument("--osdf_python_distribution",
                         type=str,
                         help="text file containing the OSDF paths to Python distribution files",
@@ -0,0 +1,565 @@
+""" docking engine for the docking pipelines (GB1 docking and the sadA ligand docking protocols)
+    each protocol is an entry in the PROTOCOLS registry: its template directory, the files it needs in the working
+    directory, the ligand params, the docking flags, and the column the best docked structure is selected by.
+    all protocols share energize.py's variant runner: the local worker pool (--num_workers), the template directory
+    staged once per job, and records streamed to energies.csv as soon as each variant finishes
+
+    python code/docking.py --protocol gb1 @docking_args/gb1_1fcc_condor_set_1.txt --variants_fn <variants> """
+
+import argparse
+import functools
+import os
+import shutil
+import sys
+import time
+import uuid
+from os.path import isdir, join, basename, abspath, dirname
+
+import shortuuid
+
+import energize
+import log_capture
+import adaptive
+import fanout
+import ligands
+import wd_archive
+from resources import run_measured, empty_usage, flatten_usage, usage_columns
+from results import append_record, mark_job_done
+from workdirs import get_wd_root, stage_template_dir, link_file
+from templates import gen_mutate_residue_xml_str
+
+# the docking protocols, selected with --protocol
+#   template_dir: the protocol's files, staged once per job and linked into each working directory
+#   static_files: files from the template dir that are used as they are
+#   ligand_files: ligand params and conformer libraries, staged once per job and referenced by absolute path
+#                 (see ligands.py) instead of being placed in every working directory
+#   ligand_params: the params files passed to the docking step with -extra_res_fa
+#   ligand_options_files: options files that load the ligand params, linked in with the absolute params paths
+#   mutate_xml: the (template, output) of the rosetta scripts xml that gets the variant's MutateResidue movers
+#   mutate_step: whether there is a separate mutate step (@options_mutate.txt, running mutate.xml) before docking.
+#                without it, the mutations are part of the docking protocol xml and docking starts from structure.pdb
+#   dock_protocol: the rosetta scripts xml of the docking step
+#   dock_flags: the remaining flags of the docking step
+#   sort_col: the score column used to select the best docked structure (and for adaptive sampling)
+PROTOCOLS = {
+    "gb1": {
+        "template_dir": "templates/docking_wd_template",
+        "static_files": ["docking_minimize.xml", "docking_minimize_fast.xml",
+                         "options_dock.txt", "options_mutate.txt", "protein_dock_fast.sh"],
+        "ligand_files": [],
+        "ligand_params": [],
+        "ligand_options_files": [],
+        "mutate_xml": ("mutate_template.xml", "mutate.xml"),
+        "mutate_step": True,
+        "dock_protocol": "docking_minimize_fast.xml",
+        "dock_flags": ["-docking:partners A_C",
+                       "-use_input_sc",
+                       "-ex1",
+                       "-ex2",
+                       "-score:weights", "ref2015.wts"],
+        "sort_col": "dG_separated",
+    },
+    "sadA": {
+        "template_dir": "templates/sadA_docking_wd_template",
+        "static_files": ["docking_minimize.xml", "docking_minimize_fast.xml", "protein_dock_fast.sh"],
+        "ligand_files": ["AKG.params", "NEU.params", "NEU_conformers.pdb"],
+        "ligand_params": ["AKG.params", "NEU.params"],
+        "ligand_options_files": ["options_dock.txt", "options_mutate.txt"],
+        "mutate_xml": ("mutate_template.xml", "mutate.xml"),
+        "mutate_step": True,
+        "dock_protocol": "docking_minimize_fast.xml",
+        "dock_flags": ["-use_input_sc",
+                       "-ex1",
+                       "-ex2",
+                       "-no_optH", "false",
+                       "-flip_HNQ", "true",
+                       "-ignore_ligand_chi", "true",
+                       "-restore_pre_talaris_2013_behavior", "true"],
+        "sort_col": "total_score",
+    },
+    # andres' protocol mutates and docks in a single rosetta scripts run
+    "sadA_andres": {
+        "template_dir": "templates/sadA_docking_andres_template",
+        "static_files": [],
+        "ligand_files": ["AKG.params", "NEU.params", "NEU_conformers.pdb"],
+        "ligand_params": ["AKG.params", "NEU.params"],
+        "ligand_options_files": [],
+        "mutate_xml": ("temp_2021.36+release.57ac713.xml", "final_docking_2021.36+release.57ac713.xml"),
+        "mutate_step": False,
+        "dock_protocol": "final_docking_2021.36+release.57ac713.xml",
+        "dock_flags": ["-restore_pre_talaris_2013_behavior", "true",
+                       "-in:auto_setup_metals",
+                       "-ex1",
+                       "-ex2",
+                       "-no_optH", "false",
+                       "-flip_HNQ", "true",
+                       "-ignore_ligand_chi", "true"],
+        "sort_col": "total_score",
+    },
+}
+
+
+def run_mutate_step(rosetta_scripts_bin_fn, database_path, working_dir):
+
+    # the input structure is assumed to be "structure.pdb"
+    # setting this up is handled in the prep_working_dir() function
+    structure_fn = "structure.pdb"
+
+    # note that options_mutate.txt specifies an output directory of "mutated_structures"
+    # the output of this step is "mutated_structures/structure_0001.pdb"
+    mutate_cmd = [rosetta_scripts_bin_fn,
+                  '-database', database_path,
+                  "-in:file:s", structure_fn,
+                  "-nstruct", "1",
+                  "-out:file:scorefile", "mutate.sc",
+                  "@options_mutate.txt",
+                  ]
+
+    mutate_out_fn = join(working_dir, "mutate.out")
+    return_code, usage = run_measured(mutate_cmd, working_dir, mutate_out_fn, step="mutate")
+    if return_code != 0:
+        raise energize.RosettaError("Mutate step did not execute successfully. Return code: {}".format(return_code),
+                                    out_fn=mutate_out_fn, return_code=return_code)
+    return usage
+
+
+def get_dock_cmd(rosetta_scripts_bin_fn, database_path, protocol, ligand_dir):
+    """ the docking command of the protocol, without -nstruct and the score file (see run_docking_step) """
+    in_structure_fn = "mutated_structures/structure_0001.pdb" if protocol["mutate_step"] else "structure.pdb"
+
+    dock_cmd = [rosetta_scripts_bin_fn,
+                "-database", database_path,
+                "-in:file:s", in_structure_fn]
+    dock_cmd += ligands.get_params_args(ligand_dir, protocol["ligand_params"])
+    dock_cmd += protocol["dock_flags"]
+    dock_cmd += ["-out:path:all", "docked_structures",
+                 "-out:overwrite",
+                 "-parser:protocol", protocol["dock_protocol"]]
+    return dock_cmd
+
+
+def run_docking_step(rosetta_scripts_bin_fn: str,
+                     database_path: str,
+                     protocol: dict,
+                     num_structs: int,
+                     working_dir: str,
+                     adaptive_hparams: dict = None,
+                     dock_procs: int = 1,
+                     dock_seed: int = None):
+
+    # the ligand params were staged once for the job, next to the working directories (see prep_working_dir)
+    ligand_dir = ligands.get_ligand_dir(protocol["template_dir"], dirname(abspath(working_dir)))
+    dock_cmd = get_dock_cmd(rosetta_scripts_bin_fn, database_path, protocol, ligand_dir)
+
+    # with fan-out, the structures are split across dock_procs concurrent processes with distinct seeds
+    # (see fanout.py). the seeds and structure counts of the processes are recorded in dock_seeds
+    dock_seeds = []
+    if dock_procs > 1 and dock_seed is None:
+        dock_seed = fanout.draw_base_seed()
+
+    def run_increment(increment_num, nstruct):
+        dock_out_fn = adaptive.increment_out_fn(join(working_dir, "dock.out"), increment_num)
+        if dock_procs > 1:
+            # later increments continue from the seeds of the earlier ones
+            return_code, dock_out_fn, usage = fanout.run_fanout(dock_cmd + adaptive.increment_args(increment_num),
+                                                                working_dir, dock_out_fn, "docked_structures",
+                                                                "docked_score.sc", nstruct, dock_procs,
+                                                                dock_seed + increment_num * dock_procs, dock_seeds,
+                                                                step="dock")
+        else:
+            cmd = dock_cmd + ["-nstruct", str(nstruct), "-out:file:scorefile", "docked_score.sc"] + \
+                adaptive.increment_args(increment_num)
+            return_code, usage = run_measured(cmd, working_dir, dock_out_fn, step="dock")
+        if return_code != 0:
+            raise energize.RosettaError("Docking step did not execute successfully. "
+                                        "Return code: {}".format(return_code),
+                                        out_fn=dock_out_fn, return_code=return_code)
+        return usage
+
+    # with adaptive sampling, docking stops early once the lowest value of the protocol's sort column converges
+    # (see adaptive.py). returns the resource usage, the number of structures that were generated, and the seeds
+    if adaptive_hparams is not None and adaptive.is_adaptive(adaptive_hparams):
+        usage, num_structs_used = adaptive.run_adaptive(run_increment,
+                                                        join(working_dir, "docked_structures", "docked_score.sc"),
+                                                        protocol["sort_col"], num_structs, adaptive_hparams)
+    else:
+        usage, num_structs_used = run_increment(0, num_structs), num_structs
+    return usage, num_structs_used, fanout.format_seeds(dock_seeds)
+
+
+def run_docking_pipeline(rosetta_main_dir: str,
+                         working_dir: str,
+                         protocol: dict,
+                         num_structs: int,
+                         adaptive_hparams: dict = None,
+                         dock_procs: int = 1,
+                         dock_seed: int = None):
+
+    # keep track of how long it takes to run Rosetta
+    all_start = time.time()
+
+    # get the paths to the rosetta binaries and database
+    relax_bin_fn, rosetta_scripts_bin_fn, score_jd2_bin_fn, database_path = energize.get_rosetta_paths(rosetta_main_dir)
+
+    # resource usage of each rosetta subprocess
+    usage = {"mutate": empty_usage(), "dock": empty_usage()}
+
+    # run the mutate step (protocols without one mutate as part of docking)
+    mt_run_time = 0
+    if protocol["mutate_step"]:
+        mt_start_time = time.time()
+        usage["mutate"] = run_mutate_step(rosetta_scripts_bin_fn, database_path, working_dir)
+        mt_run_time = time.time() - mt_start_time
+
+    # run docking step
+    dock_start_time = time.time()
+    usage["dock"], num_structs_used, dock_seeds = run_docking_step(rosetta_scripts_bin_fn, database_path, protocol,
+                                                                   num_structs, working_dir, adaptive_hparams,
+                                                                   dock_procs, dock_seed)
+    dock_run_time = time.time() - dock_start_time
+
+    # keep track of how long it takes to run all steps
+    all_run_time = time.time() - all_start
+
+    run_times = {
+        "mutate": mt_run_time,
+        "dock": dock_run_time,
+        "all": all_run_time,
+        "num_structs_used": num_structs_used,
+        "dock_seeds": dock_seeds,
+    }
+
+    # add the detailed resource usage of each step (e.g. dock_user_time, dock_max_rss_mb)
+    run_times.update(flatten_usage(usage))
+    return run_times
+
+
+def gen_mutate_xml(template_fn, variant, chain, out_fn):
+    """ fill in the MutateResidue movers of the variant in a rosetta scripts xml template """
+    with open(out_fn, "w") as f:
+        f.write(gen_mutate_residue_xml_str(template_fn, variant, chain))
+
+
+def prep_working_dir(protocol, working_dir, pdb_fn, chain, variant):
+    """ prep a fresh working directory by linking over files from the protocol's template directory, and filling in
+        the variant's mutate xml """
+
+    # if the working directory exists from a previously failed variant, remove it before starting new variant
+    if isdir(working_dir):
+        shutil.rmtree(working_dir)
+    os.mkdir(working_dir)
+
+    # create additional subdirectories for intermediate outputs
+    os.makedirs(join(working_dir, "mutated_structures"))  # for output of rosetta scripts
+    os.makedirs(join(working_dir, "docked_structures"))  # for Rosetta docking output
+
+    # copy over PDB file into rosetta working dir and rename it to structure.pdb
+    shutil.copyfile(pdb_fn, join(working_dir, "structure.pdb"))
+
+    # the template dir is staged once per job next to the working dirs, so the files that don't change are
+    # usually hardlinks on the same filesystem rather than fresh copies for every variant
+    static_dir = stage_template_dir(protocol["template_dir"], dirname(abspath(working_dir)))
+    for fn in protocol["static_files"]:
+        link_file(join(static_dir, fn), working_dir)
+
+    # the ligand params and conformer libraries are only placed once per job, the working directory just gets
+    # the options files that point at them
+    if len(protocol["ligand_files"]) > 0:
+        ligand_dir = ligands.stage_ligands(protocol["template_dir"], protocol["ligand_files"],
+                                           protocol["ligand_options_files"], dirname(abspath(working_dir)))
+        for fn in protocol["ligand_options_files"]:
+            link_file(join(ligand_dir, fn), working_dir)
+
+    # create the mutate xml from the staged template
+    template_fn, xml_fn = protocol["mutate_xml"]
+    gen_mutate_xml(join(static_dir, template_fn), variant, chain, join(working_dir, xml_fn))
+
+
+def run_single_variant(rosetta_main_dir, pdb_fn, chain, variant, rosetta_hparams, job_uuid,
+                       results_fn, output_dir, save_wd=False, working_dir="docking_wd", cache_fn=None,
+                       dock_procs=1, dock_seed=None):
+    """ dock a single variant with the protocol in rosetta_hparams and append its record to results_fn
+        same signature as energize.run_single_variant, so it can be the run_fn of energize's variant runners.
+        docking doesn't use the result cache, so cache_fn is ignored """
+
+    start_time = time.time()
+
+    protocol = PROTOCOLS[rosetta_hparams["protocol"]]
+
+    # set up the working directory (copies the pdb file, sets up the rosetta scripts, etc.)
+    prep_working_dir(protocol, working_dir, pdb_fn, chain, variant)
+
+    run_times = run_docking_pipeline(rosetta_main_dir,
+                                     working_dir,
+                                     protocol,
+                                     rosetta_hparams["num_structs"],
+                                     rosetta_hparams,
+                                     dock_procs,
+                                     dock_seed)
+
+    # parse the output files into a single-record csv, appending info about variant
+    # this selects the docked structure w/ the lowest value of the protocol's sort column
+    full_df = energize.parse_score_sc(score_sc_fn=join(working_dir, "docked_structures", "docked_score.sc"),
+                                      agg_method="min_energy_first",
+                                      sort_col=protocol["sort_col"])
+
+    # append info about this variant
+    full_df.insert(0, "pdb_fn", [basename(pdb_fn)])
+    full_df.insert(1, "variant", [variant])
+    full_df.insert(2, "job_uuid", [job_uuid])
+    full_df.insert(3, "start_time", [time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(start_time))])
+    full_df.insert(4, "run_time", [int(run_times["all"])])
+    full_df.insert(5, "mutate_run_time", [int(run_times["mutate"])])
+    full_df.insert(6, "dock_run_time", [int(run_times["dock"])])
+
+    # resource usage of each rosetta subprocess goes right after the run times
+    usage_cols = usage_columns(["mutate", "dock"])
+    for col_num, col in enumerate(usage_cols, start=7):
+        full_df.insert(col_num, col, [run_times[col]])
+
+    # the number of docked structures the best one was selected from (fewer than num_structs when adaptive
+    # sampling stopped early)
+    full_df.insert(7 + len(usage_cols), "num_structs_used", [int(run_times["num_structs_used"])])
+
+    # the seed and number of structures of each fan-out process, to reproduce the docked structures
+    full_df.insert(8 + len(usage_cols), "dock_seeds", [run_times["dock_seeds"]])
+
+    # the record is appended to the job-level results file as soon as the variant finishes
+    append_record(results_fn, full_df)
+
+    # if the flag is set, save all files in the working directory for this variant
+    # these go directly into the archive in the output directory
+    if save_wd:
+        wd_archive.save_wd(working_dir, output_dir, "wd_{}_{}".format(basename(pdb_fn), variant))
+
+    # clean up the working dir in preparation for next variant
+    shutil.rmtree(working_dir)
+
+    return run_times["all"]
+
+
+def main(args):
+
+    # rough script start time for logging
+    # this will be logged in UTC time (GM time) in the log directory name and output files
+    script_start = time.time()
+
+    # only keep a compressed summary of the rosetta logs of successful steps
+    log_capture.configure(args.log_tail_lines, args.full_logs)
+
+    # load the variants that will be processed with this run
+    # this file contains a line for each variant
+    # and each line contains the pdb file and the comma-delimited substitutions (e.g. "2qmt_p.pdb A23P,R67L")
+    with open(args.variants_fn, "r") as f:
+        pdbs_variants = f.read().splitlines()
+
+    # the docking protocols mutate the structure before docking it, there is no WT path yet. reject the whole list
+    # up front rather than failing partway through the job
+    wt_lines = [pdb_variant for pdb_variant in pdbs_variants if pdb_variant.split()[1] == "_wt"]
+    if len(wt_lines) > 0:
+        raise ValueError("docking doesn't support the WT (_wt) variant, remove these lines from {}: {}".format(
+            args.variants_fn, ", ".join(wt_lines)))
+
+    # generate a unique identifier for this run
+    job_uuid = shortuuid.encode(uuid.uuid4())[:12]
+
+    # create the log directory for this job
+    log_dir = join(args.log_dir_base, energize.get_log_dir_name(args, job_uuid, script_start))
+    os.makedirs(log_dir)
+
+    # save the argparse arguments back out to a file
+    energize.save_argparse_args(vars(args), join(log_dir, "args.txt"))
+
+    # save job info
+    energize.save_job_info(script_start, job_uuid, args.cluster, args.process, args.commit_id, log_dir)
+
+    # create a dictionary of just rosetta hyperparameters that can be passed around throughout functions and saved
+    # the protocol is saved with them, so every job records which docking protocol produced its energies
+    rosetta_hparams = {"protocol": args.protocol, "num_structs": args.num_structs}
+    rosetta_hparams.update(adaptive.get_adaptive_hparams(args))
+    energize.save_csv_from_dict(join(log_dir, "hparams.csv"), rosetta_hparams)
+
+    # each variant's record is appended to energies.csv in the log directory as soon as the variant finishes
+    results_fn = join(log_dir, "energies.csv")
+
+    # the per-variant working directories go on a fast path (like /dev/shm) when there is room
+    wd_root = get_wd_root(args.wd_base, job_uuid, args.wd_min_free_gb)
+
+    # the variants run through energize's runners, with docking in place of the energize pipeline
+    run_fn = functools.partial(run_single_variant, dock_procs=args.dock_procs, dock_seed=args.dock_seed)
+    try:
+        if args.num_workers > 1:
+            failed, _ = energize.run_variants_pool(pdbs_variants, args, rosetta_hparams, job_uuid, results_fn,
+                                                   log_dir, wd_root=wd_root, run_fn=run_fn)
+        else:
+            failed, _ = energize.run_variants_serial(pdbs_variants, args, rosetta_hparams, job_uuid, results_fn,
+                                                     log_dir, wd_root=wd_root, run_fn=run_fn)
+    finally:
+        # don't leave anything behind, especially on /dev/shm which is shared with other jobs on the node
+        shutil.rmtree(wd_root, ignore_errors=True)
+
+    # save a txt file with failed variants (if there are failed variants)
+    # each line is the variant, the failure class, and the log signature, separated by tabs
+    if len(failed) > 0:
+        with open(join(log_dir, "failed.txt"), "w") as f:
+            for fv in failed:
+                f.write("{}\t{}\t{}\n".format(*fv))
+
+    # the job went through its whole variant list
+    mark_job_done(log_dir)
+
+    if (len(failed) / len(pdbs_variants)) > args.allowable_failure_fraction:
+        # too many variants failed in this job. exit with failure code.
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        fromfile_prefix_chars="@")
+
+    parser.add_argument("--protocol",
+                        help="the docking protocol to run (see PROTOCOLS)",
+                        type=str,
+                        choices=list(PROTOCOLS.keys()),
+                        required=True)
+
+    # main input files
+    parser.add_argument("--rosetta_main_dir",
+                        help="path to the main directory of the rosetta distribution",
+                        type=str,
+                        default="rosetta_minimal")
+
+    parser.add_argument("--variants_fn",
+                        help="path to text file containing protein variants",
+                        type=str)
+
+    # todo: change to specifying the chain in the variants_fn file to support different chains in a single run
+    parser.add_argument("--chain",
+                        help="the chain to use from the pdb file",
+                        type=str,
+                        default="A")
+
+    parser.add_argument("--pdb_dir",
+                        help="directory containing the pdb files referenced in variants_fn",
+                        type=str,
+                        default="pdb_files/prepared_pdb_files")
+
+    parser.add_argument("--allowable_failure_fraction",
+                        help="fraction of variants that can fail but still consider this job successful",
+                        type=float,
+                        default=0.25)
+
+    # rosetta hyperparameters
+    parser.add_argument("--num_structs",
+                        help="number of structures",
+                        type=int,
+                        default=1)
+
+    parser.add_argument("--dock_procs",
+                        help="split the docking structures across this many concurrent rosetta processes, each with "
+                             "its own seed (see fanout.py). the seeds are recorded in the dock_seeds column",
+                        type=int,
+                        default=1)
+
+    parser.add_argument("--dock_seed",
+                        help="base seed for the docking processes with --dock_procs > 1, process k uses "
+                             "dock_seed + k. drawn at random for each variant if not given",
+                        type=int,
+                        default=None)
+
+    parser.add_argument("--adaptive_increment",
+                        help="dock in increments of this many structures and stop early once the lowest value of the "
+                             "protocol's sort column (dG_separated for gb1, total_score for sadA) converges, with "
+                             "num_structs as the upper limit (see adaptive.py). "
+                             "set to 0 to always dock all num_structs structures",
+                        type=int,
+                        default=0)
+
+    parser.add_argument("--adaptive_patience",
+                        help="with adaptive sampling, stop when the lowest value of the sort column hasn't improved "
+                             "by more than adaptive_tolerance in this many consecutive structures. set to 0 to disable",
+                        type=int,
+                        default=3)
+
+    parser.add_argument("--adaptive_tolerance",
+                        help="with adaptive sampling, the smallest decrease of the lowest value of the sort column "
+                             "(REU) that counts as an improvement",
+                        type=float,
+                        default=0.5)
+
+    parser.add_argument("--adaptive_sem",
+                        help="with adaptive sampling, also stop when the standard error of the mean of the sort "
+                             "column drops below this threshold (REU). set to 0 to disable",
+                        type=float,
+                        default=0.0)
+
+    # local concurrency
+    parser.add_argument("--num_workers",
+                        help="number of variants to run concurrently in a local process pool. each worker "
+                             "gets its own working directory. make sure request_cpus in the submit file matches",
+                        type=int,
+                        default=1)
+
+    parser.add_argument("--memory_limit_mb",
+                        help="memory limit for running variants concurrently (num_workers > 1). by default, it's "
+                             "read from the cgroup or the HTCondor machine ad, falling back to physical memory. "
+                             "a new variant only starts if its predicted peak memory fits",
+                        type=float,
+                        default=None)
+
+    parser.add_argument("--variant_memory_mb",
+                        help="predicted peak memory of a docking process before any rosetta processes have been "
+                             "measured (multiplied by dock_procs for a variant). after that, the prediction comes "
+                             "from the peak rss of each step in earlier variants",
+                        type=float,
+                        default=1000)
+
+    parser.add_argument("--wd_base",
+                        help="fast path (like a tmpfs) for the per-variant working directories. falls back to the "
+                             "current directory if it doesn't exist or doesn't have wd_min_free_gb of free space",
+                        default="/dev/shm")
+
+    parser.add_argument("--wd_min_free_gb",
+                        help="minimum free space in wd_base needed to place the working directories there",
+                        type=float,
+                        default=1.0)
+
+    # logging and output options
+    parser.add_argument("--save_wd",
+                        help="set this flag to save the full working directory for each variant "
+                             "to the wd_archive directory in the log directory (see wd_archive.py)",
+                        action="store_true")
+
+    parser.add_argument("--log_tail_lines",
+                        help="number of lines kept from the end of the rosetta log of each successful step, along "
+                             "with any error lines. the logs of failed steps are always kept in full",
+                        type=int,
+                        default=200)
+
+    parser.add_argument("--full_logs",
+                        help="set this flag to keep the full rosetta logs of successful steps too",
+                        action="store_true")
+
+    parser.add_argument("--log_dir_base",
+                        help="base output directory where log dirs for each run will be placed",
+                        default="output/energize_outputs")
+
+    # HTCondor job information and program run information
+    parser.add_argument("--cluster",
+                        help="cluster (when running on HTCondor)",
+                        type=str,
+                        default="local")
+
+    parser.add_argument("--process",
+                        help="process (when running on HTCondor)",
+                        type=str,
+                        default="local")
+
+    parser.add_argument("--commit_id",
+                        help="the github commit id corresponding to this version of the code",
+                        type=str,
+                        default="no_commit_id")
+
+    main(parser.parse_args())
@@ -1,27 +1,47 @@
 """ this is the run script that executes on the server """
 
 import argparse
+import asyncio
+import functools
 import subprocess
 import shutil
 import os
+import re
 import sys
-from os.path import isdir, join, basename, abspath
+from os.path import isdir, isfile, join, basename, abspath, dirname
 import uuid
 import socket
 import csv
 import platform
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
 
 import shortuuid
 import numpy as np
 import pandas as pd
 
 from templates import fill_templates
+import score_files
+import log_capture
+import adaptive
+import wd_archive
+import wt_baseline
+from resources import run_measured, run_measured_async, empty_usage, share_usage, flatten_usage, usage_columns
+from results import append_record, load_completed_variants, mark_job_done, JOB_DONE_FN
+from failures import classify_failure, should_retry
+import result_cache
+from workdirs import get_wd_root, stage_template_dir, link_file
+from admission import get_memory_limit_mb, sample_memory, can_admit_variant, ADMISSION_POLL_SECONDS
 import time
 
 
 class RosettaError(Exception):
     # a simple custom error for when Rosetta gives a bad return code
-    pass
+    # carries the step's log file and return code so the failure can be classified before retrying
+    def __init__(self, message, out_fn=None, return_code=None):
+        super().__init__(message)
+        self.out_fn = out_fn
+        self.return_code = return_code
 
 
 def prep_working_dir(template_dir, working_dir, pdb_fn, chain, variant,
@@ -51,62 +71,133 @@ def prep_working_dir(template_dir, working_dir, pdb_fn, chain, variant,
     if variant != "_wt":
         fill_templates(template_dir, chain, variant, relax_distance, relax_repeats, working_dir)
 
-    # copy over files from the template dir that don't need to be changed
+    # link over files from the template dir that don't need to be changed
+    # the template dir is staged once per job next to the working dirs, so these are usually hardlinks on the same
+    # filesystem rather than fresh copies for every variant
     files_to_copy = ["flags_mutate", "flags_relax", "flags_relax_all", "flags_filter", "flags_centroid",
                      "filter_3rd.xml", "total_hydrophobic_weights_version1.wts",
-                     "total_hydrophobic_weights_version2.wts"]
+                     "total_hydrophobic_weights_version2.wts",
+                     "flags_mutate_silent", "flags_relax_silent", "flags_relax_all_silent", "flags_filter_silent",
+                     "flags_centroid_silent", "centroid.xml",
+                     "flags_filter_centroid", "flags_filter_centroid_silent", "filter_centroid.xml"]
 
+    static_dir = stage_template_dir(template_dir, dirname(abspath(working_dir)))
     for fn in files_to_copy:
-        shutil.copy(join(template_dir, fn), working_dir)
+        link_file(join(static_dir, fn), working_dir)
+
 
+def get_flags_fn(flags_fn, silent_io=False):
+    # the _silent versions of the flags files pass structures between steps as binary silent files
+    return "@{}_silent".format(flags_fn) if silent_io else "@{}".format(flags_fn)
 
-def run_mutate_step(relax_bin_fn, database_path, mutate_default_max_cycles, working_dir):
+
+def get_mutate_cmd(relax_bin_fn, database_path, mutate_default_max_cycles, silent_io=False):
     # todo: should this use the relax binary or rosetta_scripts binary? both seem to work the same
-    mutate_cmd = [relax_bin_fn, '-database', database_path,
-                  '-default_max_cycles', str(mutate_default_max_cycles), '@flags_mutate']
+    return [relax_bin_fn, '-database', database_path,
+            '-default_max_cycles', str(mutate_default_max_cycles), get_flags_fn("flags_mutate", silent_io)]
+
+
+def run_mutate_step(relax_bin_fn, database_path, mutate_default_max_cycles, working_dir, silent_io=False):
+    mutate_cmd = get_mutate_cmd(relax_bin_fn, database_path, mutate_default_max_cycles, silent_io)
     mutate_out_fn = join(working_dir, "mutate.out")
-    # to completely void output, can direct it to subprocess.DEVNULL instead of f
-    with open(mutate_out_fn, "w") as f:
-        return_code = subprocess.call(mutate_cmd, cwd=working_dir, stdout=f, stderr=f)
+    return_code, usage = run_measured(mutate_cmd, working_dir, mutate_out_fn, step="mutate")
     if return_code != 0:
-        raise RosettaError("Mutate step did not execute successfully. Return code: {}".format(return_code))
+        raise RosettaError("Mutate step did not execute successfully. Return code: {}".format(return_code),
+                           out_fn=mutate_out_fn, return_code=return_code)
+    return usage
 
 
-def run_relax_step(relax_bin_fn, database_path, relax_nstruct, relax_repeats, working_dir, variant_has_mutations=True):
+def get_relax_cmd(relax_bin_fn, database_path, relax_nstruct, relax_repeats, variant_has_mutations=True,
+                  silent_io=False):
     # todo: should this use the relax binary or rosetta_scripts binary? both seem to work the same
     if variant_has_mutations:
         # this is the main way to run relax for variants, where the rosettascript protocol specified in @flags_relax
         # and relax_template.xml is used to only relax around the mutated residues
-        relax_cmd = [relax_bin_fn, '-database', database_path, '-nstruct', str(relax_nstruct), '@flags_relax']
+        return [relax_bin_fn, '-database', database_path, '-nstruct', str(relax_nstruct),
+                get_flags_fn("flags_relax", silent_io)]
     else:
         # this is for running relax on the wild-type structure, without mutating it, in which case we don't
         # select residues around the mutated positions (there are none), just relax the whole structure
-        relax_cmd = [relax_bin_fn, '-database', database_path, '-nstruct', str(relax_nstruct),
-                     '-relax:default_repeats', str(relax_repeats), '@flags_relax_all']
+        return [relax_bin_fn, '-database', database_path, '-nstruct', str(relax_nstruct),
+                '-relax:default_repeats', str(relax_repeats), get_flags_fn("flags_relax_all", silent_io)]
+
 
+def run_relax_step(relax_bin_fn, database_path, relax_nstruct, relax_repeats, working_dir, variant_has_mutations=True,
+                   silent_io=False):
+    relax_cmd = get_relax_cmd(relax_bin_fn, database_path, relax_nstruct, relax_repeats, variant_has_mutations,
+                              silent_io)
     relax_out_fn = join(working_dir, "relax.out")
-    with open(relax_out_fn, "w") as f:
-        return_code = subprocess.call(relax_cmd, cwd=working_dir, stdout=f, stderr=f)
+    return_code, usage = run_measured(relax_cmd, working_dir, relax_out_fn, step="relax")
     if return_code != 0:
-        raise RosettaError("Relax step did not execute successfully. Return code: {}".format(return_code))
+        raise RosettaError("Relax step did not execute successfully. Return code: {}".format(return_code),
+                           out_fn=relax_out_fn, return_code=return_code)
+    return usage
+
+
+def run_relax_adaptive(relax_bin_fn, database_path, relax_nstruct, relax_repeats, working_dir, adaptive_hparams,
+                       variant_has_mutations=True, silent_io=False):
+    """ run relax in increments of structures until the total scores converge, up to relax_nstruct structures
+        returns the combined resource usage and the number of structures that were generated (see adaptive.py) """
+    def run_increment(increment_num, nstruct):
+        relax_cmd = get_relax_cmd(relax_bin_fn, database_path, nstruct, relax_repeats, variant_has_mutations,
+                                  silent_io) + adaptive.increment_args(increment_num)
+        relax_out_fn = adaptive.increment_out_fn(join(working_dir, "relax.out"), increment_num)
+        return_code, usage = run_measured(relax_cmd, working_dir, relax_out_fn, step="relax")
+        if return_code != 0:
+            raise RosettaError("Relax step did not execute successfully. Return code: {}".format(return_code),
+                               out_fn=relax_out_fn, return_code=return_code)
+        return usage
 
+    relax_score_fn = join(working_dir, "relax.silent" if silent_io else "relax.sc")
+    return adaptive.run_adaptive(run_increment, relax_score_fn, "total_score", relax_nstruct, adaptive_hparams)
 
-def run_filter_step(rosetta_scripts_bin_fn, database_path, working_dir):
-    filter_cmd = [rosetta_scripts_bin_fn, '-database', database_path, '@flags_filter']
+
+def get_filter_cmd(rosetta_scripts_bin_fn, database_path, silent_io=False):
+    return [rosetta_scripts_bin_fn, '-database', database_path, get_flags_fn("flags_filter", silent_io)]
+
+
+def run_filter_step(rosetta_scripts_bin_fn, database_path, working_dir, silent_io=False):
+    filter_cmd = get_filter_cmd(rosetta_scripts_bin_fn, database_path, silent_io)
     filter_out_fn = join(working_dir, "filter.out")
-    with open(filter_out_fn, "w") as f:
-        return_code = subprocess.call(filter_cmd, cwd=working_dir, stdout=f, stderr=f)
+    return_code, usage = run_measured(filter_cmd, working_dir, filter_out_fn, step="filter")
     if return_code != 0:
-        raise RosettaError("Filter step did not execute successfully. Return code: {}".format(return_code))
+        raise RosettaError("Filter step did not execute successfully. Return code: {}".format(return_code),
+                           out_fn=filter_out_fn, return_code=return_code)
+    return usage
+
 
+def get_centroid_cmd(score_jd2_bin_fn, database_path, silent_io=False):
+    # score_jd2 reads the relaxed pdb file directly into centroid mode, but a full-atom silent structure needs to
+    # be converted with a SwitchResidueTypeSetMover, so the silent version runs centroid.xml with rosetta_scripts
+    # (score_jd2_bin_fn should be the rosetta_scripts binary in that case)
+    return [score_jd2_bin_fn, '-database', database_path, get_flags_fn("flags_centroid", silent_io)]
 
-def run_centroid_step(score_jd2_bin_fn, database_path, working_dir):
-    centroid_cmd = [score_jd2_bin_fn, '-database', database_path, '@flags_centroid']
+
+def run_centroid_step(score_jd2_bin_fn, database_path, working_dir, silent_io=False):
+    centroid_cmd = get_centroid_cmd(score_jd2_bin_fn, database_path, silent_io)
     centroid_out_fn = join(working_dir, "centroid.out")
-    with open(centroid_out_fn, "w") as f:
-        return_code = subprocess.call(centroid_cmd, cwd=working_dir, stdout=f, stderr=f)
+    return_code, usage = run_measured(centroid_cmd, working_dir, centroid_out_fn, step="centroid")
+    if return_code != 0:
+        raise RosettaError("Centroid step did not execute successfully. Return code: {}".format(return_code),
+                           out_fn=centroid_out_fn, return_code=return_code)
+    return usage
+
+
+def get_filter_centroid_cmd(rosetta_scripts_bin_fn, database_path, silent_io=False):
+    # fused version of the filter and centroid steps that runs both in a single rosetta process
+    # filter_centroid.xml computes the filters on the full-atom structure, then switches to centroid for score3
+    return [rosetta_scripts_bin_fn, '-database', database_path, get_flags_fn("flags_filter_centroid", silent_io)]
+
+
+def run_filter_centroid_step(rosetta_scripts_bin_fn, database_path, working_dir, silent_io=False):
+    filter_centroid_cmd = get_filter_centroid_cmd(rosetta_scripts_bin_fn, database_path, silent_io)
+    filter_centroid_out_fn = join(working_dir, "filter_centroid.out")
+    return_code, usage = run_measured(filter_centroid_cmd, working_dir, filter_centroid_out_fn,
+                                      step="filter_centroid")
     if return_code != 0:
-        raise RosettaError("Centroid step did not execute successfully. Return code: {}".format(return_code))
+        raise RosettaError("Filter+centroid step did not execute successfully. Return code: {}".format(return_code),
+                           out_fn=filter_centroid_out_fn, return_code=return_code)
+    return usage
 
 
 def get_rosetta_paths(rosetta_main_dir: str):
@@ -138,7 +229,12 @@ def run_rosetta_pipeline(rosetta_main_dir: str,
                          mutate_default_max_cycles: int,
                          relax_nstruct: int,
                          relax_repeats: int,
-                         variant_has_mutations: bool = True):
+                         variant_has_mutations: bool = True,
+                         scoring_steps: bool = True,
+                         silent_io: bool = False,
+                         fused_scoring: bool = False,
+                         mutate_step: bool = True,
+                         adaptive_hparams: dict = None):
 
     # keep track of how long it takes to run Rosetta
     all_start = time.time()
@@ -146,34 +242,58 @@ def run_rosetta_pipeline(rosetta_main_dir: str,
     # get the paths to the rosetta binaries and database
     relax_bin_fn, rosetta_scripts_bin_fn, score_jd2_bin_fn, database_path = get_rosetta_paths(rosetta_main_dir)
 
+    # resource usage of each rosetta subprocess, steps that don't run are left at zero
+    usage = {step: empty_usage() for step in ["mutate", "relax", "filter", "centroid"]}
+
     # this branch logic is just handling the special case of the "_wt" variant (no mutations)
+    # with mutate_step=False, the mutated structure is already in the working directory (see run_sweep_variant)
     mt_run_time = 0
-    if variant_has_mutations:
+    if variant_has_mutations and mutate_step:
         mt_start_time = time.time()
-        run_mutate_step(relax_bin_fn, database_path, mutate_default_max_cycles, working_dir)
+        usage["mutate"] = run_mutate_step(relax_bin_fn, database_path, mutate_default_max_cycles, working_dir,
+                                          silent_io)
         mt_run_time = time.time() - mt_start_time
         # print("Mutate step took {:.2f}".format(mt_run_time))
-    else:
+    elif not variant_has_mutations:
         # variant has no mutations (wild-type), so just rename structure.pdb to structure_0001.pdb
         # which is the expected structure filename for the remaining pipelie steps
         os.rename(join(working_dir, "structure.pdb"), join(working_dir, "structure_0001.pdb"))
 
     # relax also needs to know whether the variant has mutations because it needs to either run relax
     # around just the mutated residues or around the whole structure
+    # with adaptive sampling, relax may stop before generating all relax_nstruct structures
     rx_start_time = time.time()
-    run_relax_step(relax_bin_fn, database_path, relax_nstruct, relax_repeats, working_dir, variant_has_mutations)
+    if adaptive_hparams is not None and adaptive.is_adaptive(adaptive_hparams):
+        usage["relax"], relax_nstruct_used = run_relax_adaptive(relax_bin_fn, database_path, relax_nstruct,
+                                                                relax_repeats, working_dir, adaptive_hparams,
+                                                                variant_has_mutations, silent_io)
+    else:
+        usage["relax"] = run_relax_step(relax_bin_fn, database_path, relax_nstruct, relax_repeats, working_dir,
+                                        variant_has_mutations, silent_io)
+        relax_nstruct_used = relax_nstruct
     rx_run_time = time.time() - rx_start_time
     # print("Relax step took {:.2f}".format(rx_run_time))
 
-    filt_start_time = time.time()
-    run_filter_step(rosetta_scripts_bin_fn, database_path, working_dir)
-    filt_run_time = time.time() - filt_start_time
-    # print("Filter step took {:.2f}".format(filt_run_time))
-
-    cent_start_time = time.time()
-    run_centroid_step(score_jd2_bin_fn, database_path, working_dir)
-    cent_run_time = time.time() - cent_start_time
-    # print("Centroid step took {:.2f}".format(cent_run_time))
+    # the filter and centroid steps can be skipped here when they are run in batch mode over the whole job
+    filt_run_time = 0
+    cent_run_time = 0
+    if scoring_steps and fused_scoring:
+        # the fused step's run time and resource usage are recorded under the filter step (centroid stays at zero)
+        filt_start_time = time.time()
+        usage["filter"] = run_filter_centroid_step(rosetta_scripts_bin_fn, database_path, working_dir, silent_io)
+        filt_run_time = time.time() - filt_start_time
+
+    elif scoring_steps:
+        filt_start_time = time.time()
+        usage["filter"] = run_filter_step(rosetta_scripts_bin_fn, database_path, working_dir, silent_io)
+        filt_run_time = time.time() - filt_start_time
+        # print("Filter step took {:.2f}".format(filt_run_time))
+
+        cent_start_time = time.time()
+        centroid_bin_fn = rosetta_scripts_bin_fn if silent_io else score_jd2_bin_fn
+        usage["centroid"] = run_centroid_step(centroid_bin_fn, database_path, working_dir, silent_io)
+        cent_run_time = time.time() - cent_start_time
+        # print("Centroid step took {:.2f}".format(cent_run_time))
 
     # keep track of how long it takes to run all steps
     all_run_time = time.time() - all_start
@@ -182,7 +302,11 @@ def run_rosetta_pipeline(rosetta_main_dir: str,
                  "relax": rx_run_time,
                  "filter": filt_run_time,
                  "centroid": cent_run_time,
-                 "all": all_run_time}
+                 "all": all_run_time,
+                 "relax_nstruct_used": relax_nstruct_used}
+
+    # add the detailed resource usage of each step (e.g. mutate_user_time, relax_max_rss_mb)
+    run_times.update(flatten_usage(usage))
 
     return run_times
 
@@ -193,50 +317,181 @@ def parse_score_sc(score_sc_fn: str,
     """ parse the score.sc file from the energize run, aggregating energies and appending info about variant
         this function has also been co-opted to parse the centroid and filter score files, which should only
         have 1 possible record, so no need to do any agg (and it shouldn't) """
-    score_df = pd.read_csv(score_sc_fn, delim_whitespace=True, skiprows=1, header=0)
+    # the score files are tiny, so they are read with a lightweight parser rather than pd.read_csv
+    columns, scores = score_files.parse_score_sc(score_sc_fn, agg_method, sort_col)
+    return pd.DataFrame([scores], columns=columns)
 
-    # drop the "SCORE:" and "description" columns, these won't be needed for final output
-    score_df = score_df.drop(["SCORE:", "description"], axis=1)
 
-    # special case: only 1 structure was generated, no need to aggregate
-    if len(score_df) == 1:
-        parsed_df = score_df.iloc[[0]]
-    else:
-        if agg_method == "min_energy_avg":
-            # select the structure(s) with the minimum total_score and average the energies if multiple structures
-            # we average just in case there are some structures with the same min total_score but different energies
-            min_score_df = score_df[score_df[sort_col] == score_df[sort_col].min()]
-            parsed_df = min_score_df.mean(axis=0).to_frame().T
-        elif agg_method == "min_energy_first":
-            # select structures with min total_score and use the first one
-            min_score_df = score_df[score_df[sort_col] == score_df[sort_col].min()]
-            parsed_df = min_score_df.iloc[[0]]
-        elif agg_method == "avg":
-            # take the average of all structures, not just the ones with the lowest score
-            parsed_df = score_df.mean(axis=0).to_frame().T
-        else:
-            raise ValueError("invalid aggregation method: {}".format(agg_method))
+def split_fused_scores(fused_df, protocol_fn):
+    """ split the record from the fused filter+centroid step into the filter and centroid records that the
+        separate steps would produce. the filter columns are the filters defined in the protocol, and the centroid
+        columns are the score3 terms, which the protocol reports with a "cen_" prefix """
+    filter_names = [f.get("name") for f in ET.parse(protocol_fn).getroot().find("FILTERS")]
+    filter_cols = ["filter_total_score"] + sorted(name for name in filter_names
+                                                  if name != "filter_total_score" and not name.startswith("cen_"))
+    centroid_cols = ["cen_total_score"] + sorted(name for name in filter_names
+                                                 if name.startswith("cen_") and name != "cen_total_score")
 
-    return parsed_df
+    filter_df = fused_df[filter_cols].rename(columns={"filter_total_score": "total_score"})
+    centroid_df = fused_df[centroid_cols].rename(columns=lambda col: col[len("cen_"):])
+    return filter_df, centroid_df
 
 
-def run_single_variant(rosetta_main_dir, pdb_fn, chain, variant, rosetta_hparams,
-                       staging_dir, output_dir, save_wd=False):
-    # grab the start time for this variant
-    start_time = time.time()
+def build_variant_record(pdb_fn, variant, job_uuid, start_time, run_times, score_df, filter_df, centroid_df):
+    """ combine the parsed relax, filter, and centroid scores into a single record, appending info about variant """
 
-    template_dir = "templates/energize_wd_template"
-    # todo: use a variant-specific working directory in the output directory (safer)
-    working_dir = "energize_wd"
+    # the total_score from filter and centroid probably won't be used, but let's keep them in just in case
+    # just need to resolve the name conflict with the total_score from score_df
+    filter_df = filter_df.rename(columns={"total_score": "filter_total_score"})
+    centroid_df = centroid_df.rename(columns={"total_score": "centroid_total_score"})
+
+    full_df = pd.concat((score_df.reset_index(drop=True),
+                         filter_df.reset_index(drop=True),
+                         centroid_df.reset_index(drop=True)), axis=1)
 
+    # append info about this variant
+    full_df.insert(0, "pdb_fn", [basename(pdb_fn)])
+    full_df.insert(1, "variant", [variant])
+    full_df.insert(2, "job_uuid", [job_uuid])
+    full_df.insert(3, "start_time", [time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(start_time))])
+    full_df.insert(4, "run_time", [int(run_times["all"])])
+    full_df.insert(5, "mutate_run_time", [int(run_times["mutate"])])
+    full_df.insert(6, "relax_run_time", [int(run_times["relax"])])
+    full_df.insert(7, "filter_run_time", [int(run_times["filter"])])
+    full_df.insert(8, "centroid_run_time", [int(run_times["centroid"])])
+
+    # resource usage of each rosetta subprocess goes right after the run times
+    usage_cols = usage_columns(["mutate", "relax", "filter", "centroid"])
+    for col_num, col in enumerate(usage_cols, start=9):
+        full_df.insert(col_num, col, [run_times[col]])
+
+    # the number of relax structures the energies are aggregated over (fewer than relax_nstruct when adaptive
+    # sampling stopped early)
+    full_df.insert(9 + len(usage_cols), "relax_nstruct_used", [int(run_times["relax_nstruct_used"])])
+
+    return full_df
+
+
+def try_cached_record(cache_fn, pdb_fn, chain, variant, rosetta_hparams, job_uuid, start_time, results_fn,
+                      output_dir, template_hash, wt_baseline_key=None):
+    """ check the result cache before running rosetta (cache_fn=None disables the cache). if there is a cached
+        result, it is saved as this job's record. returns the cache key and whether the cached record was used """
+    if cache_fn is None:
+        return None, False
+
+    cache_key = result_cache.get_cache_key(pdb_fn, chain, variant, rosetta_hparams, template_hash)
+    cached_df = result_cache.lookup(cache_fn, cache_key)
+    if cached_df is None:
+        return cache_key, False
+    # entries cached by --wt_baseline jobs before the baseline reference was left out of the cache
+    cached_df = cached_df.drop(columns="wt_baseline", errors="ignore")
+
+    use_cached_record(cached_df, pdb_fn, variant, job_uuid, start_time, results_fn, output_dir, wt_baseline_key)
+    return cache_key, True
+
+
+def prep_variant_wd(pdb_fn, chain, variant, rosetta_hparams, working_dir,
+                    template_dir="templates/energize_wd_template"):
+    """ set up a fresh working directory for the variant (copies the pdb file, sets up the rosetta scripts, etc) """
     # if the working directory exists from a previously failed variant, remove it before starting new variant
     if isdir(working_dir):
         shutil.rmtree(working_dir)
 
-    # set up the working directory (copies the pdb file, sets up the rosetta scripts, etc)
     prep_working_dir(template_dir, working_dir, pdb_fn, chain, variant,
                      rosetta_hparams["relax_distance"], rosetta_hparams["relax_repeats"], overwrite_wd=True)
 
+
+def parse_variant_record(pdb_fn, variant, job_uuid, start_time, run_times, rosetta_hparams, working_dir):
+    """ parse the rosetta outputs in the working directory into the variant's record """
+
+    # the stdout and stderr outputs from rosetta are in the working directory under mutate.out.gz, relax.out.gz, etc.
+    # (compressed summaries, see log_capture.py). we don't need them, so we leave them there and just parse the energies
+
+    # parse the output files into a single record, appending info about variant
+    # with silent file i/o, the relax scores are in the SCORE: lines of the silent file instead of relax.sc
+    relax_score_fn = "relax.silent" if rosetta_hparams["silent_io"] else "relax.sc"
+    score_df = parse_score_sc(join(working_dir, relax_score_fn))
+    if rosetta_hparams["fused_scoring"]:
+        filter_df, centroid_df = split_fused_scores(parse_score_sc(join(working_dir, "filter_centroid.sc")),
+                                                    join(working_dir, "filter_centroid.xml"))
+    else:
+        filter_df = parse_score_sc(join(working_dir, "filter.sc"))
+        centroid_df = parse_score_sc(join(working_dir, "centroid.sc"))
+
+    return build_variant_record(pdb_fn, variant, job_uuid, start_time, run_times, score_df, filter_df, centroid_df)
+
+
+def finalize_variant(pdb_fn, variant, job_uuid, start_time, run_times, rosetta_hparams, working_dir, results_fn,
+                     output_dir, save_wd=False, cache_fn=None, cache_key=None, wt_baseline_key=None):
+    """ parse the rosetta outputs into the variant's record, save it, and clean up the working directory """
+
+    # the record is appended to the job-level results file as soon as the variant finishes
+    full_df = parse_variant_record(pdb_fn, variant, job_uuid, start_time, run_times, rosetta_hparams, working_dir)
+    # the cache key doesn't cover --wt_baseline, so the record is cached before it references the baseline
+    if cache_key is not None:
+        result_cache.store(cache_fn, cache_key, full_df)
+    if wt_baseline_key is not None:
+        wt_baseline.set_baseline_ref(full_df, wt_baseline_key)
+    append_record(results_fn, full_df)
+
+    # if the flag is set, save all files in the working directory for this variant
+    # these go directly into the archive in the output directory
+    if save_wd:
+        wd_archive.save_wd(working_dir, output_dir, "wd_{}_{}".format(basename(pdb_fn), variant))
+
+    # clean up the working dir in preparation for next variant
+    shutil.rmtree(working_dir)
+
+
+def compute_wt_baseline(rosetta_main_dir, pdb_fn, chain, rosetta_hparams, job_uuid, working_dir, wt_baseline_key):
+    """ run the "_wt" variant of the PDB in its own working directory and return its record """
+    start_time = time.time()
+    prep_variant_wd(pdb_fn, chain, "_wt", rosetta_hparams, working_dir)
+    run_times = run_rosetta_pipeline(rosetta_main_dir, working_dir,
+                                     rosetta_hparams["mutate_default_max_cycles"],
+                                     rosetta_hparams["relax_nstruct"],
+                                     rosetta_hparams["relax_repeats"],
+                                     variant_has_mutations=False,
+                                     silent_io=rosetta_hparams["silent_io"],
+                                     fused_scoring=rosetta_hparams["fused_scoring"],
+                                     adaptive_hparams=rosetta_hparams)
+    baseline_df = parse_variant_record(pdb_fn, "_wt", job_uuid, start_time, run_times, rosetta_hparams, working_dir)
+    shutil.rmtree(working_dir)
+    return wt_baseline.set_baseline_ref(baseline_df, wt_baseline_key)
+
+
+def run_single_variant(rosetta_main_dir, pdb_fn, chain, variant, rosetta_hparams, job_uuid,
+                       results_fn, output_dir, save_wd=False, working_dir="energize_wd", cache_fn=None,
+                       use_wt_baseline=False, wt_baseline_dir=None, template_hash=None):
+    # grab the start time for this variant
+    start_time = time.time()
+
+    # the result cache and WT baselines are keyed by the contents of the template dir, which main hashes once
+    # for the whole job and passes in as template_hash
+    if template_hash is None and (cache_fn is not None or use_wt_baseline):
+        template_hash = result_cache.get_dir_hash("templates/energize_wd_template")
+
+    # with WT baselines, the record references the WT baseline of its PDB, which is computed the first time
+    # it's needed (or loaded from the shared baseline dir). the "_wt" variant itself just uses the baseline
+    wt_baseline_key = None
+    if use_wt_baseline:
+        wt_baseline_key = wt_baseline.get_baseline_key(pdb_fn, chain, rosetta_hparams, template_hash)
+        baseline_df = wt_baseline.get_wt_baseline(
+            wt_baseline_key, output_dir,
+            functools.partial(compute_wt_baseline, rosetta_main_dir, pdb_fn, chain, rosetta_hparams, job_uuid,
+                              "{}_wt_baseline".format(working_dir), wt_baseline_key),
+            wt_baseline_dir)
+        if variant == "_wt":
+            save_reused_record(baseline_df, pdb_fn, variant, job_uuid, start_time, results_fn, wt_baseline_key)
+            return time.time() - start_time
+
+    cache_key, cached = try_cached_record(cache_fn, pdb_fn, chain, variant, rosetta_hparams, job_uuid, start_time,
+                                          results_fn, output_dir, template_hash, wt_baseline_key)
+    if cached:
+        return time.time() - start_time
+
+    prep_variant_wd(pdb_fn, chain, variant, rosetta_hparams, working_dir)
+
     # run the mutate and relax steps
     variant_has_mutations = False if variant == "_wt" else True
 
@@ -244,48 +499,167 @@ def run_single_variant(rosetta_main_dir, pdb_fn, chain, variant, rosetta_hparams
                                      rosetta_hparams["mutate_default_max_cycles"],
                                      rosetta_hparams["relax_nstruct"],
                                      rosetta_hparams["relax_repeats"],
-                                     variant_has_mutations)
+                                     variant_has_mutations,
+                                     silent_io=rosetta_hparams["silent_io"],
+                                     fused_scoring=rosetta_hparams["fused_scoring"],
+                                     adaptive_hparams=rosetta_hparams)
 
-    # copy over or parse any files we want to keep from the working directory to the output directory
-    # the stdout and stderr outputs from rosetta are in the working directory under mutate.out and relax.out
-    # however, we don't need them, so we are going to leave them there and just parse the energies
+    finalize_variant(pdb_fn, variant, job_uuid, start_time, run_times, rosetta_hparams, working_dir, results_fn,
+                     output_dir, save_wd, cache_fn, cache_key, wt_baseline_key)
 
-    # parse the output files into a single-record csv, appending info about variant
-    # place in a staging directory and combine with other variants that run during this job
-    score_df = parse_score_sc(join(working_dir, "relax.sc"))
-    filter_df = parse_score_sc(join(working_dir, "filter.sc"))
-    centroid_df = parse_score_sc(join(working_dir, "centroid.sc"))
+    return run_times["all"]
 
-    # the total_score from filter and centroid probably won't be used, but let's keep them in just in case
-    # just need to resolve the name conflict with the total_score from score_df
-    filter_df.rename(columns={"total_score": "filter_total_score"}, inplace=True)
-    centroid_df.rename(columns={"total_score": "centroid_total_score"}, inplace=True)
 
-    full_df = pd.concat((score_df, filter_df, centroid_df), axis=1)
+# the relax hyperparameters that can be swept, and their types
+SWEEP_HPARAMS = {"relax_distance": float, "relax_repeats": int, "relax_nstruct": int}
+
+
+def parse_sweep(sweep_strs, rosetta_hparams):
+    """ parse the hyperparameter sets of a sweep, each like "relax_distance=8,relax_repeats=5". hyperparameters
+        that aren't given in a set keep their value from rosetta_hparams. returns a list of rosetta_hparams dicts """
+    hparam_sets = []
+    for sweep_str in sweep_strs:
+        hparams = dict(rosetta_hparams)
+        for item in sweep_str.split(","):
+            key, value = [x.strip() for x in item.split("=")]
+            if key not in SWEEP_HPARAMS:
+                raise ValueError("can't sweep over {}, only {}".format(key, ", ".join(SWEEP_HPARAMS.keys())))
+            hparams[key] = SWEEP_HPARAMS[key](value)
+        hparam_sets.append(hparams)
+    return hparam_sets
+
+
+def create_sweep_jobs(args, script_start, hparam_sets):
+    """ set up a separate job (uuid and log directory) for each hyperparameter set of a sweep, so the results of
+        each set get loaded into the job and variant tables as their own job
+        returns a list of dicts with the rosetta_hparams, job_uuid, log_dir, and results_fn of each job """
+    sweep_jobs = []
+    for hparams in hparam_sets:
+        job_uuid = shortuuid.encode(uuid.uuid4())[:12]
+        log_dir = join(args.log_dir_base, get_log_dir_name(args, job_uuid, script_start))
+        os.makedirs(log_dir)
+
+        # the saved arguments reproduce this hyperparameter set as a regular, non-sweep job
+        job_args = {k: v for k, v in vars(args).items() if k != "sweep"}
+        job_args.update({k: hparams[k] for k in SWEEP_HPARAMS})
+        save_argparse_args(job_args, join(log_dir, "args.txt"))
+        save_job_info(script_start, job_uuid, args.cluster, args.process, args.commit_id, log_dir)
+        save_csv_from_dict(join(log_dir, "hparams.csv"), hparams)
+
+        sweep_jobs.append({"rosetta_hparams": hparams,
+                           "job_uuid": job_uuid,
+                           "log_dir": log_dir,
+                           "results_fn": join(log_dir, "energies.csv")})
+    return sweep_jobs
+
+
+def run_sweep_variant(rosetta_main_dir, pdb_fn, chain, variant, rosetta_hparams, job_uuid, results_fn, output_dir,
+                      save_wd=False, working_dir="energize_wd", cache_fn=None, sweep_jobs=None,
+                      template_dir="templates/energize_wd_template", template_hash=None):
+    """ run a variant for every hyperparameter set of a sweep (see create_sweep_jobs). the mutate step doesn't depend
+        on the relax hyperparameters, so it runs once, and each set runs relax, filter, and centroid from the same
+        mutated structure in its own subdirectory of the working directory
+        the records are only saved once every set has succeeded, so retrying the variant can't duplicate records
+        rosetta_hparams, job_uuid, and results_fn are unused, they are only here to match run_single_variant """
+    start_time = time.time()
+
+    # only the hyperparameter sets that aren't in the cache need to run
+    cache_keys = [None] * len(sweep_jobs)
+    cached_dfs = [None] * len(sweep_jobs)
+    if cache_fn is not None:
+        if template_hash is None:
+            template_hash = result_cache.get_dir_hash(template_dir)
+        for k, sweep_job in enumerate(sweep_jobs):
+            cache_keys[k] = result_cache.get_cache_key(pdb_fn, chain, variant, sweep_job["rosetta_hparams"],
+                                                       template_hash)
+            cached_dfs[k] = result_cache.lookup(cache_fn, cache_keys[k])
+    to_run = [k for k in range(len(sweep_jobs)) if cached_dfs[k] is None]
 
-    # append info about this variant
-    full_df.insert(0, "pdb_fn", [basename(pdb_fn)])
-    full_df.insert(1, "variant", [variant])
-    full_df.insert(2, "start_time", [time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(start_time))])
-    full_df.insert(3, "run_time", [int(run_times["all"])])
-    full_df.insert(4, "mutate_run_time", [int(run_times["mutate"])])
-    full_df.insert(5, "relax_run_time", [int(run_times["relax"])])
-    full_df.insert(6, "filter_run_time", [int(run_times["filter"])])
-    full_df.insert(7, "centroid_run_time", [int(run_times["centroid"])])
+    variant_has_mutations = False if variant == "_wt" else True
+    records = {}
+    if len(to_run) > 0:
+        # mutate is the same for every set (mutate_default_max_cycles and silent_io can't be swept)
+        base_hparams = sweep_jobs[to_run[0]]["rosetta_hparams"]
+        prep_variant_wd(pdb_fn, chain, variant, base_hparams, working_dir, template_dir)
+
+        mutate_usage = empty_usage()
+        mutate_run_time = 0
+        if variant_has_mutations:
+            relax_bin_fn, _, _, database_path = get_rosetta_paths(rosetta_main_dir)
+            mutate_start_time = time.time()
+            mutate_usage = run_mutate_step(relax_bin_fn, database_path, base_hparams["mutate_default_max_cycles"],
+                                           working_dir, base_hparams["silent_io"])
+            mutate_run_time = time.time() - mutate_start_time
+        mutated_fn = "mutate.silent" if base_hparams["silent_io"] else "structure_0001.pdb"
+
+        for k in to_run:
+            hparams = sweep_jobs[k]["rosetta_hparams"]
+            set_wd = join(working_dir, "sweep_{}".format(k))
+            prep_variant_wd(pdb_fn, chain, variant, hparams, set_wd, template_dir)
+            if variant_has_mutations:
+                link_file(join(working_dir, mutated_fn), set_wd)
+
+            run_times = run_rosetta_pipeline(rosetta_main_dir, set_wd,
+                                             hparams["mutate_default_max_cycles"],
+                                             hparams["relax_nstruct"],
+                                             hparams["relax_repeats"],
+                                             variant_has_mutations,
+                                             silent_io=hparams["silent_io"],
+                                             fused_scoring=hparams["fused_scoring"],
+                                             mutate_step=False,
+                                             adaptive_hparams=hparams)
+
+            # each set's record includes the shared mutate step
+            run_times["mutate"] = mutate_run_time
+            run_times["all"] += mutate_run_time
+            run_times.update(flatten_usage({"mutate": mutate_usage}))
+            records[k] = parse_variant_record(pdb_fn, variant, sweep_jobs[k]["job_uuid"], start_time, run_times,
+                                              hparams, set_wd)
+
+    for k, sweep_job in enumerate(sweep_jobs):
+        if cached_dfs[k] is not None:
+            use_cached_record(cached_dfs[k], pdb_fn, variant, sweep_job["job_uuid"], start_time,
+                              sweep_job["results_fn"], sweep_job["log_dir"])
+            continue
+
+        append_record(sweep_job["results_fn"], records[k])
+        if cache_keys[k] is not None:
+            result_cache.store(cache_fn, cache_keys[k], records[k])
+        if save_wd:
+            wd_archive.save_wd(join(working_dir, "sweep_{}".format(k)), sweep_job["log_dir"],
+                               "wd_{}_{}".format(basename(pdb_fn), variant))
+
+    # clean up the working dir (and the subdirectories of each set) in preparation for next variant
+    if isdir(working_dir):
+        shutil.rmtree(working_dir)
 
-    # note: it's not the best practice to have filenames with periods and commas
-    #   could pass in the loop ID for this single variant and use that to save the file
-    full_df.to_csv(join(staging_dir, "{}_{}_energies.csv".format(basename(pdb_fn), variant)), index=False)
+    return time.time() - start_time
 
-    # if the flag is set, save all files in the working directory for this variant
-    # these go directly to the output directory instead of the staging directory
-    if save_wd:
-        shutil.copytree(working_dir, join(output_dir, "wd_{}_{}".format(basename(pdb_fn), variant)))
 
-    # clean up the working dir in preparation for next variant
-    shutil.rmtree(working_dir)
+def save_reused_record(record_df, pdb_fn, variant, job_uuid, start_time, results_fn, wt_baseline_key=None):
+    """ save a record that was computed earlier (from the result cache or a WT baseline) as this job's record for
+        the variant, the energies and run times stay the same """
+    record_df["pdb_fn"] = basename(pdb_fn)
+    record_df["variant"] = variant
+    record_df["job_uuid"] = job_uuid
+    record_df["start_time"] = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(start_time))
+    if wt_baseline_key is not None:
+        wt_baseline.set_baseline_ref(record_df, wt_baseline_key)
+    append_record(results_fn, record_df)
 
-    return run_times["all"]
+
+def use_cached_record(cached_df, pdb_fn, variant, job_uuid, start_time, results_fn, output_dir,
+                      wt_baseline_key=None):
+    """ save a record from the result cache as this job's record for the variant. the energies and run times are
+        from the job that originally computed them, which is noted in cache_hits.txt in the output directory """
+    source_job_uuid = cached_df.loc[0, "job_uuid"]
+    print("Using cached result for variant {} {} from job {}".format(basename(pdb_fn), variant, source_job_uuid),
+          flush=True)
+
+    save_reused_record(cached_df, pdb_fn, variant, job_uuid, start_time, results_fn, wt_baseline_key)
+
+    with open(join(output_dir, "cache_hits.txt"), "a") as f:
+        f.write("{} {}\t{}\n".format(basename(pdb_fn), variant, source_job_uuid))
 
 
 def get_log_dir_name(args, job_uuid, start_time, ld_prefix="energize"):
@@ -300,22 +674,6 @@ def get_log_dir_name(args, job_uuid, start_time, ld_prefix="energize"):
     return log_dir
 
 
-def combine_outputs(staging_dir):
-    """ combine the outputs from individual variants into a single csv """
-    # Note that these will probably NOT be in the same order as they were run (can add timestamp to record)
-    output_fns = [join(staging_dir, x) for x in os.listdir(staging_dir)]
-
-    # read individual dataframes into a list
-    dfs = []
-    for fn in output_fns:
-        df = pd.read_csv(fn, header=0)
-        dfs.append(df)
-
-    # combine into a single dataframe
-    combined_df = pd.concat(dfs, axis=0, ignore_index=True)
-    return combined_df
-
-
 def save_csv_from_dict(save_fn, d):
     with open(save_fn, "w") as f:
         w = csv.writer(f)
@@ -331,7 +689,11 @@ def save_argparse_args(args_dict, out_fn):
             if (not isinstance(v, bool)) or (isinstance(v, bool) and v):
                 f.write("--{}\n".format(k))
                 # if a flag is true, no need to specify the "true" value
-                if not isinstance(v, bool):
+                # arguments with multiple values (nargs) get one value per line
+                if isinstance(v, list):
+                    for item in v:
+                        f.write("{}\n".format(item))
+                elif not isinstance(v, bool):
                     f.write("{}\n".format(v))
 
 
@@ -339,34 +701,706 @@ def save_job_info(script_start, job_uuid, cluster, process, commit_id, log_dir):
     # create an info file for this job (cluster, process, server, github commit id, etc.)
     start_time_utc = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(script_start))
     job_info = {"uuid": job_uuid, "cluster": cluster, "process": process, "hostname": socket.gethostname(),
-                "github_commit_id": commit_id, "script_start_time": start_time_utc}
+                "github_commit_id": commit_id, "script_start_time": start_time_utc,
+                # lets analysis tell jobs that write the completion marker apart from older jobs
+                "done_marker": JOB_DONE_FN}
     save_csv_from_dict(join(log_dir, "job.csv"), job_info)
 
 
+def handle_failed_attempt(e, pdb_variant, attempt, num_attempts_per_variant, save_wd, working_dir, log_dir):
+    """ classify a failed attempt at running a variant, save its working directory if requested, and clean up
+        returns the (failure class, signature) """
+    pdb_basename, variant = pdb_variant.split()
+    print(e, flush=True)
+
+    # classify the failure from the rosetta logs before the working dir is cleaned up
+    failure = classify_failure(e, working_dir)
+    print("Encountered {} error ({}) running variant {} {}. "
+          "Attempts remaining: {}".format(*failure, pdb_basename, variant,
+                                          num_attempts_per_variant - attempt - 1), flush=True)
+
+    # if we are supposed to save the working directory, save it now
+    # the run_single_variant() function doesn't take care of this when there's an exception
+    if save_wd and isdir(working_dir):
+        wd_archive.save_wd(working_dir, log_dir, "wd_{}_{}_{}".format(pdb_basename, variant, attempt))
+
+    # clean up the working dir in preparation for next variant
+    if isdir(working_dir):
+        shutil.rmtree(working_dir)
+
+    return failure
+
+
+def run_variant_attempts(i, num_variants, pdb_variant, args, rosetta_hparams, job_uuid, working_dir, results_fn,
+                         log_dir, run_fn=None):
+    """ run a single variant, giving it multiple attempts at success. deterministic failures are not retried
+        returns None if the variant succeeded, otherwise the (failure class, signature) of the last attempt
+        run_fn defaults to run_single_variant, but can be swapped out to run just part of the pipeline """
+    if run_fn is None:
+        run_fn = run_single_variant
+
+    pdb_basename, variant = pdb_variant.split()
+    pdb_fn = join(args.pdb_dir, pdb_basename)
+
+    # scripts without the result cache (docking.py) don't have the cache args
+    cache_fn = None if getattr(args, "no_cache", True) else args.cache_fn
+
+    # sometimes a single variant fails but others were/are successful
+    # give variants 3 attempts at success, then move on to other variants
+    # in worst case scenario, there is a system-level problem that will cause all variants to fail
+    num_attempts_per_variant = 3
+    failure = None
+    for attempt in range(num_attempts_per_variant):
+        try:
+            print("Running Rosetta on variant {} {} ({}/{})".format(basename(pdb_fn), variant,
+                                                                    i + 1, num_variants), flush=True)
+            run_time = run_fn(args.rosetta_main_dir, pdb_fn, args.chain, variant, rosetta_hparams, job_uuid,
+                              results_fn, log_dir, args.save_wd, working_dir, cache_fn)
+            print("Processing variant {} {} took {:.2f}".format(basename(pdb_fn), variant, run_time), flush=True)
+
+        except (RosettaError, FileNotFoundError) as e:
+            failure = handle_failed_attempt(e, pdb_variant, attempt, num_attempts_per_variant, args.save_wd,
+                                            working_dir, log_dir)
+
+            # a deterministic failure (bad input) would just fail the same way again
+            if not should_retry(failure[0]):
+                print("Not retrying variant {}".format(pdb_variant), flush=True)
+                break
+        else:
+            # successful variant run
+            return None
+
+    # burned through all attempts without success, or hit a deterministic failure
+    return failure
+
+
+def can_start_variant(stop_time, deadline, variant_times):
+    """ check whether a new variant can be started. no new variants are started after stop_time (checkpointing)
+        or if the running estimate of the per-variant runtime says the variant won't finish before the deadline """
+    now = time.time()
+    if stop_time is not None and now > stop_time:
+        return False
+    if deadline is not None:
+        # before any variants finish, there is no estimate, so just check that there is time left
+        estimate = np.mean(variant_times) if len(variant_times) > 0 else 0
+        if now + estimate > deadline:
+            print("Remaining time budget ({:.0f}s) can't fit another variant "
+                  "(estimated {:.0f}s)".format(deadline - now, estimate), flush=True)
+            return False
+    return True
+
+
+def run_variants_serial(pdbs_variants, args, rosetta_hparams, job_uuid, results_fn, log_dir, stop_time=None,
+                        deadline=None, wd_root=".", run_fn=None):
+    """ run variants one at a time in this process. no new variants are started after stop_time, or if they
+        aren't expected to finish before the deadline (see can_start_variant). run_fn is passed to
+        run_variant_attempts
+        returns the list of (variant, failure class, signature) that failed and the list of variants that
+        were never started """
+    failed = []
+    # wall time of each finished variant (including retries), used for the runtime estimate
+    variant_times = []
+    for i, pdb_variant in enumerate(pdbs_variants):
+        if not can_start_variant(stop_time, deadline, variant_times):
+            return failed, pdbs_variants[i:]
+
+        variant_start = time.time()
+        failure = run_variant_attempts(i, len(pdbs_variants), pdb_variant, args, rosetta_hparams, job_uuid,
+                                       join(wd_root, "energize_wd"), results_fn, log_dir, run_fn)
+        variant_times.append(time.time() - variant_start)
+        if failure is not None:
+            # add this variant to a failed_variants.txt file and continue with the other variants
+            failed.append((pdb_variant,) + failure)
+    return failed, []
+
+
+def pool_worker(i, num_variants, pdb_variant, args, rosetta_hparams, job_uuid, results_fn, log_dir, wd_root=".",
+                run_fn=None):
+    """ runs a single variant inside a worker process of the local worker pool.
+        each worker process gets its own working directory, keyed by its pid. all workers append
+        to the same results file, which is protected by a file lock """
+    working_dir = join(wd_root, "energize_wd_{}".format(os.getpid()))
+    # the log capture settings aren't inherited if the worker processes are spawned instead of forked
+    log_capture.configure(args.log_tail_lines, args.full_logs)
+    return run_variant_attempts(i, num_variants, pdb_variant, args, rosetta_hparams, job_uuid,
+                                working_dir, results_fn, log_dir, run_fn)
+
+
+def init_admission(args):
+    """ the memory limit and an empty per-step memory model for admitting variants to run concurrently """
+    memory_limit_mb, source = get_memory_limit_mb(args.memory_limit_mb)
+    print("Admitting variants within a memory limit of {:.0f} MB (from {})".format(memory_limit_mb, source),
+          flush=True)
+    return memory_limit_mb, {}
+
+
+def run_variants_pool(pdbs_variants, args, rosetta_hparams, job_uuid, results_fn, log_dir, stop_time=None,
+                      deadline=None, wd_root=".", run_fn=None):
+    """ run variants concurrently in a pool of args.num_workers processes. no new variants are started after
+        stop_time, or if they aren't expected to finish before the deadline (see can_start_variant). retries are
+        handled inside each worker, so failure accounting is the same as the serial path
+        returns the list of (variant, failure class, signature) that failed and the list of variants that
+        were never started """
+    failures = {}
+    unstarted = []
+    variant_times = []
+    memory_limit_mb, memory_model = init_admission(args)
+    # docking.py runs dock_procs docking processes per variant at the same time (see fanout.py)
+    step_procs = {"dock": getattr(args, "dock_procs", 1)}
+    with ProcessPoolExecutor(max_workers=args.num_workers) as executor:
+        # only keep as many variants in flight as there are workers, so we can decide when to stop starting new ones
+        # since at most num_workers variants are in flight, each variant starts running as soon as it's submitted
+        running = {}
+        submit_times = {}
+        for i, pdb_variant in enumerate(pdbs_variants):
+            # wait for a free worker and for enough memory to start another variant. memory is sampled while
+            # waiting so the per-step memory model keeps learning from the running variants
+            throttled = False
+            while len(running) >= args.num_workers or \
+                    not can_admit_variant(memory_model, memory_limit_mb, len(running), args.variant_memory_mb,
+                                          step_procs):
+                if len(running) < args.num_workers and not throttled:
+                    print("Waiting for memory to start variant {}".format(pdb_variant), flush=True)
+                    throttled = True
+                done, _ = wait(running, timeout=ADMISSION_POLL_SECONDS, return_when=FIRST_COMPLETED)
+                sample_memory(memory_model)
+                for future in done:
+                    failures[running.pop(future)] = future.result()
+                    variant_times.append(time.time() - submit_times.pop(future))
+
+            if not can_start_variant(stop_time, deadline, variant_times):
+                unstarted = pdbs_variants[i:]
+                break
+
+            future = executor.submit(pool_worker, i, len(pdbs_variants), pdb_variant, args, rosetta_hparams,
+                                     job_uuid, results_fn, log_dir, wd_root, run_fn)
+            running[future] = i
+            submit_times[future] = time.time()
+
+        for future in as_completed(running):
+            failures[running[future]] = future.result()
+
+    # collect failures in the original order of the variant list so failed.txt is deterministic
+    failed = [(pdb_variant,) + failures[i] for i, pdb_variant in enumerate(pdbs_variants)
+              if failures.get(i) is not None]
+    return failed, unstarted
+
+
+async def run_rosetta_pipeline_async(rosetta_main_dir, working_dir, rosetta_hparams, variant_has_mutations=True):
+    """ asyncio version of run_rosetta_pipeline. the rosetta steps are started with asyncio.create_subprocess_exec,
+        so the event loop can prep and finalize other variants while they run """
+    all_start = time.time()
+
+    relax_bin_fn, rosetta_scripts_bin_fn, score_jd2_bin_fn, database_path = get_rosetta_paths(rosetta_main_dir)
+    silent_io = rosetta_hparams["silent_io"]
+
+    # the same steps (and commands) as run_rosetta_pipeline
+    steps = []
+    if variant_has_mutations:
+        steps.append(("mutate", get_mutate_cmd(relax_bin_fn, database_path,
+                                               rosetta_hparams["mutate_default_max_cycles"], silent_io)))
+    else:
+        # variant has no mutations (wild-type), so just rename structure.pdb to structure_0001.pdb
+        os.rename(join(working_dir, "structure.pdb"), join(working_dir, "structure_0001.pdb"))
+
+    steps.append(("relax", get_relax_cmd(relax_bin_fn, database_path, rosetta_hparams["relax_nstruct"],
+                                         rosetta_hparams["relax_repeats"], variant_has_mutations, silent_io)))
+
+    if rosetta_hparams["fused_scoring"]:
+        steps.append(("filter_centroid", get_filter_centroid_cmd(rosetta_scripts_bin_fn, database_path, silent_io)))
+    else:
+        centroid_bin_fn = rosetta_scripts_bin_fn if silent_io else score_jd2_bin_fn
+        steps.append(("filter", get_filter_cmd(rosetta_scripts_bin_fn, database_path, silent_io)))
+        steps.append(("centroid", get_centroid_cmd(centroid_bin_fn, database_path, silent_io)))
+
+    usage = {step: empty_usage() for step in ["mutate", "relax", "filter", "centroid"]}
+    for step, cmd in steps:
+        out_fn = join(working_dir, "{}.out".format(step))
+        return_code, step_usage = await run_measured_async(cmd, working_dir, out_fn, step=step)
+        if return_code != 0:
+            raise RosettaError("{} step did not execute successfully. "
+                               "Return code: {}".format(step.capitalize(), return_code),
+                               out_fn=out_fn, return_code=return_code)
+        # the fused step is recorded under the filter step, same as run_rosetta_pipeline
+        usage["filter" if step == "filter_centroid" else step] = step_usage
+
+    run_times = {step: step_usage["wall_time"] for step, step_usage in usage.items()}
+    run_times["all"] = time.time() - all_start
+    run_times["relax_nstruct_used"] = rosetta_hparams["relax_nstruct"]
+    run_times.update(flatten_usage(usage))
+    return run_times
+
+
+async def run_variant_attempts_async(i, num_variants, pdb_variant, args, rosetta_hparams, job_uuid, working_dir,
+                                     results_fn, log_dir, rosetta_slots, admission, template_hash=None):
+    """ asyncio version of run_variant_attempts. the python-side prep and finalization run in a worker thread so
+        they overlap with the rosetta processes of other variants. rosetta_slots bounds how many rosetta processes
+        run at the same time, and admission (the memory limit, memory model, and set of variants running rosetta)
+        holds a variant back until there's enough memory to run it """
+    loop = asyncio.get_running_loop()
+
+    pdb_basename, variant = pdb_variant.split()
+    pdb_fn = join(args.pdb_dir, pdb_basename)
+    variant_has_mutations = False if variant == "_wt" else True
+
+    cache_fn = None if args.no_cache else args.cache_fn
+
+    num_attempts_per_variant = 3
+    failure = None
+    for attempt in range(num_attempts_per_variant):
+        try:
+            start_time = time.time()
+            cache_key, cached = await loop.run_in_executor(None, try_cached_record, cache_fn, pdb_fn, args.chain,
+                                                           variant, rosetta_hparams, job_uuid, start_time,
+                                                           results_fn, log_dir, template_hash)
+            if cached:
+                return None
+
+            await loop.run_in_executor(None, prep_variant_wd, pdb_fn, args.chain, variant, rosetta_hparams,
+                                       working_dir)
+
+            async with rosetta_slots:
+                # checking and adding to the running set happen without an await in between, so two variants
+                # can't both be admitted based on the same check
+                memory_limit_mb, memory_model, rosetta_running = admission
+                throttled = False
+                while not can_admit_variant(memory_model, memory_limit_mb, len(rosetta_running),
+                                            args.variant_memory_mb):
+                    if not throttled:
+                        print("Waiting for memory to start variant {}".format(pdb_variant), flush=True)
+                        throttled = True
+                    await asyncio.sleep(ADMISSION_POLL_SECONDS)
+
+                rosetta_running.add(i)
+                try:
+                    print("Running Rosetta on variant {} {} ({}/{})".format(basename(pdb_fn), variant,
+                                                                            i + 1, num_variants), flush=True)
+                    run_times = await run_rosetta_pipeline_async(args.rosetta_main_dir, working_dir,
+                                                                 rosetta_hparams, variant_has_mutations)
+                finally:
+                    rosetta_running.discard(i)
+
+            await loop.run_in_executor(None, finalize_variant, pdb_fn, variant, job_uuid, start_time, run_times,
+                                       rosetta_hparams, working_dir, results_fn, log_dir, args.save_wd, cache_fn,
+                                       cache_key)
+            print("Processing variant {} {} took {:.2f}".format(basename(pdb_fn), variant, run_times["all"]),
+                  flush=True)
+
+        except (RosettaError, FileNotFoundError) as e:
+            failure = handle_failed_attempt(e, pdb_variant, attempt, num_attempts_per_variant, args.save_wd,
+                                            working_dir, log_dir)
+
+            # a deterministic failure (bad input) would just fail the same way again
+            if not should_retry(failure[0]):
+                print("Not retrying variant {}".format(pdb_variant), flush=True)
+                break
+        else:
+            return None
+
+    return failure
+
+
+async def sample_memory_periodically(memory_model):
+    """ sample memory every ADMISSION_POLL_SECONDS until cancelled """
+    while True:
+        sample_memory(memory_model)
+        await asyncio.sleep(ADMISSION_POLL_SECONDS)
+
+
+async def run_variants_async(pdbs_variants, args, rosetta_hparams, job_uuid, results_fn, log_dir, stop_time=None,
+                             deadline=None, wd_root=".", template_hash=None):
+    """ asyncio orchestration mode: while a variant's rosetta process runs, the next variant is prepped and the
+        previous one is parsed and cleaned up. at most args.num_workers rosetta processes run at once, and at most
+        two more variants are in flight, so prep can't run far ahead of rosetta (backpressure)
+        returns the list of (variant, failure class, signature) that failed and the list of variants that
+        were never started """
+    rosetta_slots = asyncio.Semaphore(args.num_workers)
+    max_in_flight = args.num_workers + 2
+
+    # each running rosetta process occupies a thread of the default executor (see run_measured_async), so it needs
+    # enough threads for those plus the prep and finalization of the other in-flight variants
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=args.num_workers + max_in_flight))
+
+    # the result cache keys on the contents of the template dir, hashed once for all the variants
+    if template_hash is None and args.cache_fn is not None and not args.no_cache:
+        template_hash = result_cache.get_dir_hash("templates/energize_wd_template")
+
+    memory_limit_mb, memory_model = init_admission(args)
+    admission = (memory_limit_mb, memory_model, set())
+    # keep the memory model learning while variants are running, not just when one is waiting to be admitted
+    sampler = asyncio.ensure_future(sample_memory_periodically(memory_model))
+
+    failures = {}
+    unstarted = []
+    # time from starting a variant to finishing it, including waiting for a rosetta slot, which is when a
+    # variant started now would actually finish
+    variant_times = []
+    running = {}
+    submit_times = {}
+    for i, pdb_variant in enumerate(pdbs_variants):
+        while len(running) >= max_in_flight:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                failures[running.pop(task)] = task.result()
+                variant_times.append(time.time() - submit_times.pop(task))
+
+        if not can_start_variant(stop_time, deadline, variant_times):
+            unstarted = pdbs_variants[i:]
+            break
+
+        # each in-flight variant needs its own working directory
+        working_dir = join(wd_root, "energize_wd_{}".format(i))
+        task = asyncio.ensure_future(run_variant_attempts_async(i, len(pdbs_variants), pdb_variant, args,
+                                                                rosetta_hparams, job_uuid, working_dir,
+                                                                results_fn, log_dir, rosetta_slots, admission,
+                                                                template_hash))
+        running[task] = i
+        submit_times[task] = time.time()
+
+    if len(running) > 0:
+        await asyncio.wait(running)
+        for task, i in running.items():
+            failures[i] = task.result()
+    sampler.cancel()
+
+    # collect failures in the original order of the variant list so failed.txt is deterministic
+    failed = [(pdb_variant,) + failures[i] for i, pdb_variant in enumerate(pdbs_variants)
+              if failures.get(i) is not None]
+    return failed, unstarted
+
+
+def run_mutate_relax_variant(rosetta_main_dir, pdb_fn, chain, variant, rosetta_hparams, job_uuid,
+                             results_fn, output_dir, save_wd=False, working_dir="energize_wd", cache_fn=None):
+    """ batch mode counterpart to run_single_variant that only runs the mutate and relax steps. the working
+        directory is left in place so the filter and centroid steps can be run once over the whole job
+        the result cache is not used in batch mode, cache_fn is only here to match run_single_variant """
+    start_time = time.time()
+
+    template_dir = "templates/energize_wd_template"
+
+    if isdir(working_dir):
+        shutil.rmtree(working_dir)
+
+    prep_working_dir(template_dir, working_dir, pdb_fn, chain, variant,
+                     rosetta_hparams["relax_distance"], rosetta_hparams["relax_repeats"], overwrite_wd=True)
+
+    variant_has_mutations = False if variant == "_wt" else True
+
+    run_times = run_rosetta_pipeline(rosetta_main_dir, working_dir,
+                                     rosetta_hparams["mutate_default_max_cycles"],
+                                     rosetta_hparams["relax_nstruct"],
+                                     rosetta_hparams["relax_repeats"],
+                                     variant_has_mutations,
+                                     scoring_steps=False,
+                                     adaptive_hparams=rosetta_hparams)
+
+    # stash the run times in the working directory so the record can be built after the batch scoring steps
+    # (this function might be running in a worker process, so it can't just hand them back)
+    run_times["start_time"] = start_time
+    save_csv_from_dict(join(working_dir, "run_times.csv"), run_times)
+
+    return run_times["all"]
+
+
+def get_batch_tag(i):
+    """ unique tag for the i-th variant in the job, used to name its structure in the batch scoring steps """
+    return "variant_{:06d}".format(i)
+
+
+def prep_batch_dir(template_dir, batch_dir, structure_fns):
+    """ prep a directory for running the filter and centroid steps once over multiple structures
+        structure_fns maps the batch tag of each variant to its relaxed structure """
+    os.makedirs(batch_dir)
+
+    # the job distributor names outputs after the input filename, so each structure needs a unique filename
+    with open(join(batch_dir, "structures.list"), "w") as f:
+        for tag, structure_fn in structure_fns.items():
+            shutil.copyfile(structure_fn, join(batch_dir, "{}.pdb".format(tag)))
+            f.write("{}.pdb\n".format(tag))
+
+    files_to_copy = ["filter_3rd.xml", "total_hydrophobic_weights_version1.wts",
+                     "total_hydrophobic_weights_version2.wts"]
+    for fn in files_to_copy:
+        shutil.copy(join(template_dir, fn), batch_dir)
+
+    # same flags as the single-variant steps, except the single input structure is swapped for the list
+    for fn in ["flags_filter", "flags_centroid"]:
+        with open(join(template_dir, fn), "r") as f:
+            flags = [line for line in f.read().splitlines() if not line.startswith("-s ")]
+        flags.insert(0, "-l structures.list")
+        with open(join(batch_dir, fn), "w") as f:
+            f.write("\n".join(flags) + "\n")
+
+
+def split_batch_score_sc(score_sc_fn, tags, prefix=""):
+    """ split a score file from a multi-input run back into single-record dataframes, one for each tag
+        the job distributor names each output "<prefix><input name>_<struct num>", which is used for matching.
+        tags that don't have a record in the score file (failed jobs) are left out of the returned dict """
+    columns, values, descriptions = score_files.read_score_sc(score_sc_fn)
+
+    split = {}
+    for tag in tags:
+        pattern = re.compile("^{}(_|$)".format(re.escape(prefix + tag)))
+        tag_rows = [i for i, description in enumerate(descriptions) if pattern.match(description)]
+        if len(tag_rows) > 0:
+            split[tag] = pd.DataFrame([values[tag_rows[0]]], columns=columns)
+    return split
+
+
+def run_batch_scoring(rosetta_main_dir, template_dir, batch_dir, structure_fns):
+    """ run the filter and centroid steps once over all the given structures
+        returns the filter and centroid records for each tag and the per-variant share of each step's run time
+        and resource usage """
+    relax_bin_fn, rosetta_scripts_bin_fn, score_jd2_bin_fn, database_path = get_rosetta_paths(rosetta_main_dir)
+
+    filter_scores, centroid_scores = {}, {}
+    run_times = {"filter": 0, "centroid": 0}
+    run_times.update(flatten_usage({"filter": empty_usage(), "centroid": empty_usage()}))
+    if len(structure_fns) == 0:
+        return filter_scores, centroid_scores, run_times
+
+    prep_batch_dir(template_dir, batch_dir, structure_fns)
+
+    try:
+        filt_start_time = time.time()
+        usage = run_filter_step(rosetta_scripts_bin_fn, database_path, batch_dir)
+        run_times["filter"] = (time.time() - filt_start_time) / len(structure_fns)
+        run_times.update(flatten_usage({"filter": share_usage(usage, len(structure_fns))}))
+        filter_scores = split_batch_score_sc(join(batch_dir, "filter.sc"), structure_fns.keys(), prefix="filter_")
+
+        cent_start_time = time.time()
+        usage = run_centroid_step(score_jd2_bin_fn, database_path, batch_dir)
+        run_times["centroid"] = (time.time() - cent_start_time) / len(structure_fns)
+        run_times.update(flatten_usage({"centroid": share_usage(usage, len(structure_fns))}))
+        centroid_scores = split_batch_score_sc(join(batch_dir, "centroid.sc"), structure_fns.keys())
+
+    except (RosettaError, FileNotFoundError) as e:
+        # any variant without a batch record falls back to being scored in its own working directory
+        print(e, flush=True)
+        print("Encountered error in batch scoring, falling back to per-variant scoring", flush=True)
+
+    return filter_scores, centroid_scores, run_times
+
+
+def finalize_batch_variant(rosetta_main_dir, pdb_fn, variant, job_uuid, working_dir, tag, filter_scores,
+                           centroid_scores, batch_run_times, results_fn, output_dir, save_wd=False):
+    """ build and save the record for a variant after the batch scoring steps. variants that are missing from
+        the batch score files are scored in their own working directory
+        returns None if the variant succeeded, otherwise its (failure class, signature) """
+    relax_bin_fn, rosetta_scripts_bin_fn, score_jd2_bin_fn, database_path = get_rosetta_paths(rosetta_main_dir)
+
+    with open(join(working_dir, "run_times.csv"), "r") as f:
+        run_times = {k: float(v) for k, v in csv.reader(f)}
+    start_time = run_times.pop("start_time")
+
+    failure = None
+    try:
+        if tag in filter_scores:
+            filter_df = filter_scores[tag]
+            run_times.update({k: v for k, v in batch_run_times.items() if k.startswith("filter")})
+        else:
+            filt_start_time = time.time()
+            usage = run_filter_step(rosetta_scripts_bin_fn, database_path, working_dir)
+            run_times["filter"] = time.time() - filt_start_time
+            run_times.update(flatten_usage({"filter": usage}))
+            filter_df = parse_score_sc(join(working_dir, "filter.sc"))
+
+        if tag in centroid_scores:
+            centroid_df = centroid_scores[tag]
+            run_times.update({k: v for k, v in batch_run_times.items() if k.startswith("centroid")})
+        else:
+            cent_start_time = time.time()
+            usage = run_centroid_step(score_jd2_bin_fn, database_path, working_dir)
+            run_times["centroid"] = time.time() - cent_start_time
+            run_times.update(flatten_usage({"centroid": usage}))
+            centroid_df = parse_score_sc(join(working_dir, "centroid.sc"))
+
+    except (RosettaError, FileNotFoundError) as e:
+        print(e, flush=True)
+        failure = classify_failure(e, working_dir)
+        print("Encountered {} error ({}) scoring variant {} {}".format(*failure, basename(pdb_fn), variant),
+              flush=True)
+
+    else:
+        run_times["all"] += run_times["filter"] + run_times["centroid"]
+        score_df = parse_score_sc(join(working_dir, "relax.sc"))
+        full_df = build_variant_record(pdb_fn, variant, job_uuid, start_time, run_times,
+                                       score_df, filter_df, centroid_df)
+        append_record(results_fn, full_df)
+
+    if save_wd:
+        wd_archive.save_wd(working_dir, output_dir, "wd_{}_{}".format(basename(pdb_fn), variant))
+
+    shutil.rmtree(working_dir)
+    return failure
+
+
+def run_variants_batch(pdbs_variants, args, rosetta_hparams, job_uuid, results_fn, log_dir, wd_root="."):
+    """ batch mode: run the variant-specific mutate and relax steps for each variant, then run the
+        variant-independent filter and centroid steps once over all variants, amortizing Rosetta's
+        binary and database startup across the job. returns the list of (variant, failure class, signature)
+        that failed """
+    template_dir = "templates/energize_wd_template"
+    batch_wd = join(wd_root, "energize_batch_wd")
+
+    if isdir(batch_wd):
+        shutil.rmtree(batch_wd)
+    os.makedirs(batch_wd)
+
+    # each variant gets its own working directory inside the batch working directory
+    working_dirs = [join(batch_wd, get_batch_tag(i)) for i in range(len(pdbs_variants))]
+
+    if args.num_workers > 1:
+        with ProcessPoolExecutor(max_workers=args.num_workers) as executor:
+            futures = [executor.submit(run_variant_attempts, i, len(pdbs_variants), pdb_variant, args,
+                                       rosetta_hparams, job_uuid, wd, results_fn, log_dir, run_mutate_relax_variant)
+                       for i, (pdb_variant, wd) in enumerate(zip(pdbs_variants, working_dirs))]
+            failures = [future.result() for future in futures]
+    else:
+        failures = [run_variant_attempts(i, len(pdbs_variants), pdb_variant, args, rosetta_hparams, job_uuid,
+                                          wd, results_fn, log_dir, run_mutate_relax_variant)
+                     for i, (pdb_variant, wd) in enumerate(zip(pdbs_variants, working_dirs))]
+
+    # the structure that gets scored is the same one the single-variant flags_filter and flags_centroid use
+    structure_fns = {get_batch_tag(i): join(wd, "structure_0001_0001.pdb")
+                     for i, (wd, failure) in enumerate(zip(working_dirs, failures)) if failure is None}
+
+    print("Running batch filter and centroid steps on {} variants".format(len(structure_fns)), flush=True)
+    scoring_dir = join(batch_wd, "scoring")
+    filter_scores, centroid_scores, batch_run_times = run_batch_scoring(args.rosetta_main_dir, template_dir,
+                                                                        scoring_dir, structure_fns)
+
+    failed = []
+    for i, (pdb_variant, wd, failure) in enumerate(zip(pdbs_variants, working_dirs, failures)):
+        if failure is None:
+            pdb_basename, variant = pdb_variant.split()
+            failure = finalize_batch_variant(args.rosetta_main_dir, join(args.pdb_dir, pdb_basename), variant,
+                                             job_uuid, wd, get_batch_tag(i), filter_scores, centroid_scores,
+                                             batch_run_times, results_fn, log_dir, args.save_wd)
+        if failure is not None:
+            failed.append((pdb_variant,) + failure)
+
+    if args.save_wd and isdir(scoring_dir):
+        wd_archive.save_wd(scoring_dir, log_dir, "wd_batch_scoring")
+
+    shutil.rmtree(batch_wd)
+    return failed, []
+
+
+def get_checkpoint_fn(checkpoint_dir, cluster, process):
+    """ the checkpoint file for a job points to the log directory created by the job's first start """
+    return join(checkpoint_dir, "checkpoint_{}_{}.txt".format(cluster, process))
+
+
+def save_checkpoint(checkpoint_fn, log_dir):
+    """ durably record the log directory for this job so a restarted job can pick up where it left off """
+    os.makedirs(os.path.dirname(checkpoint_fn), exist_ok=True)
+    temp_fn = checkpoint_fn + ".tmp"
+    with open(temp_fn, "w") as f:
+        f.write("{}\n".format(log_dir))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_fn, checkpoint_fn)
+
+
+def load_checkpoint(checkpoint_fn):
+    """ load the log directory and job uuid from a previous start of this job
+        returns None if there is no checkpoint for this job """
+    if not isfile(checkpoint_fn):
+        return None
+
+    with open(checkpoint_fn, "r") as f:
+        log_dir = f.read().strip()
+
+    with open(join(log_dir, "job.csv"), "r") as f:
+        job_info = dict(csv.reader(f))
+
+    return log_dir, job_info["uuid"]
+
+
 def main(args):
     # rough script start time for logging
     # this will be logged in UTC time (GM time) in the log directory name and output files
     script_start = time.time()
 
-    # generate a unique identifier for this run
-    job_uuid = shortuuid.encode(uuid.uuid4())[:12]
-
-    # create the log directory for this job
-    log_dir = join(args.log_dir_base, get_log_dir_name(args, job_uuid, script_start))
-    os.makedirs(log_dir)
-
-    # save the argparse arguments back out to a file
-    save_argparse_args(vars(args), join(log_dir, "args.txt"))
-
-    # save job info
-    save_job_info(script_start, job_uuid, args.cluster, args.process, args.commit_id, log_dir)
+    # only keep a compressed summary of the rosetta logs of successful steps
+    log_capture.configure(args.log_tail_lines, args.full_logs)
+
+    if args.checkpoint_interval is not None and not args.checkpoint:
+        raise ValueError("--checkpoint_interval requires --checkpoint")
+    if args.checkpoint_interval is not None and args.batch_scoring:
+        raise ValueError("--checkpoint_interval is not supported with --batch_scoring")
+    if args.silent_io and args.batch_scoring:
+        raise ValueError("--silent_io is not supported with --batch_scoring")
+    if args.fused_scoring and args.batch_scoring:
+        raise ValueError("--fused_scoring is not supported with --batch_scoring")
+    if args.async_mode and args.batch_scoring:
+        raise ValueError("--async_mode is not supported with --batch_scoring")
+    if args.time_budget is not None and args.batch_scoring:
+        raise ValueError("--time_budget is not supported with --batch_scoring")
+    if args.time_budget is not None and args.checkpoint_interval is not None:
+        raise ValueError("--time_budget and --checkpoint_interval can't be used together")
+    if args.sweep is not None and (args.batch_scoring or args.async_mode or args.checkpoint):
+        raise ValueError("--sweep is not supported with --batch_scoring, --async_mode, or --checkpoint")
+    if args.adaptive_increment > 0 and args.async_mode:
+        raise ValueError("--adaptive_increment is not supported with --async_mode")
+    if args.wt_baseline and (args.sweep is not None or args.batch_scoring or args.async_mode):
+        raise ValueError("--wt_baseline is not supported with --sweep, --batch_scoring, or --async_mode")
 
     # create a dictionary of just rosetta hyperparameters that can be passed around throughout functions and saved
     rosetta_hparams = {"mutate_default_max_cycles": args.mutate_default_max_cycles,
                        "relax_distance": args.relax_distance,
                        "relax_repeats": args.relax_repeats,
-                       "relax_nstruct": args.relax_nstruct}
-    save_csv_from_dict(join(log_dir, "hparams.csv"), rosetta_hparams)
+                       "relax_nstruct": args.relax_nstruct,
+                       "silent_io": int(args.silent_io),
+                       "fused_scoring": int(args.fused_scoring)}
+    rosetta_hparams.update(adaptive.get_adaptive_hparams(args))
+
+    # when checkpointing, a job that was restarted by HTCondor continues in the log directory from its first start
+    checkpoint_fn = get_checkpoint_fn(args.checkpoint_dir, args.cluster, args.process)
+    checkpoint = load_checkpoint(checkpoint_fn) if args.checkpoint else None
+
+    # a hyperparameter sweep runs a separate job for each set of relax hyperparameters, sharing the mutate step
+    # the first job of the sweep stands in for the whole sweep in the variant loop (see run_sweep_variant)
+    # the result cache and WT baselines are keyed by the contents of the template dir, which is hashed once here
+    # rather than for every variant
+    template_hash = result_cache.get_dir_hash("templates/energize_wd_template")
+
+    sweep_jobs = None
+    run_fn = functools.partial(run_single_variant, template_hash=template_hash)
+    if args.sweep is not None:
+        sweep_jobs = create_sweep_jobs(args, script_start, parse_sweep(args.sweep, rosetta_hparams))
+        rosetta_hparams, job_uuid, log_dir = [sweep_jobs[0][k] for k in ["rosetta_hparams", "job_uuid", "log_dir"]]
+        run_fn = functools.partial(run_sweep_variant, sweep_jobs=sweep_jobs, template_hash=template_hash)
+        print("Running a sweep over {} hyperparameter sets, one job each: {}".format(
+            len(sweep_jobs), ", ".join(sweep_job["job_uuid"] for sweep_job in sweep_jobs)), flush=True)
+    elif checkpoint is not None:
+        log_dir, job_uuid = checkpoint
+        print("Resuming job {} from checkpoint in {}".format(job_uuid, log_dir), flush=True)
+    else:
+        # generate a unique identifier for this run
+        job_uuid = shortuuid.encode(uuid.uuid4())[:12]
+
+        # create the log directory for this job
+        log_dir = join(args.log_dir_base, get_log_dir_name(args, job_uuid, script_start))
+        os.makedirs(log_dir)
+
+        # save the argparse arguments back out to a file
+        save_argparse_args(vars(args), join(log_dir, "args.txt"))
+
+        # save job info
+        save_job_info(script_start, job_uuid, args.cluster, args.process, args.commit_id, log_dir)
+
+    if sweep_jobs is None:
+        save_csv_from_dict(join(log_dir, "hparams.csv"), rosetta_hparams)
+
+    # each record references the WT baseline of its PDB, computed at most once per job (see wt_baseline.py)
+    if args.wt_baseline:
+        run_fn = functools.partial(run_single_variant, use_wt_baseline=True, wt_baseline_dir=args.wt_baseline_dir,
+                                   template_hash=template_hash)
+
+    if args.checkpoint and checkpoint is None:
+        save_checkpoint(checkpoint_fn, log_dir)
 
     # load the variants that will be processed with this run
     # this file contains a line for each variant
@@ -374,69 +1408,83 @@ def main(args):
     with open(args.variants_fn, "r") as f:
         pdbs_variants = f.read().splitlines()
 
-    # set up the staging dir....
-    staging_dir = join(log_dir, "staging")
-    os.makedirs(staging_dir, exist_ok=True)
+    # each variant's record is appended to energies.csv in the log directory as soon as the variant finishes
+    # the file only gets created once the first variant succeeds, and a partial file from an evicted job is
+    # still a valid energies.csv containing all the variants that finished before the eviction
+    results_fn = join(log_dir, "energies.csv")
+
+    # energies.csv doubles as the record of completed variants, so a resumed job skips anything already in it
+    # variants that failed during a previous start are not in energies.csv, so they get another chance
+    completed = load_completed_variants(results_fn)
+    to_run = [pdb_variant for pdb_variant in pdbs_variants if pdb_variant not in completed]
+    if len(completed) > 0:
+        print("Skipping {} variants that completed before the checkpoint".format(len(pdbs_variants) - len(to_run)),
+              flush=True)
+
+    # for HTCondor self-checkpointing, stop starting new variants after the checkpoint interval
+    stop_time = None
+    if args.checkpoint_interval is not None:
+        stop_time = script_start + args.checkpoint_interval
+
+    # with a time budget, stop starting new variants once the next one isn't expected to finish within the budget
+    deadline = None
+    if args.time_budget is not None:
+        deadline = script_start + args.time_budget
+
+    # the per-variant working directories go on a fast path (like /dev/shm) when there is room
+    wd_root = get_wd_root(args.wd_base, job_uuid, args.wd_min_free_gb)
 
     # loop through each variant, model it with rosetta, save results
-    # individual variant outputs will be placed in the staging directory
-    failed = []  # keep track of any variants that file after 3 attempts
-    for i, pdb_variant in enumerate(pdbs_variants):
-        pdb_basename, variant = pdb_variant.split()
-        pdb_fn = join(args.pdb_dir, pdb_basename)
-
-        # sometimes a single variant fails but others were/are successful
-        # give variants 3 attempts at success, then move on to other variants
-        # in worst case scenario, there is a system-level problem that will cause all variants to fail
-        num_attempts_per_variant = 3
-        for attempt in range(num_attempts_per_variant):
-            try:
-                print("Running Rosetta on variant {} {} ({}/{})".format(basename(pdb_fn), variant,
-                                                                        i + 1, len(pdbs_variants)), flush=True)
-                run_time = run_single_variant(args.rosetta_main_dir, pdb_fn, args.chain, variant, rosetta_hparams, staging_dir,
-                                              log_dir, args.save_wd)
-                print("Processing variant {} {} took {:.2f}".format(basename(pdb_fn), variant, run_time), flush=True)
-
-            except (RosettaError, FileNotFoundError) as e:
-                print(e, flush=True)
-                print("Encountered error running variant {} {}. "
-                      "Attempts remaining: {}".format(pdb_basename, variant, num_attempts_per_variant - attempt - 1),
-                      flush=True)
-
-                # if we are supposed to save the working directory, save it now
-                # the run_single_variant() function doesn't take care of this when there's an exception
-                # todo: if we end up using variant-specific working dir, update here
-                working_dir = "energize_wd"
-                if args.save_wd:
-                    shutil.copytree(working_dir, join(log_dir, "wd_{}_{}_{}".format(basename(pdb_fn), variant, attempt)))
-
-                # clean up the working dir in preparation for next variant
-                shutil.rmtree(working_dir)
-            else:
-                # successful variant run, so break out of the attempt loop
-                break
+    try:
+        if args.batch_scoring:
+            failed, unstarted = run_variants_batch(to_run, args, rosetta_hparams, job_uuid, results_fn, log_dir,
+                                                   wd_root)
+        elif args.async_mode:
+            failed, unstarted = asyncio.run(run_variants_async(to_run, args, rosetta_hparams, job_uuid, results_fn,
+                                                               log_dir, stop_time, deadline, wd_root, template_hash))
+        elif args.num_workers > 1:
+            failed, unstarted = run_variants_pool(to_run, args, rosetta_hparams, job_uuid, results_fn, log_dir,
+                                                  stop_time, deadline, wd_root, run_fn)
         else:
-            # else clause of the for loop triggers if we burned through all attempts without success
-            # add this variant to a failed_variants.txt file and continue with the other variants
-            failed.append(pdb_variant)
+            failed, unstarted = run_variants_serial(to_run, args, rosetta_hparams, job_uuid, results_fn, log_dir,
+                                                    stop_time, deadline, wd_root, run_fn)
+    finally:
+        # don't leave anything behind, especially on /dev/shm which is shared with other jobs on the node
+        shutil.rmtree(wd_root, ignore_errors=True)
+        if args.wt_baseline:
+            wt_baseline.remove_lock_files(log_dir)
+
+    # every job of a sweep ran the same variants, so each of them gets the remaining and failed variants
+    log_dirs = [log_dir] if sweep_jobs is None else [sweep_job["log_dir"] for sweep_job in sweep_jobs]
+
+    # save the variants that didn't fit in the time budget, in the same format as the variants file, so they can
+    # be resubmitted as their own job
+    if deadline is not None and len(unstarted) > 0:
+        print("Time budget reached with {} variants remaining".format(len(unstarted)), flush=True)
+        for ld in log_dirs:
+            with open(join(ld, "remaining.txt"), "w") as f:
+                for pdb_variant in unstarted:
+                    f.write("{}\n".format(pdb_variant))
+    elif len(unstarted) > 0:
+        # exit with the checkpoint exit code so HTCondor transfers the output directory and restarts the job
+        # variants that failed during this start will be retried after the restart
+        print("Checkpointing with {} variants remaining".format(len(unstarted)), flush=True)
+        sys.exit(args.checkpoint_exit_code)
 
     # save a txt file with failed variants (if there are failed variants)
-    if len(failed) > 0:
-        with open(join(log_dir, "failed.txt"), "w") as f:
-            for fv in failed:
-                f.write("{}\n".format(fv))
-
-    # if any variants were successful, concat the outputs into a final energies.csv
-    if len(failed) < len(pdbs_variants):
-        # combine outputs in the staging directory into a single csv file
-        cdf = combine_outputs(join(log_dir, "staging"))
-        # add additional column for job uuid
-        cdf.insert(2, "job_uuid", job_uuid)
-        # save in the main log directory
-        cdf.to_csv(join(log_dir, "energies.csv"), index=False)
-
-    # compress outputs, delete the output staging directory, etc
-    shutil.rmtree(join(log_dir, "staging"))
+    # each line is the variant, the failure class, and the log signature, separated by tabs, so reruns can target
+    # just the transient failures (see analysis.load_failed_variants)
+    for ld in log_dirs:
+        failed_fn = join(ld, "failed.txt")
+        if len(failed) > 0:
+            with open(failed_fn, "w") as f:
+                for fv in failed:
+                    f.write("{}\t{}\t{}\n".format(*fv))
+        elif isfile(failed_fn):
+            # left over from a previous start of this job, those variants have since succeeded
+            os.remove(failed_fn)
+        # the job went through its whole variant list (remaining.txt has any that didn't fit in the time budget)
+        mark_job_done(ld)
 
     if (len(failed) / len(pdbs_variants)) > args.allowable_failure_fraction:
         # too many variants failed in this job. exit with failure code.
@@ -446,6 +1494,8 @@ def main(args):
         #  fail. the job will get rescheduled anyway and the variants will run on a new machine.
         #  but if we're going to run again, might as well keep the duplicate variants anyway? they get filtered out
         #  later...
+        #  with --checkpoint, the rescheduled job resumes in this log directory and only reruns the failed
+        #  variants, so there are no duplicates
         sys.exit(1)
 
 
@@ -481,6 +1531,34 @@ if __name__ == "__main__":
                         type=float,
                         default=0.25)
 
+    parser.add_argument("--num_workers",
+                        help="number of variants to run concurrently in a local process pool. each worker "
+                             "gets its own working directory. make sure request_cpus in the submit file matches",
+                        type=int,
+                        default=1)
+
+    parser.add_argument("--batch_scoring",
+                        help="set this flag to run the filter and centroid steps once over all variants in the job "
+                             "instead of once per variant, which amortizes Rosetta startup across the job",
+                        action="store_true")
+
+    parser.add_argument("--async_mode",
+                        help="set this flag to run variants with asyncio, prepping the next variant and finalizing "
+                             "the previous one while rosetta runs. num_workers sets how many rosetta processes can "
+                             "run at once",
+                        action="store_true")
+    parser.add_argument("--memory_limit_mb",
+                        help="memory limit for running variants concurrently (num_workers > 1). by default, it's "
+                             "read from the cgroup or the HTCondor machine ad, falling back to physical memory. "
+                             "a new variant only starts if its predicted peak memory fits",
+                        type=float,
+                        default=None)
+    parser.add_argument("--variant_memory_mb",
+                        help="predicted peak memory of a variant before any rosetta processes have been measured. "
+                             "after that, the prediction comes from the peak rss of each step in earlier variants",
+                        type=float,
+                        default=1000)
+
     # energize hyperparameters
     parser.add_argument("--mutate_default_max_cycles",
                         help="number of optimization cycles in the mutate step",
@@ -498,16 +1576,126 @@ if __name__ == "__main__":
                         help="distance threshold in angstroms for the residue selector in the relax step",
                         type=float,
                         default=10.0)
+    parser.add_argument("--adaptive_increment",
+                        help="run relax in increments of this many structures and stop early once the total scores "
+                             "converge, with relax_nstruct as the upper limit (see adaptive.py). "
+                             "set to 0 to always run all relax_nstruct structures",
+                        type=int,
+                        default=0)
+    parser.add_argument("--adaptive_patience",
+                        help="with adaptive sampling, stop when the lowest total score hasn't improved by more than "
+                             "adaptive_tolerance in this many consecutive structures. set to 0 to disable",
+                        type=int,
+                        default=3)
+    parser.add_argument("--adaptive_tolerance",
+                        help="with adaptive sampling, the smallest decrease of the lowest total score (REU) that "
+                             "counts as an improvement",
+                        type=float,
+                        default=0.5)
+    parser.add_argument("--adaptive_sem",
+                        help="with adaptive sampling, also stop when the standard error of the mean total score "
+                             "drops below this threshold (REU). set to 0 to disable",
+                        type=float,
+                        default=0.0)
+    parser.add_argument("--sweep",
+                        help="run a hyperparameter sweep, with one job for each of the given sets of relax "
+                             "hyperparameters, like \"relax_distance=8,relax_repeats=5\". relax_distance, "
+                             "relax_repeats, and relax_nstruct can be swept, anything not given in a set keeps the "
+                             "value from the regular argument. the mutate step only runs once per variant",
+                        type=str,
+                        nargs="+",
+                        default=None)
+    parser.add_argument("--silent_io",
+                        help="set this flag to pass structures between the pipeline steps as binary silent files "
+                             "instead of pdb files (uses the _silent flags files from the template dir)",
+                        action="store_true")
+    parser.add_argument("--fused_scoring",
+                        help="set this flag to run the filter and centroid steps in a single rosetta process "
+                             "(filter_centroid.xml) instead of two",
+                        action="store_true")
 
     # logging and output options
     parser.add_argument("--save_wd",
-                        help="set this flag to save the full working directory for each variant",
+                        help="set this flag to save the full working directory for each variant "
+                             "to the wd_archive directory in the log directory (see wd_archive.py)",
+                        action="store_true")
+
+    parser.add_argument("--log_tail_lines",
+                        help="number of lines kept from the end of the rosetta log of each successful step, along "
+                             "with any error lines. the logs of failed steps are always kept in full",
+                        type=int,
+                        default=200)
+
+    parser.add_argument("--full_logs",
+                        help="set this flag to keep the full rosetta logs of successful steps too",
                         action="store_true")
 
     parser.add_argument("--log_dir_base",
                         help="base output directory where log dirs for each run will be placed",
                         default="output/energize_outputs")
 
+    # checkpointing options
+    parser.add_argument("--checkpoint",
+                        help="set this flag to resume from the log directory of a previous start of this job "
+                             "(same cluster and process), skipping variants that already completed",
+                        action="store_true")
+
+    parser.add_argument("--checkpoint_dir",
+                        help="directory for checkpoint files. must be in transfer_checkpoint_files on HTCondor",
+                        default="output/checkpoints")
+
+    parser.add_argument("--checkpoint_interval",
+                        help="seconds after which the job stops starting new variants and exits with "
+                             "checkpoint_exit_code so HTCondor can checkpoint it. requires --checkpoint",
+                        type=float,
+                        default=None)
+
+    parser.add_argument("--checkpoint_exit_code",
+                        help="exit code used for HTCondor self-checkpointing (checkpoint_exit_code in submit file)",
+                        type=int,
+                        default=85)
+
+    # working directory options
+    parser.add_argument("--wd_base",
+                        help="fast path (like a tmpfs) for the per-variant working directories. falls back to the "
+                             "current directory if it doesn't exist or doesn't have wd_min_free_gb of free space",
+                        default="/dev/shm")
+
+    parser.add_argument("--wd_min_free_gb",
+                        help="minimum free space in wd_base needed to place the working directories there",
+                        type=float,
+                        default=1.0)
+
+    # result cache options
+    parser.add_argument("--cache_fn",
+                        help="SQLite database for the result cache (off by default, so replicates are always rerun). "
+                             "variants with a cached result for the same pdb file, hyperparameters, and template "
+                             "directory are not rerun",
+                        default=None)
+
+    parser.add_argument("--no_cache",
+                        help="set this flag to disable the result cache even if cache_fn is given (for example, in "
+                             "an arguments file)",
+                        action="store_true")
+    parser.add_argument("--wt_baseline",
+                        help="set this flag to compute the WT baseline of each PDB once per job and reference it "
+                             "in each variant's record (wt_baseline column, baselines saved in the wt_baselines "
+                             "directory of the log dir), so delta energies can be computed without extra runs",
+                        action="store_true")
+    parser.add_argument("--wt_baseline_dir",
+                        help="shared directory of WT baselines to reuse across jobs, baselines computed by this job "
+                             "are added to it. only used with --wt_baseline",
+                        type=str,
+                        default=None)
+
+    # scheduling options
+    parser.add_argument("--time_budget",
+                        help="wall-clock budget in seconds for this job. no new variants are started once the "
+                             "running per-variant runtime estimate says they won't finish within the budget. "
+                             "variants that don't get started are saved to remaining.txt in the log directory",
+                        type=float,
+                        default=None)
+
     # HTCondor job information and program run information
     parser.add_argument("--cluster",
                         help="cluster (when running on HTCondor)",
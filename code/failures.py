@@ -0,0 +1,85 @@
+""" classify failed Rosetta steps as transient (worth retrying) or deterministic (will fail again) """
+
+import gzip
+import os
+import re
+from os.path import join, isfile, isdir
+
+TRANSIENT = "transient"
+DETERMINISTIC = "deterministic"
+UNKNOWN = "unknown"
+
+# known signatures in the Rosetta stdout/stderr logs (mutate.out, relax.out, dock.out, etc.)
+# each signature is (name, failure class, regex)
+FAILURE_SIGNATURES = [
+    # problems with the execute node, the same variant will probably succeed on another attempt
+    ("out_of_memory", TRANSIENT, re.compile(r"std::bad_alloc|Cannot allocate memory|[Oo]ut of memory")),
+    ("disk_full", TRANSIENT, re.compile(r"No space left on device|Disk quota exceeded")),
+    ("io_error", TRANSIENT, re.compile(r"Input/output error|Stale file handle")),
+
+    # problems with the inputs, these fail the same way every time
+    ("unrecognized_residue", DETERMINISTIC, re.compile(r"[Uu]nrecognized residue")),
+    ("unknown_residue_type", DETERMINISTIC,
+     re.compile(r"[Cc]an(no|')t find residue type|[Uu]nable to find (desired )?residue type|no ResidueType named")),
+    ("bad_residue", DETERMINISTIC,
+     re.compile(r"[Rr]esidue \S+ (does not exist|not found|is out of range)|[Rr]esnum \S+ not in pose")),
+    ("bad_ligand_params", DETERMINISTIC, re.compile(r"[Cc]ould not find params file|[Ee]rror reading params file")),
+    ("bad_resfile", DETERMINISTIC, re.compile(r"ResfileReaderException|[Ee]rror (reading|parsing) resfile")),
+    ("bad_xml", DETERMINISTIC,
+     re.compile(r"XML Schema Validation Error|[Ee]rror parsing XML|failed to validate against the schema")),
+]
+
+
+def scan_log(out_fn):
+    """ returns the names and classes of all known failure signatures found in a Rosetta log file
+        the gzipped log summaries of successful steps (see log_capture.py) are scanned too """
+    found = []
+    open_fn = gzip.open if out_fn.endswith(".gz") else open
+    with open_fn(out_fn, "rt", errors="replace") as f:
+        for line in f:
+            for name, failure_class, pattern in FAILURE_SIGNATURES:
+                if (name, failure_class) not in found and pattern.search(line):
+                    found.append((name, failure_class))
+    return found
+
+
+def classify_failure(e, working_dir):
+    """ classify the exception raised by a failed variant run as transient, deterministic, or unknown
+        returns a tuple of (failure class, signature name). unknown failures should be retried like transient ones """
+
+    # killed by a signal (negative return code), most likely the OOM killer or the job being preempted
+    return_code = getattr(e, "return_code", None)
+    if return_code is not None and return_code < 0:
+        return TRANSIENT, "killed_by_signal"
+
+    # the log for the step that failed, or all the step logs if we don't know which step failed
+    # (for example, a step can exit cleanly but not produce the expected score file)
+    out_fn = getattr(e, "out_fn", None)
+    if out_fn is not None:
+        out_fns = [out_fn] if isfile(out_fn) else []
+    elif isdir(working_dir):
+        out_fns = sorted(join(working_dir, fn) for fn in os.listdir(working_dir)
+                         if fn.endswith(".out") or fn.endswith(".out.gz"))
+    else:
+        out_fns = []
+
+    if len(out_fns) == 0 and isinstance(e, FileNotFoundError):
+        # the variant failed before rosetta ran, so an input file (pdb file or template) is missing
+        return DETERMINISTIC, "missing_input"
+
+    found = []
+    for fn in out_fns:
+        found += scan_log(fn)
+
+    # problems with the execute node take precedence, since they can also cause errors that look deterministic
+    for failure_class in [TRANSIENT, DETERMINISTIC]:
+        for name, fc in found:
+            if fc == failure_class:
+                return failure_class, name
+
+    return UNKNOWN, "unknown"
+
+
+def should_retry(failure_class):
+    """ only deterministic failures are not worth retrying """
+    return failure_class != DETERMINISTIC
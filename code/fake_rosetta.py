@@ -0,0 +1,274 @@
+""" a stand-in for the Rosetta binaries (relax, rosetta_scripts, score_jd2) for benchmarking and testing the
+    orchestration code without a Rosetta build. it reads the same flags and options files as Rosetta, sleeps
+    for a configurable time, and writes structures and score files with the column sets from the database schema
+    the benchmark harness (benchmark.py) sets up wrapper scripts at the paths energize.get_rosetta_paths() expects
+
+    usage: fake_rosetta.py <relax|rosetta_scripts|score_jd2> [rosetta args]
+
+    environment variables:
+        FAKE_ROSETTA_SLEEP: seconds to sleep per process (default 0)
+        FAKE_ROSETTA_FAIL_RATE: probability that a process fails with a nonzero return code (default 0)
+        FAKE_ROSETTA_SCHEMA_DIR: directory with create_tables.sql and create_tables_docking.sql
+                                 (default variant_database next to this script's directory) """
+
+import os
+import random
+import re
+import shutil
+import sys
+import time
+import xml.etree.ElementTree as ET
+from os.path import join, basename, dirname, abspath, isfile, isdir
+
+APPS = ["relax", "rosetta_scripts", "score_jd2"]
+
+DEFAULT_SCHEMA_DIR = join(dirname(dirname(abspath(__file__))), "variant_database")
+
+# the score terms of each step, keyed by the first column of the block in the variant table
+ENERGY_BLOCK = "total_score"
+FILTER_BLOCK = "filter_total_score"
+CENTROID_BLOCK = "centroid_total_score"
+
+
+def split_option_tokens(tokens):
+    """ group a list of tokens into (option, values) pairs. an option starts with "-" and a letter,
+        so negative numbers are values """
+    options = []
+    for token in tokens:
+        if re.match(r"^-[A-Za-z]", token):
+            options.append((token[1:], []))
+        elif len(options) > 0:
+            options[-1][1].append(token)
+    return options
+
+
+def read_options_file(fn):
+    """ read a Rosetta flags/options file. supports the flat format ("-out:file:scorefile mutate.sc") and the
+        indented format, where "-out" followed by an indented "-path" and "-all mutated_structures" means
+        "-out:path:all mutated_structures". comments start with "#" """
+    options = []
+    # stack of (indent, option group) for the indented format
+    groups = []
+    with open(fn, "r") as f:
+        for line in f:
+            line = line.split("#", 1)[0].rstrip()
+            if line.strip() == "":
+                continue
+            indent = len(line) - len(line.lstrip())
+            while len(groups) > 0 and groups[-1][0] >= indent:
+                groups.pop()
+
+            line_options = split_option_tokens(line.split())
+            for name, values in line_options:
+                options.append((":".join([g for _, g in groups] + [name]), values))
+
+            # an option without values can be the group for the indented lines that follow
+            if len(line_options) > 0 and len(line_options[-1][1]) == 0:
+                groups.append((indent, line_options[-1][0]))
+    return options
+
+
+def parse_args(argv):
+    """ expand @files and return the options as a list of (name, values), later options take precedence """
+    options = []
+    tokens = []
+    for arg in argv:
+        if arg.startswith("@"):
+            options += split_option_tokens(tokens)
+            tokens = []
+            options += read_options_file(arg[1:])
+        else:
+            # arguments like "-docking:partners A_C" can be passed as a single argument
+            tokens += arg.split()
+    options += split_option_tokens(tokens)
+    return options
+
+
+def get_option(options, names, default=None):
+    """ values of the last occurrence of any of the given option names, or the default """
+    found = default
+    for name, values in options:
+        if name in names:
+            found = values
+    return found
+
+
+def get_single_option(options, names, default=None):
+    values = get_option(options, names)
+    return values[0] if values else default
+
+
+def get_missing_ligand_files(options):
+    """ the ligand params files (-extra_res_fa, which can be given more than once) and the conformer libraries they
+        reference that don't exist. like rosetta, the conformer library is relative to the params file """
+    missing = []
+    for name, values in options:
+        if name not in ["extra_res_fa", "in:file:extra_res_fa"]:
+            continue
+        for params_fn in values:
+            if not isfile(params_fn):
+                missing.append(params_fn)
+                continue
+            with open(params_fn, "r") as f:
+                for line in f:
+                    if line.startswith("PDB_ROTAMERS") and not isfile(join(dirname(params_fn), line.split()[1])):
+                        missing.append(join(dirname(params_fn), line.split()[1]))
+    return missing
+
+
+def load_score_blocks(schema_fn):
+    """ the score term blocks of the variant table in a create_tables sql file. blocks are separated by blank
+        lines, and the score term blocks are the ones where every column is REAL (the first block has the variant
+        info and resource usage). returns a dict mapping the first column of each block to the block's columns """
+    with open(schema_fn, "r") as f:
+        sql = f.read()
+    variant_table = re.search(r"CREATE TABLE IF NOT EXISTS\s+`variant`\s*\((.*?)PRIMARY KEY", sql, re.S).group(1)
+
+    blocks = {}
+    for block in re.split(r"\n\s*\n", variant_table):
+        columns = re.findall(r"`([^`]+)`\s+(\w+)", block)
+        if len(columns) > 0 and all(col_type == "REAL" for _, col_type in columns):
+            blocks[columns[0][0]] = [name for name, _ in columns]
+    return blocks
+
+
+def get_score_columns(app, options, schema_dir):
+    """ the columns a real Rosetta run of this step would write to its score file """
+    energize_blocks = load_score_blocks(join(schema_dir, "create_tables.sql"))
+    protocol = basename(get_single_option(options, ["parser:protocol"], ""))
+
+    if app == "score_jd2":
+        columns = energize_blocks[CENTROID_BLOCK]
+    elif protocol == "filter_3rd.xml":
+        columns = energize_blocks[FILTER_BLOCK]
+    elif "docking" in protocol:
+        columns = load_score_blocks(join(schema_dir, "create_tables_docking.sql"))[ENERGY_BLOCK]
+    elif protocol != "" and isfile(protocol) and ET.parse(protocol).getroot().find("FILTERS") is not None:
+        # other filter protocols report each filter by name
+        filters = ET.parse(protocol).getroot().find("FILTERS")
+        columns = [ENERGY_BLOCK] + [f.get("name") for f in filters]
+    else:
+        columns = energize_blocks[ENERGY_BLOCK]
+
+    # the total score is always called total_score in the score file
+    return [ENERGY_BLOCK] + columns[1:]
+
+
+def get_inputs(options):
+    """ the input structures as a list of (tag, filename), filename is None for structures from a silent file """
+    silent_fn = get_single_option(options, ["in:file:silent"])
+    if silent_fn is not None:
+        tags = get_option(options, ["in:file:tags"])
+        if tags is None:
+            with open(silent_fn, "r") as f:
+                tags = [line.split()[-1] for line in f
+                        if line.startswith("SCORE:") and line.split()[1] not in ["score", "total_score"]]
+        return [(tag, None) for tag in tags]
+
+    list_fn = get_single_option(options, ["l", "in:file:l"])
+    if list_fn is not None:
+        with open(list_fn, "r") as f:
+            pdb_fns = [line.strip() for line in f if line.strip() != ""]
+    else:
+        pdb_fns = get_option(options, ["s", "in:file:s"], [])
+
+    return [(re.sub(r"\.pdb(\.gz)?$", "", basename(fn)), fn) for fn in pdb_fns]
+
+
+def fake_scores(columns, seed):
+    """ reproducible, roughly realistic values for each column """
+    rng = random.Random(seed)
+    values = []
+    for col in columns:
+        if col == ENERGY_BLOCK:
+            values.append(rng.uniform(-350, -250))
+        else:
+            values.append(rng.gauss(0, 20))
+    return values
+
+
+def write_score_lines(fn, columns, records, header_name=ENERGY_BLOCK):
+    """ write (or append to) a score file with the SEQUENCE: and SCORE: header layout """
+    is_new = not isfile(fn)
+    with open(fn, "a") as f:
+        if is_new:
+            f.write("SEQUENCE: \n")
+            f.write("SCORE: {} description\n".format(" ".join([header_name] + columns[1:])))
+        for tag, values in records:
+            f.write("SCORE: {} {}\n".format(" ".join("{:.3f}".format(v) for v in values), tag))
+
+
+def main(argv):
+    if len(argv) < 1 or argv[0] not in APPS:
+        print("usage: fake_rosetta.py <{}> [rosetta args]".format("|".join(APPS)), file=sys.stderr)
+        return 2
+    app = argv[0]
+    options = parse_args(argv[1:])
+
+    print("core.init: Rosetta version: fake_rosetta ({})".format(app), flush=True)
+    start = time.time()
+    time.sleep(float(os.environ.get("FAKE_ROSETTA_SLEEP", 0)))
+
+    if random.random() < float(os.environ.get("FAKE_ROSETTA_FAIL_RATE", 0)):
+        print("ERROR: fake_rosetta failure (FAKE_ROSETTA_FAIL_RATE)", flush=True)
+        return 1
+
+    try:
+        inputs = get_inputs(options)
+    except OSError as e:
+        print("ERROR: Cannot open file: {}".format(e), flush=True)
+        return 1
+    for _, fn in inputs:
+        if fn is not None and not isfile(fn):
+            print("ERROR: Cannot open file \"{}\"".format(fn), flush=True)
+            return 1
+
+    for fn in get_missing_ligand_files(options):
+        print("ERROR: Cannot open file \"{}\"".format(fn), flush=True)
+        return 1
+
+    columns = get_score_columns(app, options, os.environ.get("FAKE_ROSETTA_SCHEMA_DIR", DEFAULT_SCHEMA_DIR))
+    prefix = get_single_option(options, ["out:prefix"], "")
+    suffix = get_single_option(options, ["out:suffix"], "")
+    seed = get_single_option(options, ["run:jran", "jran"], "0")
+    out_dir = get_single_option(options, ["out:path:all"], ".")
+    score_dir = get_single_option(options, ["out:path:score"], out_dir)
+
+    score_only_fn = get_single_option(options, ["out:file:score_only"])
+    if score_only_fn is not None:
+        # score-only runs (filter and centroid steps) just score each input structure once
+        records = [(prefix + tag + suffix + "_0001", fake_scores(columns, "{}-{}".format(seed, tag)))
+                   for tag, _ in inputs]
+        write_score_lines(join(score_dir, score_only_fn), columns, records)
+    else:
+        nstruct = int(get_single_option(options, ["nstruct", "out:nstruct"], "1"))
+        records = []
+        for tag, fn in inputs:
+            for i in range(1, nstruct + 1):
+                out_tag = "{}{}{}_{:04d}".format(prefix, tag, suffix, i)
+                records.append((out_tag, fake_scores(columns, "{}-{}".format(seed, out_tag))))
+                if get_single_option(options, ["out:file:silent"]) is None:
+                    os.makedirs(out_dir, exist_ok=True)
+                    if fn is not None:
+                        shutil.copyfile(fn, join(out_dir, out_tag + ".pdb"))
+                    else:
+                        with open(join(out_dir, out_tag + ".pdb"), "w") as f:
+                            f.write("REMARK fake_rosetta structure {}\n".format(out_tag))
+
+        silent_fn = get_single_option(options, ["out:file:silent"])
+        if silent_fn is not None:
+            # silent files name the total score "score"
+            write_score_lines(join(out_dir, silent_fn), columns, records, header_name="score")
+        else:
+            os.makedirs(score_dir, exist_ok=True)
+            write_score_lines(join(score_dir, get_single_option(options, ["out:file:scorefile"], "score.sc")),
+                              columns, records)
+
+    for tag, _ in inputs:
+        print("protocols.jd2.JobDistributor: {} reported success in {} seconds".format(
+            tag, int(time.time() - start)), flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,90 @@
+""" parallel fan-out of a multi-structure rosetta step (the docking -nstruct) across concurrent processes
+    rosetta runs the trajectories of a single process one after the other on a single core. with fan-out, the
+    structures are split across several processes that run at the same time, each with its own constant seed and
+    output prefix so the structures don't collide. the partial score files of the processes are merged into the
+    score file the single process would have written, so the rest of the pipeline doesn't change
+    the seeds and the number of structures of each process are returned, so the results can be reproduced """
+
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from os.path import join, isfile
+
+from resources import run_measured, combine_parallel_usage
+
+# largest seed drawn when no base seed is given, rosetta seeds are 32-bit signed ints
+MAX_SEED = 2 ** 30
+
+
+def draw_base_seed():
+    return random.SystemRandom().randint(1, MAX_SEED)
+
+
+def split_nstruct(nstruct, num_procs):
+    """ split nstruct structures as evenly as possible across at most num_procs processes (no empty processes) """
+    num_procs = min(num_procs, nstruct)
+    return [nstruct // num_procs + (1 if k < nstruct % num_procs else 0) for k in range(num_procs)]
+
+
+def process_out_fn(out_fn, k):
+    """ a separate log for each process, e.g. dock.out -> dock_f0.out """
+    base, ext = out_fn.rsplit(".", 1)
+    return "{}_f{}.{}".format(base, k, ext)
+
+
+def merge_score_files(partial_fns, score_fn):
+    """ append the SCORE: lines of the partial score files to score_fn, in process order. the header is only
+        written if score_fn doesn't exist yet. the partial files are removed """
+    write_header = not os.path.isfile(score_fn)
+    with open(score_fn, "a") as out_f:
+        for fn in partial_fns:
+            with open(fn, "r") as f:
+                for line_num, line in enumerate(f):
+                    # the first two lines are the SEQUENCE: line and the column header
+                    if line_num < 2 and not write_header:
+                        continue
+                    out_f.write(line)
+            write_header = False
+            os.remove(fn)
+
+
+def run_fanout(cmd, working_dir, out_fn, score_dir, score_fn, nstruct, num_procs, base_seed, seeds, step=None):
+    """ run nstruct structures of cmd (which shouldn't set -nstruct, the scorefile, the seed, or the prefix) split
+        across num_procs concurrent processes. process k uses seed base_seed + k. the score files are merged into
+        score_dir/score_fn (relative to working_dir), and the (seed, nstruct) of each process is appended to seeds
+        the processes are tagged with the pipeline step for admission control (see resources.run_measured)
+        returns the return code and log of the first failed process (or 0 and out_fn), and the combined usage """
+    runs = []
+    for k, proc_nstruct in enumerate(split_nstruct(nstruct, num_procs)):
+        partial_score_fn = "{}_f{}.sc".format(score_fn.rsplit(".", 1)[0], k)
+        proc_cmd = cmd + ["-nstruct", str(proc_nstruct),
+                          "-out:file:scorefile", partial_score_fn,
+                          "-run:constant_seed", "-run:jran", str(base_seed + k),
+                          "-out:prefix", "f{}_".format(k)]
+        runs.append((proc_cmd, process_out_fn(out_fn, k), partial_score_fn, base_seed + k, proc_nstruct))
+
+    # each thread just waits on its rosetta process, so threads are enough to run them concurrently
+    with ThreadPoolExecutor(max_workers=len(runs)) as executor:
+        futures = [executor.submit(run_measured, proc_cmd, working_dir, proc_out_fn, step)
+                   for proc_cmd, proc_out_fn, _, _, _ in runs]
+        results = [future.result() for future in futures]
+
+    usage = combine_parallel_usage([proc_usage for _, proc_usage in results])
+    partial_fns = [join(working_dir, score_dir, partial_score_fn) for _, _, partial_score_fn, _, _ in runs]
+    for (return_code, _), (_, proc_out_fn, _, _, _) in zip(results, runs):
+        if return_code != 0:
+            # the structures of the failed increment aren't used, so don't leave their partial score files behind
+            # (they would end up in the saved working directory)
+            for fn in partial_fns:
+                if isfile(fn):
+                    os.remove(fn)
+            return return_code, proc_out_fn, usage
+
+    merge_score_files(partial_fns, join(working_dir, score_dir, score_fn))
+    seeds += [(seed, proc_nstruct) for _, _, _, seed, proc_nstruct in runs]
+    return 0, out_fn, usage
+
+
+def format_seeds(seeds):
+    """ the seeds for the record, as "seed:nstruct" for each process in order, e.g. "1234:3 1235:2" """
+    return " ".join("{}:{}".format(seed, nstruct) for seed, nstruct in seeds)
@@ -0,0 +1,187 @@
+""" interface proximity of the variants in a docking variant list
+    builds a KD-tree over the heavy atoms of the binding partners in the prepared complex (the partner chain, like
+    chain A for GB1 docking with partners A_C, or the AKG/NEU ligands for sadA) and computes each residue's minimum
+    distance to them. a variant's interface distance is the smallest distance of its mutated residues.
+    the variant list can then be annotated with the distances, ordered nearest first, or filtered to the variants
+    near the interface before it's split into jobs by condor.py, so docking runs where dG_separated moves
+
+    python code/interface.py --variants_fn <variants> --chain C --partner_chains A --max_distance 10 --order
+        --out_fn <interface_variants> """
+
+import argparse
+from os.path import join
+
+import numpy as np
+import pandas as pd
+from Bio.PDB.kdtrees import KDTree
+
+# residues that are never binding partners
+IGNORED_RESNAMES = ["HOH", "WAT"]
+
+
+def load_heavy_atoms(pdb_fn):
+    """ the chain, residue number, residue name, and coordinates of the heavy atoms of the ATOM and HETATM records
+        in a pdb file. reads the fixed pdb columns directly, prepared pdb files also contain rosetta's energy table """
+    records = []
+    coords = []
+    with open(pdb_fn, "r") as f:
+        for line in f:
+            if not (line.startswith("ATOM") or line.startswith("HETATM")):
+                continue
+            # the element column is optional in older files, fall back to the first letter of the atom name
+            element = line[76:78].strip() if len(line) > 77 else ""
+            if element == "":
+                element = line[12:16].strip().lstrip("0123456789")[:1]
+            if element == "H":
+                continue
+            records.append((line[21], int(line[22:26]), line[17:20].strip()))
+            coords.append([float(line[30:38]), float(line[38:46]), float(line[46:54])])
+
+    atoms_df = pd.DataFrame(records, columns=["chain", "resnum", "resname"])
+    return atoms_df, np.array(coords, dtype=np.float64)
+
+
+def get_partner_mask(atoms_df, chain, partner_chains=None, partner_resnames=None):
+    """ which atoms belong to the binding partners: the given chains and residue names (like ligand HETATMs),
+        or if neither is given, everything outside the mutated chain """
+    if partner_chains is None and partner_resnames is None:
+        mask = atoms_df["chain"] != chain
+    else:
+        mask = np.zeros(len(atoms_df), dtype=bool)
+        if partner_chains is not None:
+            mask |= atoms_df["chain"].isin(partner_chains)
+        if partner_resnames is not None:
+            mask |= atoms_df["resname"].isin(partner_resnames)
+    return np.asarray(mask) & np.asarray(~atoms_df["resname"].isin(IGNORED_RESNAMES))
+
+
+def get_interface_distances(pdb_fn, chain, partner_chains=None, partner_resnames=None, search_radius=20.0):
+    """ the minimum distance (angstroms) from each residue of the chain to the binding partners, indexed by residue
+        number. residues without a partner atom within search_radius get inf """
+    atoms_df, coords = load_heavy_atoms(pdb_fn)
+    partner_mask = get_partner_mask(atoms_df, chain, partner_chains, partner_resnames)
+    if not partner_mask.any():
+        raise ValueError("no binding partner atoms in {}".format(pdb_fn))
+
+    # only the partner atoms go in the tree, the residue atoms query it
+    tree = KDTree(coords[partner_mask], 10)
+    chain_idxs = np.flatnonzero(np.asarray(atoms_df["chain"] == chain) & ~partner_mask)
+    atom_distances = np.full(len(chain_idxs), np.inf)
+    for i, atom_idx in enumerate(chain_idxs):
+        points = tree.search(coords[atom_idx], search_radius)
+        if len(points) > 0:
+            atom_distances[i] = min(point.radius for point in points)
+
+    distances = pd.Series(atom_distances, index=atoms_df["resnum"].values[chain_idxs])
+    return distances.groupby(level=0).min()
+
+
+def get_variant_distance(variant, distances):
+    """ the interface distance of a variant, the smallest distance of its mutated residues. the WT has no mutated
+        residues, so its distance is nan """
+    if variant == "_wt":
+        return np.nan
+    resnums = [int(mutation[1:-1]) for mutation in variant.split(",")]
+    missing = [resnum for resnum in resnums if resnum not in distances.index]
+    if len(missing) > 0:
+        raise ValueError("variant {} has positions that are not in the chain: {}".format(variant, missing))
+    return distances[resnums].min()
+
+
+def annotate_variants(pdbs_variants, pdb_dir, chain, partner_chains=None, partner_resnames=None,
+                      search_radius=20.0):
+    """ a dataframe with the pdb file, variant, and interface distance of each "pdb_fn variant" line of a variant
+        list. the distances of each pdb file are only computed once """
+    pdb_distances = {}
+    records = []
+    for pdb_variant in pdbs_variants:
+        pdb_fn, variant = pdb_variant.split()
+        if pdb_fn not in pdb_distances:
+            pdb_distances[pdb_fn] = get_interface_distances(join(pdb_dir, pdb_fn), chain, partner_chains,
+                                                            partner_resnames, search_radius)
+        records.append((pdb_fn, variant, get_variant_distance(variant, pdb_distances[pdb_fn])))
+    return pd.DataFrame(records, columns=["pdb_fn", "variant", "interface_distance"])
+
+
+def main(args):
+    with open(args.variants_fn, "r") as f:
+        pdbs_variants = [line for line in f.read().splitlines() if line.strip() != ""]
+
+    variants_df = annotate_variants(pdbs_variants, args.pdb_dir, args.chain, args.partner_chains,
+                                    args.partner_resnames, args.search_radius)
+    if args.annotation_fn is not None:
+        variants_df.to_csv(args.annotation_fn, index=False)
+
+    if args.max_distance is not None:
+        # the WT entries are kept, they're the reference for the variants of their PDB
+        variants_df = variants_df[(variants_df["interface_distance"] <= args.max_distance) |
+                                  (variants_df["variant"] == "_wt")]
+    if args.order:
+        # a stable sort keeps the original order of variants at the same distance, the WT entries (nan) go last
+        variants_df = variants_df.sort_values("interface_distance", kind="mergesort")
+
+    with open(args.out_fn, "w") as f:
+        for pdb_fn, variant in zip(variants_df["pdb_fn"], variants_df["variant"]):
+            f.write("{} {}\n".format(pdb_fn, variant))
+
+    print("Saved {} of {} variants to {}".format(len(variants_df), len(pdbs_variants), args.out_fn))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        fromfile_prefix_chars="@")
+
+    parser.add_argument("--variants_fn",
+                        help="path to text file containing protein variants",
+                        type=str)
+
+    parser.add_argument("--pdb_dir",
+                        help="directory containing the pdb files referenced in variants_fn",
+                        type=str,
+                        default="pdb_files/prepared_pdb_files")
+
+    parser.add_argument("--chain",
+                        help="the chain the variants are in",
+                        type=str,
+                        default="A")
+
+    parser.add_argument("--partner_chains",
+                        help="chains of the binding partner (for example, A for GB1 docking with partners A_C). "
+                             "if neither this nor partner_resnames is given, everything outside the chain is a partner",
+                        type=str,
+                        nargs="+",
+                        default=None)
+
+    parser.add_argument("--partner_resnames",
+                        help="residue names of the binding partner, for example the ligands AKG NEU",
+                        type=str,
+                        nargs="+",
+                        default=None)
+
+    parser.add_argument("--search_radius",
+                        help="distances are only computed up to this radius (angstroms), residues farther from the "
+                             "partner get an interface distance of inf",
+                        type=float,
+                        default=20.0)
+
+    parser.add_argument("--max_distance",
+                        help="only keep variants with an interface distance of at most this many angstroms",
+                        type=float,
+                        default=None)
+
+    parser.add_argument("--order",
+                        help="set this flag to order the variants by interface distance, nearest first",
+                        action="store_true")
+
+    parser.add_argument("--annotation_fn",
+                        help="save a csv with the interface distance of every variant to this file",
+                        type=str,
+                        default=None)
+
+    parser.add_argument("--out_fn",
+                        help="the output variant list, in the same format as variants_fn",
+                        type=str)
+
+    main(parser.parse_args())
@@ -0,0 +1,64 @@
+""" job-level staging of the ligand assets of the docking protocols (params files and conformer libraries)
+    the ligand files are placed once per job, next to the working directories, and rosetta is pointed at them by
+    absolute path instead of linking them into every variant's working directory. rosetta resolves the
+    PDB_ROTAMERS conformer library of a params file relative to the params file, so the conformer libraries are
+    found in the staged directory too. the options files that load the params (-extra_res_fa) get staged copies
+    with the absolute paths filled in """
+
+import os
+import re
+import shutil
+import tempfile
+from os.path import join, basename, abspath, isdir
+
+# an -extra_res_fa option and its params file, in command line or options file form
+EXTRA_RES_RE = re.compile(r"(-(?:in:file:)?extra_res_fa\s+)(\S+)")
+
+
+def get_ligand_dir(template_dir, stage_dir):
+    return abspath(join(stage_dir, ".{}_ligands".format(basename(template_dir.rstrip("/")))))
+
+
+def point_options_at(options_str, ligand_dir):
+    """ replace the params files of the -extra_res_fa options with their paths in the ligand dir, leaving comments
+        as they are """
+    lines = []
+    for line in options_str.splitlines(keepends=True):
+        if not line.lstrip().startswith("#"):
+            line = EXTRA_RES_RE.sub(lambda m: m.group(1) + join(ligand_dir, basename(m.group(2))), line)
+        lines.append(line)
+    return "".join(lines)
+
+
+def stage_ligands(template_dir, ligand_files, options_files, stage_dir):
+    """ copy the ligand files from the template dir into a ligand dir under stage_dir once per job, along with
+        copies of the options files that reference the params by absolute path. safe to call from multiple workers
+        at once, the first one to finish staging wins (like workdirs.stage_template_dir)
+        returns the absolute path of the ligand dir """
+    ligand_dir = get_ligand_dir(template_dir, stage_dir)
+    if isdir(ligand_dir):
+        return ligand_dir
+
+    tmp_dir = tempfile.mkdtemp(prefix=".staging_", dir=stage_dir)
+    for fn in ligand_files:
+        shutil.copy(join(template_dir, fn), tmp_dir)
+    for fn in options_files:
+        with open(join(template_dir, fn), "r") as f:
+            options_str = f.read()
+        # the paths point at the final ligand dir, which the temporary dir is renamed to
+        with open(join(tmp_dir, fn), "w") as f:
+            f.write(point_options_at(options_str, ligand_dir))
+    try:
+        os.rename(tmp_dir, ligand_dir)
+    except OSError:
+        # another worker staged it first
+        shutil.rmtree(tmp_dir)
+    return ligand_dir
+
+
+def get_params_args(ligand_dir, params_fns):
+    """ the -extra_res_fa arguments for the staged params files """
+    params_args = []
+    for params_fn in params_fns:
+        params_args += ["-extra_res_fa", join(ligand_dir, params_fn)]
+    return params_args
@@ -0,0 +1,76 @@
+""" bounded, compressed capture of the stdout/stderr of Rosetta subprocesses
+    the output is streamed through a pipe to the full log in the working directory, while the last lines and any
+    error lines are kept in memory. when the step succeeds, the full log is replaced by a gzipped summary with just
+    those lines. when the step fails, the full log is kept for classifying the failure and for debugging """
+
+import gzip
+import os
+import re
+from collections import deque
+
+from failures import FAILURE_SIGNATURES
+
+# number of lines from the end of the log to keep
+DEFAULT_TAIL_LINES = 200
+
+# most error lines to keep from a single log, so a step that floods the log with errors can't blow up the summary
+MAX_ERROR_LINES = 500
+
+# generic error lines, in addition to the known failure signatures
+ERROR_PATTERN = re.compile(r"ERROR|[Ee]rror:|[Ee]xception|[Aa]ssertion|[Ss]egmentation fault|[Kk]illed")
+
+# set by configure() at the start of each script (and in each pool worker, in case they aren't forked)
+settings = {"tail_lines": DEFAULT_TAIL_LINES, "full_logs": False}
+
+
+def configure(tail_lines=DEFAULT_TAIL_LINES, full_logs=False):
+    """ set how many tail lines to keep, or whether to keep the full logs of successful steps """
+    settings["tail_lines"] = tail_lines
+    settings["full_logs"] = full_logs
+
+
+def full_logs():
+    return settings["full_logs"]
+
+
+def is_error_line(line):
+    if ERROR_PATTERN.search(line):
+        return True
+    return any(pattern.search(line) for _, _, pattern in FAILURE_SIGNATURES)
+
+
+def new_capture():
+    """ the in-memory part of a log capture: the tail ring buffer, the error lines, and the total line count """
+    return {"tail": deque(maxlen=settings["tail_lines"]), "errors": [], "num_lines": 0}
+
+
+def capture_line(capture, f, line):
+    """ write a line (bytes) from the subprocess to the full log file f and keep it in the capture if needed """
+    f.write(line)
+    text = line.decode(errors="replace")
+    capture["num_lines"] += 1
+    capture["tail"].append((capture["num_lines"], text))
+    if len(capture["errors"]) < MAX_ERROR_LINES and is_error_line(text):
+        capture["errors"].append((capture["num_lines"], text))
+
+
+def summary_fn(out_fn):
+    return out_fn + ".gz"
+
+
+def finish_capture(capture, out_fn, return_code):
+    """ replace the full log with the compressed summary if the step succeeded, otherwise keep the full log """
+    if return_code != 0:
+        return
+
+    # error lines that are also in the tail are only written once, in the tail
+    tail_start = capture["tail"][0][0] if len(capture["tail"]) > 0 else capture["num_lines"] + 1
+    errors = [(n, line) for n, line in capture["errors"] if n < tail_start]
+
+    with gzip.open(summary_fn(out_fn), "wt") as f:
+        f.write("# bounded log capture of {} lines: {} earlier error lines and the last {} lines, "
+                "prefixed with their line numbers\n".format(capture["num_lines"], len(errors),
+                                                            len(capture["tail"])))
+        for n, line in errors + list(capture["tail"]):
+            f.write("{}: {}".format(n, line if line.endswith("\n") else line + "\n"))
+    os.remove(out_fn)
@@ -0,0 +1,99 @@
+""" resource usage instrumentation for Rosetta subprocesses """
+
+import asyncio
+import os
+import platform
+import subprocess
+import time
+
+import log_capture
+
+USAGE_KEYS = ["wall_time", "user_time", "sys_time", "max_rss_mb"]
+
+# environment variable that tags a rosetta process with its pipeline step, read by admission control
+STEP_ENV_VAR = "METL_SIM_STEP"
+
+
+def get_step_env(step):
+    """ the environment for a subprocess running the given pipeline step (None inherits this process's env) """
+    if step is None:
+        return None
+    return dict(os.environ, **{STEP_ENV_VAR: step})
+
+
+def run_measured(cmd, cwd, out_fn, step=None):
+    """ run a subprocess with stdout and stderr captured to out_fn and measure its resource usage with os.wait4
+        the process is tagged with step (see get_step_env) so admission control can tell the pipeline steps apart
+        unless full logs are configured, the output goes through log_capture, which only keeps a compressed summary
+        of the log if the step succeeds
+        returns the return code and a dict with the wall time, user and sys cpu time (seconds), and peak rss (MB) """
+    start_time = time.perf_counter()
+    if log_capture.full_logs():
+        with open(out_fn, "w") as f:
+            proc = subprocess.Popen(cmd, cwd=cwd, env=get_step_env(step), stdout=f, stderr=f)
+            _, status, rusage = os.wait4(proc.pid, 0)
+    else:
+        capture = log_capture.new_capture()
+        with open(out_fn, "wb") as f:
+            proc = subprocess.Popen(cmd, cwd=cwd, env=get_step_env(step), stdout=subprocess.PIPE,
+                                    stderr=subprocess.STDOUT)
+            for line in proc.stdout:
+                log_capture.capture_line(capture, f, line)
+            proc.stdout.close()
+            _, status, rusage = os.wait4(proc.pid, 0)
+    wall_time = time.perf_counter() - start_time
+
+    # the process has been reaped by wait4, let the Popen object know so it doesn't try to wait on it again
+    return_code = os.waitstatus_to_exitcode(status)
+    proc.returncode = return_code
+    if not log_capture.full_logs():
+        log_capture.finish_capture(capture, out_fn, return_code)
+
+    # ru_maxrss is in kilobytes on linux and bytes on macOS
+    rss_divisor = 1024 ** 2 if platform.system() == "Darwin" else 1024
+    usage = {"wall_time": wall_time,
+             "user_time": rusage.ru_utime,
+             "sys_time": rusage.ru_stime,
+             "max_rss_mb": rusage.ru_maxrss / rss_divisor}
+
+    return return_code, usage
+
+
+async def run_measured_async(cmd, cwd, out_fn, step=None):
+    """ asyncio version of run_measured. the subprocess is started and waited on with os.wait4 in a worker thread
+        of the event loop's default executor, so the usage is measured the same way as run_measured (the event
+        loop's child watcher would reap the process itself, and its rusage would be lost) """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, run_measured, cmd, cwd, out_fn, step)
+
+
+def empty_usage():
+    """ usage for a step that was not run """
+    return {k: 0.0 for k in USAGE_KEYS}
+
+
+def share_usage(usage, n):
+    """ per-input share of the usage of a step that processed n inputs in a single process
+        times are split evenly, the peak rss is not """
+    shared = {k: v / n for k, v in usage.items()}
+    shared["max_rss_mb"] = usage["max_rss_mb"]
+    return shared
+
+
+def usage_columns(steps):
+    """ the record column names for the usage of the given pipeline steps """
+    return ["{}_{}".format(step, k) for step in steps for k in USAGE_KEYS]
+
+
+def flatten_usage(step_usage):
+    """ flatten a dict mapping step name -> usage dict into record columns (e.g. mutate_wall_time) """
+    return {"{}_{}".format(step, k): v for step, usage in step_usage.items() for k, v in usage.items()}
+
+
+def combine_parallel_usage(usages):
+    """ usage of processes that ran at the same time: the wall time is the longest one, the cpu times add up,
+        and so do the peak rss values (the processes are resident together) """
+    return {"wall_time": max(usage["wall_time"] for usage in usages),
+            "user_time": sum(usage["user_time"] for usage in usages),
+            "sys_time": sum(usage["sys_time"] for usage in usages),
+            "max_rss_mb": sum(usage["max_rss_mb"] for usage in usages)}
@@ -0,0 +1,92 @@
+""" content-addressed cache of energize results, stored in a SQLite database that can be shared by local workers """
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from os.path import join
+
+import pandas as pd
+
+
+def get_file_hash(fn):
+    """ sha256 of a file's contents """
+    h = hashlib.sha256()
+    with open(fn, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def get_dir_hash(d):
+    """ sha256 over the relative paths and contents of all files in a directory, in sorted order """
+    h = hashlib.sha256()
+    for root, dirs, files in sorted(os.walk(d)):
+        dirs.sort()
+        for fn in sorted(files):
+            h.update(os.path.relpath(join(root, fn), d).encode())
+            h.update(get_file_hash(join(root, fn)).encode())
+    return h.hexdigest()
+
+
+def sort_variant(variant):
+    """ put the mutations of a variant in sorted order by position so equivalent variants get the same key
+        (same as utils.sort_variant_mutations, which isn't imported here to avoid the biopython dependency) """
+    if variant == "_wt":
+        return variant
+    return ",".join(sorted(variant.split(","), key=lambda mut: int(mut[1:-1])))
+
+
+def get_cache_key(pdb_fn, chain, variant, rosetta_hparams, template_hash):
+    """ the cache key is a hash of everything that determines the result: the prepared pdb file contents,
+        the chain, the sorted variant, the rosetta hyperparameters, and the contents of the template directory
+        (template_hash, from get_dir_hash, which jobs compute once rather than for every variant) """
+    key = {"pdb": get_file_hash(pdb_fn),
+           "chain": chain,
+           "variant": sort_variant(variant),
+           "hparams": rosetta_hparams,
+           "template_dir": template_hash}
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def connect(cache_fn):
+    """ connect to the cache database, creating it if needed. WAL mode lets concurrent workers read while
+        another worker is writing """
+    if os.path.dirname(cache_fn) != "":
+        os.makedirs(os.path.dirname(cache_fn), exist_ok=True)
+    con = sqlite3.connect(cache_fn, timeout=60)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, "
+                "pdb_fn TEXT, "
+                "variant TEXT, "
+                "record TEXT, "
+                "created REAL)")
+    return con
+
+
+def lookup(cache_fn, key):
+    """ returns the cached record as a single-row dataframe, or None if the key is not in the cache """
+    con = connect(cache_fn)
+    try:
+        row = con.execute("SELECT record FROM results WHERE key = ?", (key,)).fetchone()
+    finally:
+        con.close()
+
+    if row is None:
+        return None
+    # the record is saved as a json object, which preserves the column order
+    return pd.DataFrame([json.loads(row[0])])
+
+
+def store(cache_fn, key, record_df):
+    """ save a single-row record to the cache. if the key is already in the cache, the existing record is kept """
+    record = {k: (v.item() if hasattr(v, "item") else v) for k, v in record_df.iloc[0].items()}
+    con = connect(cache_fn)
+    try:
+        with con:
+            con.execute("INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?, ?)",
+                        (key, record["pdb_fn"], record["variant"], json.dumps(record), time.time()))
+    finally:
+        con.close()
@@ -0,0 +1,93 @@
+""" append-only streaming writer for per-variant results """
+
+import csv
+import fcntl
+import os
+import time
+from os.path import join
+
+# completion marker, written to the log directory once a job has gone through its whole variant list
+JOB_DONE_FN = "done.txt"
+
+
+def repair_partial_record(f):
+    """ truncate a trailing partial line, which can be left behind if a job is evicted mid-write
+        expects a file handle opened in "a+" mode """
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    if size == 0:
+        return
+
+    f.seek(size - 1)
+    if f.read(1) == "\n":
+        return
+
+    # find the end of the last complete line and cut everything after it
+    f.seek(0)
+    contents = f.read()
+    last_newline = contents.rfind("\n")
+    f.truncate(last_newline + 1 if last_newline >= 0 else 0)
+
+
+def append_record(results_fn, record_df):
+    """ append a dataframe of records to the job-level results csv as soon as a variant finishes.
+        the header is written when the file is first created. each append is flushed and fsynced so finished
+        variants survive if the job is evicted, and an exclusive lock makes it safe for concurrent worker processes """
+    with open(results_fn, "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            repair_partial_record(f)
+
+            # the columns of the existing file take precedence so every row lines up with the header
+            f.seek(0)
+            header_line = f.readline()
+            if header_line == "":
+                columns = list(record_df.columns)
+                write_header = True
+            else:
+                columns = next(csv.reader([header_line]))
+                write_header = False
+
+            extra_columns = [c for c in record_df.columns if c not in columns]
+            if len(extra_columns) > 0:
+                print("Record has columns not in {}, they will not be saved: {}".format(results_fn, extra_columns),
+                      flush=True)
+
+            # write the whole record in one call to keep the window for a partial line small
+            f.write(record_df.reindex(columns=columns).to_csv(index=False, header=write_header))
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def read_complete_records(results_fn):
+    """ the contents of the results csv up to its last complete line, for readers that shouldn't modify the file
+        (like analysis of finished jobs). a partial last line from an interrupted write is skipped, not repaired """
+    with open(results_fn, "r") as f:
+        contents = f.read()
+    return contents[:contents.rfind("\n") + 1]
+
+
+def load_completed_variants(results_fn):
+    """ load the set of "pdb_fn variant" strings that already have a record in the results csv """
+    if not os.path.isfile(results_fn):
+        return set()
+
+    with open(results_fn, "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            repair_partial_record(f)
+            f.seek(0)
+            completed = {"{} {}".format(row["pdb_fn"], row["variant"]) for row in csv.DictReader(f)}
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+    return completed
+
+
+def mark_job_done(log_dir):
+    """ write the completion marker to the log directory. an evicted or killed job still leaves an energies.csv with
+        the variants that finished before it stopped, the marker is how analysis tells the two apart """
+    with open(join(log_dir, JOB_DONE_FN), "w") as f:
+        f.write("{}\n".format(time.strftime("%Y-%m-%d_%H-%M-%S", time.gmtime())))
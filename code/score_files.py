@@ -0,0 +1,139 @@
+""" lightweight reader for Rosetta score files (score.sc, relax.sc, filter.sc, etc.) """
+
+import numpy as np
+import pandas as pd
+
+AGG_METHODS = ["avg", "min_energy_avg", "min_energy_first"]
+
+
+def to_float_array(rows):
+    """ convert a list of rows of string tokens to a 2D float array, non-numeric values become nan """
+    try:
+        return np.array(rows, dtype=float)
+    except ValueError:
+        # slow path, only needed if some score term is not numeric
+        def to_float(token):
+            try:
+                return float(token)
+            except ValueError:
+                return np.nan
+        return np.array([[to_float(token) for token in row] for row in rows], dtype=float)
+
+
+def read_score_sc(score_sc_fn):
+    """ read a score file (or silent file) with the "SEQUENCE:" and "SCORE:" header layout
+        returns the score term names, a float array with one row per structure, and the structure descriptions
+        repeated header lines (from multiple runs appending to the same score file) are skipped """
+    columns = None
+    rows = []
+    descriptions = []
+    with open(score_sc_fn, "r") as f:
+        for line in f:
+            tokens = line.split()
+            if len(tokens) == 0 or tokens[0] != "SCORE:":
+                continue
+            if columns is None:
+                # drop the "SCORE:" and "description" columns, these won't be needed for final output
+                columns = tokens[1:-1]
+            elif tokens[1:-1] == columns:
+                continue
+            else:
+                rows.append(tokens[1:-1])
+                descriptions.append(tokens[-1])
+
+    if columns is None:
+        raise ValueError("no SCORE: header found in score file: {}".format(score_sc_fn))
+
+    # silent files have the same SCORE: lines as score files, but name the total score "score"
+    if score_sc_fn.endswith(".silent") and "total_score" not in columns:
+        columns = ["total_score" if c == "score" else c for c in columns]
+
+    values = to_float_array(rows) if len(rows) > 0 else np.empty((0, len(columns)))
+    return columns, values, descriptions
+
+
+def aggregate_scores(columns, values, agg_method="avg", sort_col="total_score"):
+    """ aggregate the per-structure energies from a single score file into a single row """
+    if agg_method not in AGG_METHODS:
+        raise ValueError("invalid aggregation method: {}".format(agg_method))
+
+    # special case: only 1 structure was generated, no need to aggregate
+    if len(values) == 1:
+        return values[0]
+
+    if agg_method == "avg":
+        # take the average of all structures, not just the ones with the lowest score
+        return values.mean(axis=0)
+
+    sort_values = values[:, columns.index(sort_col)]
+    min_values = values[sort_values == sort_values.min()]
+    if agg_method == "min_energy_avg":
+        # select the structure(s) with the minimum total_score and average the energies if multiple structures
+        # we average just in case there are some structures with the same min total_score but different energies
+        return min_values.mean(axis=0)
+    else:
+        # select structures with min total_score and use the first one
+        return min_values[0]
+
+
+def parse_score_sc(score_sc_fn, agg_method="avg", sort_col="total_score"):
+    """ read and aggregate a single score file, returns the score term names and a 1D float array """
+    columns, values, _ = read_score_sc(score_sc_fn)
+    if len(values) == 0:
+        # no structures (all of them failed), nothing to aggregate
+        return columns, np.full(len(columns), np.nan)
+    return columns, aggregate_scores(columns, values, agg_method, sort_col)
+
+
+def aggregate_groups(columns, values, counts, agg_method="avg", sort_col="total_score"):
+    """ vectorized aggregation over consecutive groups of rows, one group per score file
+        values holds the stacked rows of all score files and counts holds the number of rows from each file """
+    if agg_method not in AGG_METHODS:
+        raise ValueError("invalid aggregation method: {}".format(agg_method))
+
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    if agg_method == "avg":
+        return np.add.reduceat(values, starts, axis=0) / counts[:, None]
+
+    # find the rows that have the minimum sort value within their group
+    sort_values = values[:, columns.index(sort_col)]
+    group_mins = np.minimum.reduceat(sort_values, starts)
+    is_min = sort_values == np.repeat(group_mins, counts)
+
+    if agg_method == "min_energy_avg":
+        num_min = np.add.reduceat(is_min.astype(float), starts)
+        return np.add.reduceat(values * is_min[:, None], starts, axis=0) / num_min[:, None]
+    else:
+        # the first min row of each group
+        group_ids = np.repeat(np.arange(len(counts)), counts)
+        min_rows = np.flatnonzero(is_min)
+        _, first = np.unique(group_ids[min_rows], return_index=True)
+        return values[min_rows[first]]
+
+
+def parse_score_files(score_sc_fns, agg_method="avg", sort_col="total_score"):
+    """ batch mode: read and aggregate many score files (for example, from saved working directories) in one call
+        returns a dataframe with one row per score file, indexed by filename. files that have different score terms
+        are aggregated separately and combined at the end. files without any structures get a row of nan """
+    # group the stacked rows of each file by their set of score terms
+    groups = {}
+    for fn in score_sc_fns:
+        columns, values, _ = read_score_sc(fn)
+        if len(values) == 0:
+            continue
+        group = groups.setdefault(tuple(columns), {"fns": [], "values": [], "counts": []})
+        group["fns"].append(fn)
+        group["values"].append(values)
+        group["counts"].append(len(values))
+
+    dfs = []
+    for columns, group in groups.items():
+        aggregated = aggregate_groups(list(columns), np.concatenate(group["values"], axis=0),
+                                      np.array(group["counts"]), agg_method, sort_col)
+        dfs.append(pd.DataFrame(aggregated, columns=list(columns), index=group["fns"]))
+
+    if len(dfs) == 0:
+        return pd.DataFrame(index=list(score_sc_fns))
+
+    return pd.concat(dfs, axis=0).reindex(list(score_sc_fns))
@@ -1,13 +1,32 @@
 """ Fills the template files for energize pipeline """
-import os
+import functools
 from os.path import join
-import shutil
 
+AA_MAP = {
+    "A": "ALA", "C": "CYS", "D": "ASP", "E": "GLU", "F": "PHE", "G": "GLY",
+    "H": "HIS", "I": "ILE", "K": "LYS", "L": "LEU", "M": "MET", "N": "ASN",
+    "P": "PRO", "Q": "GLN", "R": "ARG", "S": "SER", "T": "THR", "V": "VAL",
+    "W": "TRP", "Y": "TYR"
+}
 
-def gen_res_selector_str(variant, index_type="1-based"):
-    """ generates the ResidueIndexSelector string Rosetta scripts """
-    resnums = []
+
+@functools.lru_cache(maxsize=None)
+def load_template(template_fn):
+    """ the contents of a template file. each template is only read from disk once per process, the templates
+        don't change while a job is running """
+    with open(template_fn, "r") as f:
+        return f.read()
+
+
+# each variant is parsed for several of its files in a row, so a small cache is enough
+@functools.lru_cache(maxsize=128)
+def parse_variant(variant, index_type="1-based"):
+    """ the (wild-type aa, 1-based residue number, new aa) of each mutation in the variant, shared by the relax
+        selector, the resfile, and the MutateResidue movers """
+    mutations = []
     for mutation in variant.split(","):
+        if len(mutation) < 3:
+            raise ValueError(f"ERROR: length(variant) < 3 : {mutation}")
         if index_type == "1-based":
             resnum_1_index = int(mutation[1:-1])
         elif index_type == "0-based":
@@ -15,21 +34,20 @@ def gen_res_selector_str(variant, index_type="1-based"):
             resnum_1_index = resnum_0_idx + 1
         else:
             raise ValueError("unrecognized index_type {}".format(index_type))
-        resnums.append("{}A".format(resnum_1_index))
-    resnum_str = ",".join(resnums)
-    return resnum_str
+        mutations.append((mutation[0], resnum_1_index, mutation[-1]))
+    return tuple(mutations)
+
+
+def gen_res_selector_str(variant, index_type="1-based"):
+    """ generates the ResidueIndexSelector string Rosetta scripts """
+    return ",".join("{}A".format(resnum) for _, resnum, _ in parse_variant(variant, index_type))
 
 
 def gen_relax_xml_str(template_dir, variant, relax_distance, relax_repeats):
     resnum_str = gen_res_selector_str(variant)
-    template_fn = "relax_template.xml"
-
-    # load the template
-    template_fn = join(template_dir, template_fn)
-    with open(template_fn, "r") as f:
-        template_str = f.read()
 
     # fill in the template
+    template_str = load_template(join(template_dir, "relax_template.xml"))
     formatted = template_str.format(resnums=resnum_str, relax_distance=relax_distance, relax_repeats=relax_repeats)
     return formatted
 
@@ -37,38 +55,38 @@ def gen_relax_xml_str(template_dir, variant, relax_distance, relax_repeats):
 def gen_resfile_str(template_dir, chain, variant, index_type="1-based"):
     """residue_number chain PIKAA replacement_AA"""
 
-    mutation_strs = []
-    for mutation in variant.split(","):
-        if index_type == "1-based":
-            resnum_1_index = int(mutation[1:-1])
-        elif index_type == "0-based":
-            resnum_0_idx = int(mutation[1:-1])
-            resnum_1_index = resnum_0_idx + 1
-        else:
-            raise ValueError("unrecognized index_type {}".format(index_type))
-        new_aa = mutation[-1]
+    # add new lines between mutation strs
+    mutation_strs = "\n".join("{} {} PIKAA {}".format(resnum, chain, new_aa)
+                              for _, resnum, new_aa in parse_variant(variant, index_type))
 
-        mutation_strs.append("{} {} PIKAA {}".format(resnum_1_index, chain, new_aa))
+    formatted_template = load_template(join(template_dir, "mutation_template.resfile")).format(mutation_strs)
 
-    # add new lines between mutation strs
-    mutation_strs = "\n".join(mutation_strs)
+    return formatted_template
 
-    # load the templates
-    template_fn = join(template_dir, "mutation_template.resfile")
-    with open(template_fn, "r") as f:
-        template_str = f.read()
 
-    formatted_template = template_str.format(mutation_strs)
+def gen_mutate_residue_xml_str(template_fn, variant, chain):
+    """ fills in a MutateResidue mover for each mutation (used by the docking protocols). templates without a
+        Neighborhood selector just don't use joined_idxs """
+    mutations = parse_variant(variant)
 
-    return formatted_template
+    mutate_residue_blocks = [f'<MutateResidue name="mutant{i}" target="{resnum}{chain}" new_res="{AA_MAP[new_aa]}"/>'
+                             for i, (_, resnum, new_aa) in enumerate(mutations, 1)]
+    protocols = [f'<Add mover_name="mutant{i}"/>' for i in range(1, len(mutations) + 1)]
+
+    return load_template(template_fn).format(
+        joined_idxs=",".join("{}{}".format(resnum, chain) for _, resnum, _ in mutations),
+        mutate_residue_placeholders="\n".join(mutate_residue_blocks),
+        protocols_placeholders="\n".join(protocols)
+    )
 
 
 def fill_templates(template_dir, chain, variant, relax_distance, relax_repeats, out_dir):
 
-    # the mutate xml no longer has any argument that need to be filled in, so just copy the template
+    # the mutate xml no longer has any argument that need to be filled in, so just write out the template
     # todo: this could be done in prep_working_dir in energize.py instead, that's where other files
     #   that are unchanged are copied from the template dir to the working dir
-    shutil.copy(join(template_dir, "mutate_template.xml"), join(out_dir, "mutate.xml"))
+    with open(join(out_dir, "mutate.xml"), "w") as f:
+        f.write(load_template(join(template_dir, "mutate_template.xml")))
 
     relax_xml_str = gen_relax_xml_str(template_dir, variant, relax_distance, relax_repeats)
     with open(join(out_dir, "relax.xml"), "w") as f:
@@ -77,4 +95,3 @@ def fill_templates(template_dir, chain, variant, relax_distance, relax_repeats,
     resfile_str = gen_resfile_str(template_dir, chain, variant)
     with open(join(out_dir, "mutation.resfile"), "w") as f:
         f.write(resfile_str)
-
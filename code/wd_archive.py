@@ -0,0 +1,101 @@
+""" per-job archive of the saved working directories (--save_wd)
+    instead of copying each variant's working directory into the log directory, its files are streamed into a zip
+    file of its own in the wd_archive directory of the log directory. each zip is written to a temporary file and
+    renamed into place, so a job that is evicted mid-save can't damage the working directories saved before it,
+    and a partial zip is never visible under its final name
+
+    list the working directories in an archive, or extract one of them:
+        python code/wd_archive.py <log_dir>/wd_archive
+        python code/wd_archive.py <log_dir>/wd_archive --extract wd_2qmt_p.pdb_A2C --out_dir <dir> """
+
+import argparse
+import os
+import tempfile
+import zipfile
+from os.path import join, relpath, isfile
+
+ARCHIVE_DIR = "wd_archive"
+
+
+def get_archive_dir(log_dir):
+    return join(log_dir, ARCHIVE_DIR)
+
+
+def get_wd_zip_fn(archive_dir, name):
+    return join(archive_dir, "{}.zip".format(name))
+
+
+def save_wd(working_dir, log_dir, name):
+    """ stream the files of the working directory into a zip in the job's archive, under the given name (like the
+        directory names copytree used to create, e.g. wd_2qmt_p.pdb_A2C). every save is its own file, so concurrent
+        worker processes don't need a lock """
+    archive_dir = get_archive_dir(log_dir)
+    os.makedirs(archive_dir, exist_ok=True)
+
+    # the temporary file starts with a "." so it's never listed as a working directory
+    fd, tmp_fn = tempfile.mkstemp(prefix=".{}.".format(name), suffix=".tmp", dir=archive_dir)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            with zipfile.ZipFile(f, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                for root, dirs, files in os.walk(working_dir):
+                    dirs.sort()
+                    # directory entries keep empty directories in the archive
+                    zf.write(root, join(name, relpath(root, working_dir)))
+                    for fn in sorted(files):
+                        zf.write(join(root, fn), join(name, relpath(join(root, fn), working_dir)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_fn, get_wd_zip_fn(archive_dir, name))
+    except BaseException:
+        os.remove(tmp_fn)
+        raise
+
+
+def list_wds(archive_dir):
+    """ the names of the working directories in the archive, in the order they were saved """
+    zip_fns = [fn for fn in os.listdir(archive_dir) if fn.endswith(".zip") and not fn.startswith(".")]
+    zip_fns.sort(key=lambda fn: os.stat(join(archive_dir, fn)).st_mtime)
+    return [fn[:-len(".zip")] for fn in zip_fns]
+
+
+def extract_wd(archive_dir, name, out_dir):
+    """ extract a single working directory from the archive into out_dir """
+    zip_fn = get_wd_zip_fn(archive_dir, name)
+    if not isfile(zip_fn):
+        raise ValueError("no working directory named {} in {}".format(name, archive_dir))
+    with zipfile.ZipFile(zip_fn, "r") as zf:
+        zf.extractall(out_dir)
+    return join(out_dir, name)
+
+
+def main(args):
+    if args.extract is None:
+        for name in list_wds(args.archive_dir):
+            print(name)
+    else:
+        for name in args.extract:
+            print("Extracted {}".format(extract_wd(args.archive_dir, name, args.out_dir)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        fromfile_prefix_chars="@")
+
+    parser.add_argument("archive_dir",
+                        help="the wd_archive directory from a job's log directory",
+                        type=str)
+
+    parser.add_argument("--extract",
+                        help="names of the working directories to extract (list them by leaving out this argument)",
+                        type=str,
+                        nargs="+",
+                        default=None)
+
+    parser.add_argument("--out_dir",
+                        help="directory to extract the working directories into",
+                        type=str,
+                        default=".")
+
+    main(parser.parse_args())
@@ -0,0 +1,61 @@
+""" placement and setup of the per-variant working directories """
+
+import os
+import shutil
+import tempfile
+from os.path import join, isdir, basename
+
+
+def has_room(d, min_free_gb):
+    """ check if the given directory exists, is writable, and has at least min_free_gb of free space """
+    if not isdir(d) or not os.access(d, os.W_OK):
+        return False
+    return shutil.disk_usage(d).free >= min_free_gb * 1e9
+
+
+def get_wd_root(wd_base, job_uuid, min_free_gb=1.0):
+    """ create the job-level directory that holds the per-variant working directories
+        it's placed under wd_base (a fast path like /dev/shm) when there is room, otherwise the current directory
+        the job uuid keeps multiple jobs on the same node from stepping on each other """
+    if wd_base is not None and has_room(wd_base, min_free_gb):
+        base = wd_base
+    else:
+        if wd_base is not None:
+            print("Not enough room in {}, using the current directory for working directories".format(wd_base),
+                  flush=True)
+        base = "."
+
+    wd_root = join(base, "energize_wds_{}".format(job_uuid))
+    os.makedirs(wd_root, exist_ok=True)
+    return wd_root
+
+
+def stage_template_dir(template_dir, stage_dir):
+    """ copy the template directory into stage_dir once, so the static files can be linked into each working dir
+        safe to call from multiple workers at once, the first one to finish staging wins """
+    staged_dir = join(stage_dir, ".{}".format(basename(template_dir.rstrip("/"))))
+    if isdir(staged_dir):
+        return staged_dir
+
+    # unique temporary name, since workers can be processes or threads
+    tmp_dir = tempfile.mkdtemp(prefix=".staging_", dir=stage_dir)
+    shutil.copytree(template_dir, tmp_dir, dirs_exist_ok=True)
+    try:
+        os.rename(tmp_dir, staged_dir)
+    except OSError:
+        # another worker staged it first
+        shutil.rmtree(tmp_dir)
+    return staged_dir
+
+
+def link_file(src_fn, dst_dir):
+    """ hardlink a file into dst_dir, falling back to a symlink (for example, across filesystems) and then a copy
+        the linked files are only read by rosetta, never written, so sharing them between working dirs is safe """
+    dst_fn = join(dst_dir, basename(src_fn))
+    try:
+        os.link(src_fn, dst_fn)
+    except OSError:
+        try:
+            os.symlink(os.path.abspath(src_fn), dst_fn)
+        except OSError:
+            shutil.copy(src_fn, dst_fn)
@@ -0,0 +1,117 @@
+""" per-PDB wild-type baselines for energize (--wt_baseline)
+    the WT record of each PDB is computed at most once per job and referenced from the record of every variant of
+    that PDB (the wt_baseline column), so delta energies can be computed later without extra rosetta runs
+    the baselines are keyed by the same content hash as the result cache (pdb file contents, chain, rosetta
+    hyperparameters, and template directory), and saved as one csv per key in the wt_baselines directory of the
+    job's log directory. a shared directory with the same layout (--wt_baseline_dir) lets jobs reuse each other's
+    baselines. it's written with atomic renames, so it can be on a shared filesystem """
+
+import fcntl
+import os
+from os.path import join, isfile, isdir
+
+import pandas as pd
+
+import result_cache
+
+BASELINE_DIR = "wt_baselines"
+
+
+def get_baseline_key(pdb_fn, chain, rosetta_hparams, template_hash):
+    """ the key of the WT baseline of a PDB, the result cache key of its "_wt" variant """
+    return result_cache.get_cache_key(pdb_fn, chain, "_wt", rosetta_hparams, template_hash)
+
+
+def get_baseline_fn(baseline_dir, key):
+    return join(baseline_dir, "{}.csv".format(key))
+
+
+def get_lock_fn(log_dir, key):
+    return join(log_dir, BASELINE_DIR, ".{}.lock".format(key))
+
+
+def save_baseline(baseline_fn, baseline_df):
+    """ write to a temporary file and rename it, so readers never see a partial baseline """
+    os.makedirs(os.path.dirname(baseline_fn), exist_ok=True)
+    tmp_fn = "{}.tmp.{}".format(baseline_fn, os.getpid())
+    baseline_df.to_csv(tmp_fn, index=False)
+    os.replace(tmp_fn, baseline_fn)
+
+
+def get_wt_baseline(key, log_dir, compute_fn, shared_dir=None):
+    """ the WT baseline record with the given key, from this job's baselines, the shared directory, or by calling
+        compute_fn() to run rosetta. an exclusive lock per key makes sure concurrent workers of the same job
+        only compute each baseline once, the others wait for it """
+    job_fn = get_baseline_fn(join(log_dir, BASELINE_DIR), key)
+    if isfile(job_fn):
+        return pd.read_csv(job_fn)
+
+    os.makedirs(join(log_dir, BASELINE_DIR), exist_ok=True)
+    with open(get_lock_fn(log_dir, key), "a") as lock_f:
+        fcntl.flock(lock_f, fcntl.LOCK_EX)
+        try:
+            # another worker might have finished it while this one was waiting for the lock
+            if isfile(job_fn):
+                return pd.read_csv(job_fn)
+
+            if shared_dir is not None and isfile(get_baseline_fn(shared_dir, key)):
+                baseline_df = pd.read_csv(get_baseline_fn(shared_dir, key))
+                print("Using WT baseline {} from {}".format(key[:12], shared_dir), flush=True)
+            else:
+                print("Computing WT baseline {}".format(key[:12]), flush=True)
+                baseline_df = compute_fn()
+                if shared_dir is not None:
+                    save_baseline(get_baseline_fn(shared_dir, key), baseline_df)
+
+            save_baseline(job_fn, baseline_df)
+            # the lock isn't needed anymore, workers that come later find the baseline before they get to it, and
+            # the ones already waiting on it check for the baseline first
+            os.remove(get_lock_fn(log_dir, key))
+            return baseline_df
+        finally:
+            fcntl.flock(lock_f, fcntl.LOCK_UN)
+
+
+def remove_lock_files(log_dir):
+    """ remove the lock files of baselines that failed to compute, once the job is done with them """
+    baseline_dir = join(log_dir, BASELINE_DIR)
+    if not isdir(baseline_dir):
+        return
+    for fn in os.listdir(baseline_dir):
+        if fn.startswith(".") and fn.endswith(".lock"):
+            os.remove(join(baseline_dir, fn))
+
+
+def set_baseline_ref(record_df, key, col="wt_baseline"):
+    """ reference the WT baseline in a variant's record, right before the energies """
+    if col in record_df.columns:
+        record_df[col] = key
+    else:
+        record_df.insert(record_df.columns.get_loc("total_score"), col, [key] * len(record_df))
+    return record_df
+
+
+def load_baselines(log_dirs):
+    """ all WT baselines saved in the given log directories, indexed by key """
+    baseline_dfs = []
+    for log_dir in log_dirs:
+        baseline_dir = join(log_dir, BASELINE_DIR)
+        if not isdir(baseline_dir):
+            continue
+        for fn in sorted(os.listdir(baseline_dir)):
+            if fn.endswith(".csv"):
+                baseline_dfs.append(pd.read_csv(join(baseline_dir, fn)))
+    if len(baseline_dfs) == 0:
+        raise ValueError("no WT baselines found in the given log directories")
+    return pd.concat(baseline_dfs).drop_duplicates("wt_baseline").set_index("wt_baseline")
+
+
+def compute_deltas(energies_df, baselines_df):
+    """ the difference between each variant's energies and its WT baseline's energies (the columns from total_score
+        on, which are the energies in the energize records). variants without a baseline get nan """
+    energy_cols = list(energies_df.columns[energies_df.columns.get_loc("total_score"):])
+    wt_energies = baselines_df.reindex(energies_df["wt_baseline"])[energy_cols].reset_index(drop=True)
+    deltas_df = energies_df[energy_cols].reset_index(drop=True) - wt_energies
+    deltas_df.insert(0, "pdb_fn", energies_df["pdb_fn"].values)
+    deltas_df.insert(1, "variant", energies_df["variant"].values)
+    return deltas_df
@@ -51,20 +51,25 @@ fi
 # this is the version of the metl-sim environment in repo version 0.7.11 (pinned openssl)
 # simply a convenient way to keep track of versioning for this package which was created by hand
 # these lines handle setting up the environment
+# the setup steps are skipped if they already ran, which happens when a self-checkpointing job is restarted
 echo "Setting up Python environment"
 export PATH
-mkdir rosettafy_env
-tar -xzf rosettafy_env_v0.7.11.tar.gz -C rosettafy_env
+if [ ! -d rosettafy_env ]; then
+  mkdir rosettafy_env
+  tar -xzf rosettafy_env_v0.7.11.tar.gz -C rosettafy_env
+  rm rosettafy_env_v0.7.11.tar.gz
+fi
 . rosettafy_env/bin/activate
-rm rosettafy_env_v0.7.11.tar.gz
 
 # decrypt
 # note this is done AFTER setting up the Python environment because it requires
 # the openssl version inside the environment
-echo "Decrypting Rosetta"
-openssl version # echo the version for my knowledge
-openssl enc -d -aes256 -pbkdf2 -in rosetta_min_enc.tar.gz -out rosetta_min.tar.gz -pass file:pass.txt
-rm rosetta_min_enc.tar.gz
+if [ -f rosetta_min_enc.tar.gz ]; then
+  echo "Decrypting Rosetta"
+  openssl version # echo the version for my knowledge
+  openssl enc -d -aes256 -pbkdf2 -in rosetta_min_enc.tar.gz -out rosetta_min.tar.gz -pass file:pass.txt
+  rm rosetta_min_enc.tar.gz
+fi
 
 # extract rosetta and any additional tar files that might contain additional data
 if [ "$(ls 2>/dev/null -Ubad1 -- *.tar.gz | wc -l)" -gt 0 ];
@@ -8,6 +8,24 @@ CREATE TABLE IF NOT EXISTS  `variant` (
     `relax_run_time` INTEGER,
     `filter_run_time` INTEGER,
     `centroid_run_time` INTEGER,
+    `mutate_wall_time` REAL,
+    `mutate_user_time` REAL,
+    `mutate_sys_time` REAL,
+    `mutate_max_rss_mb` REAL,
+    `relax_wall_time` REAL,
+    `relax_user_time` REAL,
+    `relax_sys_time` REAL,
+    `relax_max_rss_mb` REAL,
+    `filter_wall_time` REAL,
+    `filter_user_time` REAL,
+    `filter_sys_time` REAL,
+    `filter_max_rss_mb` REAL,
+    `centroid_wall_time` REAL,
+    `centroid_user_time` REAL,
+    `centroid_sys_time` REAL,
+    `centroid_max_rss_mb` REAL,
+    `relax_nstruct_used` INTEGER,
+    `wt_baseline` TEXT,
 
     `total_score` REAL,
     `dslf_fa13` REAL,
@@ -99,6 +117,12 @@ CREATE TABLE IF NOT EXISTS  `job` (
     `hp_relax_repeats` INTEGER,
     `hp_relax_nstruct` INTEGER,
     `hp_relax_distance` REAL,
+    `hp_silent_io` INTEGER,
+    `hp_fused_scoring` INTEGER,
+    `hp_adaptive_increment` INTEGER,
+    `hp_adaptive_patience` INTEGER,
+    `hp_adaptive_tolerance` REAL,
+    `hp_adaptive_sem` REAL,
     PRIMARY KEY (`uuid`));
 
 
@@ -6,6 +6,16 @@ CREATE TABLE IF NOT EXISTS  `variant` (
     `run_time` INTEGER,
     `mutate_run_time` INTEGER,
     `dock_run_time` INTEGER,
+    `mutate_wall_time` REAL,
+    `mutate_user_time` REAL,
+    `mutate_sys_time` REAL,
+    `mutate_max_rss_mb` REAL,
+    `dock_wall_time` REAL,
+    `dock_user_time` REAL,
+    `dock_sys_time` REAL,
+    `dock_max_rss_mb` REAL,
+    `num_structs_used` INTEGER,
+    `dock_seeds` TEXT,
 
     `total_score` REAL,
     `complex_normalized` REAL,
@@ -71,7 +81,12 @@ CREATE TABLE IF NOT EXISTS  `job` (
     `hostname` TEXT,
     `github_tag` TEXT,
     `script_start_time` TEXT,
+    `hp_protocol` TEXT,
     `hp_num_structs` INTEGER,
+    `hp_adaptive_increment` INTEGER,
+    `hp_adaptive_patience` INTEGER,
+    `hp_adaptive_tolerance` REAL,
+    `hp_adaptive_sem` REAL,
     PRIMARY KEY (`uuid`));
 
 